@@ -1,14 +1,12 @@
 import sys
 
-import pysam
 from numpy.random import default_rng
 
-from hts_synth.models.qual_model import NaiveQualLearner, NaiveQualSim
+from hts_synth.models.model_cache import ModelCache, QualModelKind
 
 fqpath = sys.argv[1]  # fragile I know
 np_rng = default_rng(24601)
-with pysam.FastxFile(fqpath) as tfq:
-    learned_distribs = NaiveQualLearner.model_from_fastq(tfq)
-    qual_gen = NaiveQualSim(learned_distribs, np_rng)
-    example_score_iter = qual_gen.yield_n(10)
-    # I suggest putting a breakpoint here and inspecting stuff
+# learned on the first run only, later runs load the model from the cache
+qual_gen, model_path = ModelCache.default().get_or_learn(QualModelKind.NAIVE, [fqpath], rng=np_rng)
+example_score_iter = qual_gen.yield_n(10)
+# I suggest putting a breakpoint here and inspecting stuff
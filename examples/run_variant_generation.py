@@ -15,7 +15,7 @@ for var in variants:
     print(var)
 
 modified_segment_sequence = apply_variants(
-    ref_start=0, ref_seq=full_reference_sequence, alt_length=len(variants), variants=variants
+    ref_start=0, ref_seq=full_reference_sequence, alt_length=None, variants=variants
 )
 
 print(f"Modified = {modified_segment_sequence}")
@@ -1,13 +1,26 @@
 import os
 import sys
-import uuid
+from collections.abc import Iterable
+from contextlib import ExitStack
+from pathlib import Path
 from typing import Literal
 
 import click
+import pysam
 
-from .reads.read_generator import QualityModel, ReadGenerator
-from .ref.enums import VariantType
+from .models.model_cache import CACHE_ENV_VAR, ModelCache, QualModelKind, load_quality_model
+from .reads.fragments import InsertSizeDistribution
+from .reads.gc_bias import DEFAULT_GC_OPTIMUM, GCBias
+from .reads.genome_sampler import GenomeReadGenerator, GenomeWindows, read_bed
+from .reads.read_batch import ReadBatch
+from .reads.read_generator import ErrorMode, QualityModel, ReadGenerator
+from .reads.read_names import ReadNamer
+from .ref.enums import LowComplexityMode, ReferenceBackend, VariantType
 from .ref.reference import Reference
+from .ref.region_index import RegionIndex
+from .utils.rng import RngContext
+from .writers.alignment_writer import AlignmentFormat, AlignmentWriter
+from .writers.block_writer import BlockWriter, Compression
 
 CONTEXT_SETTINGS = {"help_option_names": ["-h", "--help"]}
 
@@ -33,6 +46,48 @@ CONTEXT_SETTINGS = {"help_option_names": ["-h", "--help"]}
     type=int,
     help="The end position within the reference genome where this read originates.",
 )
+@click.option(
+    "-g",
+    "--genome",
+    is_flag=True,
+    help=(
+        "Place reads over every contig of a FASTA REF, in proportion to their lengths, instead of "
+        + "within one -c/-s/-e segment (needs --read-length)."
+    ),
+)
+@click.option(
+    "--targets",
+    type=click.Path(exists=True, dir_okay=False),
+    help=(
+        "BED file of target regions every read (or read pair fragment) placed genome-wide "
+        + "must overlap, implies --genome."
+    ),
+)
+@click.option(
+    "--include-gaps",
+    is_flag=True,
+    help="Also place reads genome-wide over runs of N, by default skipped.",
+)
+@click.option(
+    "--low-complexity",
+    default=LowComplexityMode.INCLUDE.value,
+    show_default=True,
+    type=click.Choice([m.value for m in LowComplexityMode]),
+    help=(
+        "Whether reads placed genome-wide may cover low complexity regions (homopolymers and "
+        + "dinucleotide repeats of 10 bases or more), must avoid them, or must overlap them."
+    ),
+)
+@click.option(
+    "--reference-backend",
+    default=ReferenceBackend.FAIDX.value,
+    show_default=True,
+    type=click.Choice([b.value for b in ReferenceBackend]),
+    help=(
+        "How bases are read from a FASTA REF: faidx fetches them through the FASTA index, packed "
+        + "from a memory-mapped 2-bit packed copy, built next to the FASTA on first use."
+    ),
+)
 @click.option(
     "--insertion-probability",
     default=0.01,
@@ -56,9 +111,133 @@ CONTEXT_SETTINGS = {"help_option_names": ["-h", "--help"]}
     "--out-format",
     show_default=True,
     default="fq",
-    type=click.Choice(["fq", "seq", "qual"]),
+    type=click.Choice(["fq", "seq", "qual", "sam", "bam", "cram"]),
     help="format of the output",
 )
+@click.option(
+    "--sort",
+    is_flag=True,
+    help="Coordinate sort sam, bam or cram output.",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, writable=True, allow_dash=True),
+    default="-",
+    show_default=True,
+    help="File to write reads to, - writes to stdout.",
+)
+@click.option(
+    "--compression",
+    type=click.Choice([c.value for c in Compression]),
+    help="Compression of the output, inferred from the output extension (.gz, .bgz) by default.",
+)
+@click.option(
+    "--compress-level",
+    default=6,
+    show_default=True,
+    type=click.IntRange(0, 9),
+    help="Compression level of gzip, BGZF or BAM output.",
+)
+@click.option(
+    "-t",
+    "--threads",
+    "--workers",
+    "workers",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help=(
+        "Number of worker processes to generate reads in (and of threads to compress output "
+        "with), output is identical for any number."
+    ),
+)
+@click.option(
+    "--read-prefix",
+    default="read",
+    show_default=True,
+    help="Prefix of read names, reads are named by their index as PREFIX.INDEX.",
+)
+@click.option(
+    "--truth-names",
+    is_flag=True,
+    help="Append the origin contig, 0-based position, strand and event count to read names.",
+)
+@click.option(
+    "--seed",
+    type=int,
+    help="Seed for all randomness, runs with the same seed produce identical output.",
+)
+@click.option(
+    "-q",
+    "--quality-model",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Quality model (.npz) to simulate quality scores with, as built by hts-synth-model build.",
+)
+@click.option(
+    "-l",
+    "--read-length",
+    type=click.IntRange(min=1),
+    help=(
+        "Number of reference bases covered by each read, reads are placed uniformly within the "
+        + "reference segment. By default every read covers the whole segment."
+    ),
+)
+@click.option(
+    "-d",
+    "--depth",
+    type=click.FloatRange(min=0),
+    help="Mean depth of reads over the reference segment, instead of NREADS (needs --read-length).",
+)
+@click.option(
+    "--insert-size",
+    type=click.FloatRange(min=0, min_open=True),
+    help=(
+        "Mean fragment length, generates NREADS read pairs instead of reads: R1 from the start "
+        + "of each fragment and R2, reverse complemented, from its end (needs --read-length)."
+    ),
+)
+@click.option(
+    "--insert-sd",
+    default=0.0,
+    show_default=True,
+    type=click.FloatRange(min=0),
+    help="Standard deviation of the normally distributed fragment length.",
+)
+@click.option(
+    "--gc-bias",
+    type=click.FloatRange(min=0),
+    help=(
+        "Strength of GC bias of coverage: reads (or fragments) are placed with relative weight "
+        + "exp(-STRENGTH * ((gc - optimum) / 0.5) ** 2) of their GC fraction, e.g. 1 for mild and "
+        + "5 for strong bias. By default placement is uniform (needs --read-length)."
+    ),
+)
+@click.option(
+    "--gc-optimum",
+    default=DEFAULT_GC_OPTIMUM,
+    show_default=True,
+    type=click.FloatRange(0, 1),
+    help="GC fraction of the most covered reads (or fragments) with --gc-bias.",
+)
+@click.option(
+    "-2",
+    "--output2",
+    type=click.Path(dir_okay=False, writable=True),
+    help="File to write the second reads of pairs to, by default pairs are interleaved in OUTPUT.",
+)
+@click.option(
+    "--error-mode",
+    default=ErrorMode.FIXED.value,
+    show_default=True,
+    type=click.Choice([m.value for m in ErrorMode]),
+    help=(
+        "fixed applies each error probability times the read length events of each type to "
+        + "every read; quality errs at each base with the probability of its quality score, "
+        + "using the error probabilities as the relative weights of each type (requires "
+        + "--quality-model)."
+    ),
+)
 @click.argument(
     "reference-sequence",
     metavar="REF",
@@ -73,7 +252,31 @@ def cli(
     deletion_probability: float,
     substitution_probability: float,
     n_reads: int = 1,
-    out_format: Literal["fq", "seq", "qual"] = "fq",  # should probably use an enum
+    out_format: Literal[
+        "fq", "seq", "qual", "sam", "bam", "cram"
+    ] = "fq",  # should probably use an enum
+    seed: int | None = None,
+    workers: int = 1,
+    output: str = "-",
+    compression: str | None = None,
+    compress_level: int = 6,
+    sort: bool = False,
+    read_prefix: str = "read",
+    truth_names: bool = False,
+    quality_model: str | None = None,
+    error_mode: str = ErrorMode.FIXED.value,
+    read_length: int | None = None,
+    depth: float | None = None,
+    insert_size: float | None = None,
+    insert_sd: float = 0.0,
+    gc_bias: float | None = None,
+    gc_optimum: float = DEFAULT_GC_OPTIMUM,
+    output2: str | None = None,
+    reference_backend: str = ReferenceBackend.FAIDX.value,
+    genome: bool = False,
+    targets: str | None = None,
+    include_gaps: bool = False,
+    low_complexity: str = LowComplexityMode.INCLUDE.value,
 ):
     """
     Generate synthetic HTS read data from a reference sequence.
@@ -84,36 +287,322 @@ def cli(
     to simulate realistic sequencing errors.
 
     Returns:\n
-        Outputs the generated read sequence and quality scores to stdout
+        Outputs the generated read sequence and quality scores to stdout or the output file
     """  # noqa: D301
-    quality_model = QualityModel()
+    rng = RngContext(seed)
+    read_namer = ReadNamer(read_prefix, truth_names)
+    # mapped, so that worker processes share the model's tables
+    qualities = load_quality_model(quality_model, mmap=True) if quality_model else QualityModel()
+    if error_mode == ErrorMode.QUALITY and not quality_model:
+        raise click.UsageError("--error-mode quality requires --quality-model")
+    insert_sizes = _insert_sizes(insert_size, insert_sd, read_length)
+    coverage_bias = _gc_bias(gc_bias, gc_optimum, read_length)
+    if output2 is not None and (insert_sizes is None or out_format in AlignmentFormat):
+        raise click.UsageError("--output2 requires --insert-size and a text output format")
     error_probabilities = {
         VariantType.INSERTION: insertion_probability,
         VariantType.DELETION: deletion_probability,
         VariantType.SUBSTITUTION: substitution_probability,
     }
 
-    if os.path.exists(reference_sequence):
-        reference = Reference(reference_sequence)
+    reference: Reference | None = None
+    reference_id: int | None = -1
+    generator: ReadGenerator | GenomeReadGenerator
+    if genome or targets:
+        if read_length is None or not os.path.exists(reference_sequence):
+            raise click.UsageError("--genome requires --read-length and REF to be a FASTA file")
+        reference = Reference(reference_sequence, ReferenceBackend(reference_backend))
+        # reads carry the index of their own contig
+        reference_id = None
+        generator = GenomeReadGenerator(
+            reference,
+            _genome_windows(
+                reference,
+                GenomeReadGenerator.span_for(read_length, insert_sizes),
+                targets,
+                include_gaps,
+                LowComplexityMode(low_complexity),
+            ),
+            qualities,
+            error_probabilities,
+            rng=rng,
+            read_namer=read_namer,
+            error_mode=ErrorMode(error_mode),
+            read_length=read_length,
+            insert_sizes=insert_sizes,
+            gc_bias=coverage_bias,
+        )
+    elif os.path.exists(reference_sequence):
+        reference = Reference(reference_sequence, ReferenceBackend(reference_backend))
 
         if not reference_chrom or not reference_end:
             click.echo("", err=True)
             sys.exit(1)
 
         reference_segment = reference.get_sequence(reference_chrom, reference_start, reference_end)
+        reference_id = reference.reference_id(reference_chrom)
+
+        generator = ReadGenerator(
+            reference_segment,
+            qualities,
+            error_probabilities,
+            rng=rng,
+            read_namer=read_namer,
+            error_mode=ErrorMode(error_mode),
+            read_length=read_length,
+            insert_sizes=insert_sizes,
+            gc_bias=coverage_bias,
+        )
+    else:
+        generator = ReadGenerator(
+            reference_sequence,
+            qualities,
+            error_probabilities,
+            rng=rng,
+            read_namer=read_namer,
+            error_mode=ErrorMode(error_mode),
+            read_length=read_length,
+            insert_sizes=insert_sizes,
+            gc_bias=coverage_bias,
+        )
+
+    if depth is not None:
+        n_reads = _reads_for_depth(generator, depth)
+
+    batches = generator.emit_batches(n_reads, workers=workers)
+
+    if out_format in AlignmentFormat:
+        if reference is None and out_format == AlignmentFormat.CRAM:
+            raise click.UsageError("CRAM output requires REF to be a FASTA file")
+        _write_alignments(
+            batches,
+            output,
+            AlignmentFormat(out_format),
+            reference_sequence if reference is not None else None,
+            reference_id,
+            workers,
+            sort,
+            compress_level,
+        )
+    else:
+        _write_text(
+            batches,
+            output,
+            output2,
+            out_format,
+            Compression(compression) if compression else None,
+            workers,
+            compress_level,
+        )
+
+
+def _insert_sizes(
+    insert_size: float | None, insert_sd: float, read_length: int | None
+) -> InsertSizeDistribution | None:
+    if insert_size is None:
+        return None
+    if read_length is None:
+        raise click.UsageError("--insert-size requires --read-length")
+    return InsertSizeDistribution(insert_size, insert_sd)
+
+
+def _gc_bias(strength: float | None, optimum: float, read_length: int | None) -> GCBias | None:
+    if strength is None:
+        return None
+    if read_length is None:
+        raise click.UsageError("--gc-bias requires --read-length")
+    return GCBias(strength, optimum)
+
+
+def _genome_windows(
+    reference: Reference,
+    span: int,
+    targets: str | None,
+    include_gaps: bool,
+    low_complexity: LowComplexityMode,
+) -> GenomeWindows:
+    contigs, lengths = reference.fasta.references, reference.fasta.lengths
+    target_regions = read_bed(targets, contigs) if targets else None
+    regions = None
+    placement_targets = target_regions
+    if not include_gaps or low_complexity != LowComplexityMode.INCLUDE:
+        index = RegionIndex.open_or_build(reference.fasta_path)
+        exclude = low_complexity == LowComplexityMode.EXCLUDE
+        regions = index.usable(None, include_gaps, exclude)
+        if low_complexity == LowComplexityMode.ONLY:
+            # reads must overlap a low complexity run (within a target, if any)
+            placement_targets = (
+                index.low_complexity
+                if target_regions is None
+                else target_regions.intersect(index.low_complexity)
+            )
+    windows = GenomeWindows.from_lengths(
+        contigs, lengths, span, regions=regions, targets=placement_targets
+    )
+    if target_regions is not None:
+        covered = windows.segments().overlaps(
+            target_regions.contig_ids, target_regions.starts, target_regions.ends
+        )
+        dropped = len(target_regions) - int(covered.sum())
+        if dropped:
+            click.echo(
+                f"Skipping {dropped} of {len(target_regions)} targets without room for a read "
+                + f"(or fragment) of {span} bases around them",
+                err=True,
+            )
+    if len(windows) == 0:
+        raise click.UsageError(
+            f"No room for a read (or fragment) of {span} bases in the regions to sample"
+        )
+    return windows
+
+
+def _reads_for_depth(generator: ReadGenerator | GenomeReadGenerator, depth: float) -> int:
+    if isinstance(generator, GenomeReadGenerator):
+        return generator.reads_for_depth(depth)
+    if generator.fragment_sampler is None:
+        raise click.UsageError("--depth requires --read-length")
+    if generator.insert_sizes is not None:
+        return generator.fragment_sampler.pairs_for_depth(depth)
+    return generator.fragment_sampler.reads_for_depth(depth)
+
+
+def _write_alignments(
+    batches: Iterable[ReadBatch],
+    output: str,
+    out_format: AlignmentFormat,
+    reference_path: str | None,
+    reference_id: int | None,
+    threads: int,
+    sort: bool,
+    compress_level: int,
+) -> None:
+    if reference_path is None:
+        header = pysam.AlignmentHeader.from_dict({"HD": {"VN": "1.6", "SO": "unsorted"}})
+    else:
+        header = Reference(reference_path).alignment_header()
+
+    with AlignmentWriter(
+        output,
+        header,
+        out_format,
+        threads=threads,
+        sort=sort,
+        reference_filename=reference_path,
+        level=compress_level,
+    ) as writer:
+        for batch in batches:
+            if reference_id is not None:
+                batch.reference_ids[batch.reference_ids >= 0] = reference_id
+                batch.next_reference_ids[batch.next_reference_ids >= 0] = reference_id
+            writer.write_batch(batch)
+
 
-        generator = ReadGenerator(reference_segment, quality_model, error_probabilities)
+def _write_text(
+    batches: Iterable[ReadBatch],
+    output: str,
+    output2: str | None,
+    out_format: str,
+    compression: Compression | None,
+    threads: int,
+    compress_level: int,
+) -> None:
+    if output == "-":
+        writer = BlockWriter(
+            sys.stdout.buffer, compression or Compression.NONE, compress_level, threads
+        )
     else:
-        generator = ReadGenerator(reference_sequence, quality_model, error_probabilities)
-
-    for read in generator.emit_reads(n_reads):
-        match out_format:
-            case "fq":
-                click.echo(f"@read-{str(uuid.uuid4())[:16]}")
-                click.echo(read.query_sequence)
-                click.echo("+")
-                click.echo(read.query_qualities_str)
-            case "seq":
-                click.echo(read.query_sequence)
-            case "qual":
-                click.echo(read.query_qualities_str)
+        writer = BlockWriter.open(output, compression, compress_level, threads)
+
+    with ExitStack() as stack:
+        _ = stack.enter_context(writer)
+        if output2 is None:
+            outputs = [(writer, slice(None))]
+        else:
+            # interleaved pairs are split between the two files, R1 then R2
+            writer2 = stack.enter_context(
+                BlockWriter.open(output2, compression, compress_level, threads)
+            )
+            outputs = [(writer, slice(0, None, 2)), (writer2, slice(1, None, 2))]
+
+        for batch in batches:
+            for out, rows in outputs:
+                reads = batch if output2 is None else batch.take(rows)
+                match out_format:
+                    case "fq":
+                        out.write(reads.to_fastq())
+                    case "seq":
+                        out.write(reads.to_sequence_lines())
+                    case "qual":
+                        out.write(reads.to_quality_lines())
+                    case _:
+                        raise ValueError(f"Unknown output format {out_format}")
+
+
+@click.group(context_settings=CONTEXT_SETTINGS)
+def model_cli():
+    """
+    Build and manage the quality models hts-synth simulates quality scores with.
+    """
+
+
+@model_cli.command("build")
+@click.option(
+    "-k",
+    "--kind",
+    default=QualModelKind.MARKOV.value,
+    show_default=True,
+    type=click.Choice([k.value for k in QualModelKind]),
+    help="Kind of quality model to learn.",
+)
+@click.option(
+    "--bin-edges",
+    help="Comma separated bounds of the quality score bins of Markov models, one bin per score "
+    + "by default.",
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False, writable=True),
+    help=f"Model cache directory, defaults to ${CACHE_ENV_VAR} or ~/.cache/hts_synth.",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Also save the model to this file.",
+)
+@click.option("--rebuild", is_flag=True, help="Learn the model again even if already cached.")
+@click.option(
+    "-t",
+    "--workers",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help=(
+        "Number of worker processes. Uncompressed fastq files are split into record-aligned "
+        + "byte ranges shared between the workers, gzipped files are learned whole."
+    ),
+)
+@click.argument("fastqs", metavar="FASTQ...", nargs=-1, required=True, type=click.Path(exists=True))
+def build_model(
+    fastqs: tuple[str, ...],
+    kind: str,
+    bin_edges: str | None = None,
+    cache_dir: str | None = None,
+    output: str | None = None,
+    rebuild: bool = False,
+    workers: int = 1,
+):
+    """
+    Learn a quality model from FASTQ files into the model cache, unless already cached.
+
+    Prints the path of the cached model, which can be passed to hts-synth --quality-model.
+    """
+    cache = ModelCache(Path(cache_dir)) if cache_dir else ModelCache.default()
+    edges = [int(edge) for edge in bin_edges.split(",")] if bin_edges else None
+    model, path = cache.get_or_learn(
+        QualModelKind(kind), fastqs, edges, workers=workers, rebuild=rebuild
+    )
+    if output:
+        model.save(output)
+    click.echo(path)
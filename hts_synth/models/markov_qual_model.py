@@ -0,0 +1,434 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any, ClassVar, SupportsIndex, override
+
+import numpy as np
+import numpy.typing as npt
+
+from ..utils.alias import AliasTable
+from ..utils.npz import load_npz
+from .qual_model import (
+    MAX_PHRED,
+    FastqShard,
+    FastqSource,
+    QualSimBase,
+    check_model_file,
+    fastq_shards,
+    quality_blocks,
+)
+
+# One state per Phred score
+DEFAULT_BIN_EDGES = np.arange(MAX_PHRED + 2)
+
+
+class MarkovQualModel(QualSimBase):
+    """
+    Position-conditioned Markov model of base quality.
+
+    Scores are binned into states, and the state of each position depends on the state of the
+    previous position through a transition matrix specific to that position. This reproduces the
+    autocorrelated quality tracks of real reads (runs of high quality, dips, decay along the read)
+    which independent per-position distributions cannot.
+
+    Every row of every transition matrix is stored as a Walker alias table, so each step of each
+    read costs O(1) whatever the number of states, and each step is drawn for a whole batch of reads
+    at once. Reads longer than the model reuse its last transition matrix.
+
+    Models are saved uncompressed, so a model loaded with mmap maps its tables from the file
+    rather than reading them, and pickles as a reference to the file: worker processes map the
+    same pages instead of each receiving a copy of the tables.
+
+    Attributes:
+        bin_values (npt.NDArray[np.uint8]): (states,) Phred score emitted in each state
+        initial (npt.NDArray[np.float64]): (states,) probability of each state at the first position
+        transitions (npt.NDArray[np.float64]): (positions - 1, states, states) probability of moving
+            from each state at a position to each state at the next
+    """
+
+    MODEL_NAME: ClassVar[str] = "markov"
+
+    bin_values: npt.NDArray[np.uint8]
+    initial: npt.NDArray[np.float64]
+    transitions: npt.NDArray[np.float64]
+    _initial_table: AliasTable
+    _transition_table: AliasTable
+    _path: Path | None
+
+    def __init__(
+        self,
+        bin_values: npt.NDArray[np.uint8],
+        initial: npt.NDArray[np.float64],
+        transitions: npt.NDArray[np.float64],
+        rng: np.random.Generator | None = None,
+        default_seed: int = 24601,
+        tables: tuple[AliasTable, AliasTable] | None = None,
+        normalized: bool = False,
+    ):
+        """
+        Initialise object.
+
+        Args:
+            bin_values (npt.NDArray[np.uint8]): Phred score emitted in each state
+            initial (npt.NDArray[np.float64]): (unnormalised) distribution of the first state
+            transitions (npt.NDArray[np.float64]): (unnormalised) transition matrix of each position
+            rng (np.random.Generator | None): Random number generator to use for simulation, None
+                will instantiate a generator seeded with default_seed
+            tables (tuple[AliasTable, AliasTable] | None): Prebuilt alias tables of initial and of
+                the flattened transitions, e.g. loaded from a saved model; None builds them
+            normalized (bool): Whether initial and transitions are already normalised, e.g. loaded
+                from a saved model, in which case they are kept as given rather than copied
+        """
+        super().__init__(rng if rng is not None else np.random.default_rng(default_seed))
+        n_states = len(bin_values)
+        if initial.shape != (n_states,) or transitions.shape[1:] != (n_states, n_states):
+            raise ValueError("Initial and transition probabilities must match the number of states")
+
+        self.bin_values = np.asarray(bin_values, dtype=np.uint8)
+        self._path = None
+        if normalized:
+            self.initial, self.transitions = initial, transitions
+        else:
+            self.initial = initial / initial.sum()
+            row_totals = transitions.sum(axis=2, keepdims=True)
+            self.transitions = np.divide(
+                transitions, row_totals, out=np.zeros_like(transitions), where=row_totals > 0
+            )
+        if tables is None:
+            tables = (
+                AliasTable.from_weights(self.initial[None, :]),
+                AliasTable.from_weights(self.transitions.reshape(-1, n_states)),
+            )
+        self._initial_table, self._transition_table = tables
+
+    @property
+    def n_states(self) -> int:
+        return len(self.bin_values)
+
+    @property
+    @override
+    def read_length(self) -> int:
+        return len(self.transitions) + 1
+
+    @override
+    def sample_batch(self, n: int, read_length: int | None = None) -> npt.NDArray[np.uint8]:
+        """
+        Simulate the quality arrays of n reads, one step along all reads at a time.
+
+        Args:
+            n (int): number of reads
+            read_length (int | None): length of the reads, defaults to the model length
+
+        Returns:
+            npt.NDArray[np.uint8]: (n, read_length) matrix of Phred scores
+        """
+        read_length = self.read_length if read_length is None else read_length
+        states = np.zeros((n, read_length), dtype=np.intp)
+        if read_length == 0:
+            return states.astype(np.uint8)
+
+        states[:, 0] = self._initial_table.sample(self._rng, np.zeros(n, dtype=np.intp))
+        last_step = len(self.transitions) - 1
+        for i in range(1, read_length):
+            if last_step < 0:
+                states[:, i] = states[:, i - 1]
+                continue
+            step = min(i - 1, last_step)
+            states[:, i] = self._transition_table.sample(
+                self._rng, step * self.n_states + states[:, i - 1]
+            )
+        return self.bin_values[states]
+
+    @override
+    def save(self, path: str | os.PathLike[str]) -> None:
+        """
+        Save the model, including its alias tables, to an uncompressed .npz file.
+        """
+        np.savez(
+            path,
+            model=self.MODEL_NAME,
+            format_version=self.FORMAT_VERSION,
+            bin_values=self.bin_values,
+            initial=self.initial,
+            transitions=self.transitions,
+            initial_prob=self._initial_table.prob,
+            initial_alias=self._initial_table.alias,
+            transition_prob=self._transition_table.prob,
+            transition_alias=self._transition_table.alias,
+        )
+
+    @classmethod
+    @override
+    def load(
+        cls,
+        path: str | os.PathLike[str],
+        rng: np.random.Generator | None = None,
+        mmap: bool = False,
+    ) -> MarkovQualModel:
+        """
+        Load a model saved with save, without rebuilding its alias tables.
+
+        Args:
+            path (str | os.PathLike[str]): Path of the .npz file
+            rng (np.random.Generator | None): Random number generator to use for simulation
+            mmap (bool): Whether to memory-map the tables read-only rather than read them, e.g.
+                for a model shared by worker processes
+        """
+        data = load_npz(path, mmap)
+        check_model_file(data, cls, path)
+        model = cls(
+            data["bin_values"],
+            data["initial"],
+            data["transitions"],
+            rng=rng,
+            tables=(
+                AliasTable(data["initial_prob"], data["initial_alias"]),
+                AliasTable(data["transition_prob"], data["transition_alias"]),
+            ),
+            normalized=True,
+        )
+        if mmap:
+            model._path = Path(path).resolve()
+        return model
+
+    @override
+    def __reduce_ex__(self, protocol: SupportsIndex) -> str | tuple[Any, ...]:
+        if self._path is None:
+            return super().__reduce_ex__(protocol)
+        # map the saved tables again rather than copying them
+        return (_load_mapped, (self._path, self._rng))
+
+
+def _load_mapped(path: Path, rng: np.random.Generator) -> MarkovQualModel:
+    return MarkovQualModel.load(path, rng, mmap=True)
+
+
+def _learn_fastq_shard(
+    shard: FastqShard, bin_edges: npt.ArrayLike | None = None
+) -> MarkovQualLearner:
+    path, start, end = shard
+    return MarkovQualLearner.learn_fastq(path, bin_edges=bin_edges, start=start, end=end)
+
+
+class MarkovQualLearner:
+    """
+    Learner of MarkovQualModel parameters from real data.
+
+    Counts initial states and per-position state transitions from blocks of reads with bincount,
+    so learning runs at array speed. Reads may vary in length, and learners of different inputs
+    can be merged.
+
+    Attributes:
+        bin_edges (npt.NDArray[np.int64]): (states + 1,) lower bound (inclusive) of the scores
+            in each state, and the upper bound (exclusive) of the last
+        initial_counts (npt.NDArray[np.int64]): (states,) observations of each first state
+        transition_counts (npt.NDArray[np.int64]): (positions - 1, states, states) observed
+            transitions from each state at a position to each state at the next
+        value_sums (npt.NDArray[np.float64]): (states,) sum of the scores observed in each state
+        value_counts (npt.NDArray[np.int64]): (states,) number of scores observed in each state
+    """
+
+    default_block_size: ClassVar[int] = 10_000
+
+    bin_edges: npt.NDArray[np.int64]
+    initial_counts: npt.NDArray[np.int64]
+    transition_counts: npt.NDArray[np.int64]
+    value_sums: npt.NDArray[np.float64]
+    value_counts: npt.NDArray[np.int64]
+    _nobs: int
+
+    def __init__(self, bin_edges: npt.ArrayLike | None = None) -> None:
+        """
+        Initialise object without observations.
+
+        Args:
+            bin_edges (npt.ArrayLike | None): increasing bounds of the score bins, defaults to one
+                bin per Phred score. Scores outside the bounds fall in the first or last bin
+        """
+        self.bin_edges = np.asarray(
+            DEFAULT_BIN_EDGES if bin_edges is None else bin_edges, dtype=np.int64
+        )
+        n_states = len(self.bin_edges) - 1
+        if n_states < 1 or np.any(np.diff(self.bin_edges) <= 0):
+            raise ValueError("Bin edges must be strictly increasing and define at least one bin")
+        self.initial_counts = np.zeros(n_states, dtype=np.int64)
+        self.transition_counts = np.zeros((0, n_states, n_states), dtype=np.int64)
+        self.value_sums = np.zeros(n_states, dtype=np.float64)
+        self.value_counts = np.zeros(n_states, dtype=np.int64)
+        self._nobs = 0
+
+    @property
+    def n_states(self) -> int:
+        return len(self.bin_edges) - 1
+
+    @property
+    def observations(self) -> int:
+        """
+        Number of total observations the model has learned from so far.
+        """
+        return self._nobs
+
+    def _grow(self, n_steps: int) -> None:
+        if n_steps > len(self.transition_counts):
+            self.transition_counts = np.pad(
+                self.transition_counts, ((0, n_steps - len(self.transition_counts)), (0, 0), (0, 0))
+            )
+
+    def update_block(
+        self, quals: npt.ArrayLike, lengths: npt.NDArray[np.int64] | None = None
+    ) -> None:
+        """
+        Update the counts with a block of reads.
+
+        Args:
+            quals (npt.ArrayLike): (reads, positions) matrix of quality scores
+            lengths (npt.NDArray[np.int64] | None): length of each read if rows are padded
+        """
+        block = np.atleast_2d(np.asarray(quals))
+        n_reads, width = block.shape
+        if lengths is None:
+            lengths = np.full(n_reads, width, dtype=np.int64)
+        valid = np.arange(width) < lengths[:, None]
+        states = np.clip(
+            np.searchsorted(self.bin_edges, block, side="right") - 1, 0, self.n_states - 1
+        )
+
+        self._nobs += n_reads
+        if width == 0:
+            return
+        self.initial_counts += np.bincount(states[valid[:, 0], 0], minlength=self.n_states)
+        self.value_sums += np.bincount(
+            states[valid], weights=block[valid].astype(np.float64), minlength=self.n_states
+        )
+        self.value_counts += np.bincount(states[valid], minlength=self.n_states)
+
+        # both ends of a transition are valid where its second position is
+        pairs = valid[:, 1:]
+        n_steps = width - 1
+        self._grow(n_steps)
+        index = (np.nonzero(pairs)[1] * self.n_states + states[:, :-1][pairs]) * self.n_states
+        index += states[:, 1:][pairs]
+        self.transition_counts[:n_steps] += np.bincount(
+            index, minlength=n_steps * self.n_states**2
+        ).reshape(n_steps, self.n_states, self.n_states)
+
+    def merge(self, other: MarkovQualLearner) -> None:
+        """
+        Combine the observations of another learner, with the same bins, into this one.
+        """
+        if not np.array_equal(self.bin_edges, other.bin_edges):
+            raise ValueError("Cannot merge learners with different bins")
+        self._grow(len(other.transition_counts))
+        self.transition_counts[: len(other.transition_counts)] += other.transition_counts
+        self.initial_counts += other.initial_counts
+        self.value_sums += other.value_sums
+        self.value_counts += other.value_counts
+        self._nobs += other._nobs
+
+    def update_fastq(
+        self,
+        fq: FastqSource,
+        block_size: int | None = None,
+        start: int = 0,
+        end: int | None = None,
+    ) -> None:
+        """
+        Update the counts with all reads of a fastq, given as a path or a pysam file handle.
+
+        Args:
+            fq (FastqSource): Path of a plain or gzipped fastq, or open pysam file handle to fastq
+            block_size (int | None): number of reads stacked per block, defaults to default_block_size
+            start (int): byte offset of the range of an uncompressed fastq path to learn from
+            end (int | None): byte offset of the end of the range, None for the end of the file
+        """
+        for quals, lengths in quality_blocks(fq, block_size or self.default_block_size, start, end):
+            self.update_block(quals, lengths)
+
+    @classmethod
+    def learn_fastq(
+        cls,
+        fq: FastqSource,
+        block_size: int | None = None,
+        bin_edges: npt.ArrayLike | None = None,
+        start: int = 0,
+        end: int | None = None,
+    ) -> MarkovQualLearner:
+        """
+        Learn from all reads of a fastq, given as a path or a file handle as opened by pysam.
+
+        Args:
+            fq (FastqSource): Path of a plain or gzipped fastq, or open pysam file handle to fastq
+            block_size (int | None): number of reads stacked per block, defaults to default_block_size
+            bin_edges (npt.ArrayLike | None): bounds of the score bins, see __init__
+            start (int): byte offset of the range of an uncompressed fastq path to learn from
+            end (int | None): byte offset of the end of the range, None for the end of the file
+        """
+        learner = cls(bin_edges)
+        learner.update_fastq(fq, block_size, start, end)
+        return learner
+
+    @classmethod
+    def learn_fastqs(
+        cls, paths: Sequence[str], workers: int = 1, bin_edges: npt.ArrayLike | None = None
+    ) -> MarkovQualLearner:
+        """
+        Learn from several fastq files in parallel, and merge.
+
+        With several workers, uncompressed files are also split into byte ranges (see
+        fastq_shards), so a single large file is learned by all workers.
+
+        Args:
+            paths (Sequence[str]): Paths of the fastq files
+            workers (int): Number of worker processes
+            bin_edges (npt.ArrayLike | None): bounds of the score bins, see __init__
+        """
+        learn = partial(_learn_fastq_shard, bin_edges=bin_edges)
+        if workers > 1:
+            with ProcessPoolExecutor(
+                workers, mp_context=multiprocessing.get_context("spawn")
+            ) as pool:
+                learners = list(pool.map(learn, fastq_shards(paths, workers)))
+        else:
+            learners = [learn((path, 0, None)) for path in paths]
+
+        learner = cls(bin_edges)
+        for partial_learner in learners:
+            learner.merge(partial_learner)
+        return learner
+
+    def yield_model(self, rng: np.random.Generator | None = None) -> MarkovQualModel:
+        """
+        Build the model learned so far.
+
+        Each state emits the mean score observed in it (its lower bound if never observed). States
+        never observed at a position move to the states of the next position in proportion to how
+        often those were observed.
+
+        Args:
+            rng (np.random.Generator | None): Random number generator of the model
+        """
+        if not self.initial_counts.any():
+            raise RuntimeError("Insufficient observations to finalise")
+
+        observed = self.value_counts > 0
+        bin_values = np.where(
+            observed,
+            np.rint(self.value_sums / np.maximum(self.value_counts, 1)),
+            self.bin_edges[:-1],
+        )
+
+        transitions = self.transition_counts.astype(np.float64)
+        next_marginals = transitions.sum(axis=1, keepdims=True)
+        unobserved = transitions.sum(axis=2, keepdims=True) == 0
+        transitions = np.where(unobserved, next_marginals, transitions)
+        return MarkovQualModel(
+            np.clip(bin_values, 0, MAX_PHRED).astype(np.uint8),
+            self.initial_counts.astype(np.float64),
+            transitions,
+            rng=rng,
+        )
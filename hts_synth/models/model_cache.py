@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import uuid
+from collections.abc import Sequence
+from dataclasses import dataclass
+from enum import StrEnum
+from pathlib import Path
+from typing import ClassVar
+
+import numpy as np
+
+from .markov_qual_model import MarkovQualLearner, MarkovQualModel
+from .qual_model import BlockQualLearner, NaiveQualSim, QualSimBase
+
+CACHE_ENV_VAR = "HTS_SYNTH_CACHE"
+
+
+class QualModelKind(StrEnum):
+    NAIVE = "naive"
+    MARKOV = "markov"
+
+    @property
+    def model_class(self) -> type[QualSimBase]:
+        match self:
+            case QualModelKind.NAIVE:
+                return NaiveQualSim
+            case QualModelKind.MARKOV:
+                return MarkovQualModel
+
+
+def load_quality_model(
+    path: str | os.PathLike[str], rng: np.random.Generator | None = None, mmap: bool = False
+) -> QualSimBase:
+    """
+    Load a quality model saved by any model's save, whatever its kind.
+
+    Args:
+        path (str | os.PathLike[str]): Path of the .npz file
+        rng (np.random.Generator | None): Random number generator to use for simulation
+        mmap (bool): Whether to memory-map the model parameters, e.g. for a model shared by
+            worker processes
+    """
+    with np.load(path) as data:
+        kind = QualModelKind(str(data["model"]))
+    return kind.model_class.load(path, rng, mmap)
+
+
+def learn_quality_model(
+    kind: QualModelKind,
+    paths: Sequence[str],
+    workers: int = 1,
+    bin_edges: Sequence[int] | None = None,
+    rng: np.random.Generator | None = None,
+) -> QualSimBase:
+    """
+    Learn a quality model of the given kind from fastq files.
+
+    Args:
+        kind (QualModelKind): Kind of model to learn
+        paths (Sequence[str]): Paths of the fastq files (plain or gzipped)
+        workers (int): Number of worker processes, sharing uncompressed files as byte ranges
+            (see fastq_shards) and learning gzipped files whole
+        bin_edges (Sequence[int] | None): Bounds of the score bins of Markov models
+        rng (np.random.Generator | None): Random number generator of the model
+    """
+    match kind:
+        case QualModelKind.NAIVE:
+            if bin_edges is not None:
+                raise ValueError("Naive quality models do not bin scores")
+            return NaiveQualSim(BlockQualLearner.model_from_fastqs(paths, workers), rng)
+        case QualModelKind.MARKOV:
+            return MarkovQualLearner.learn_fastqs(paths, workers, bin_edges).yield_model(rng)
+
+
+def fastq_digest(paths: Sequence[str | os.PathLike[str]], chunk_size: int = 1 << 20) -> str:
+    """
+    Hash the contents of fastq files (as stored, so gzipped files are not decompressed).
+
+    The order of the files matters, their names do not.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        with open(path, "rb") as handle:
+            while chunk := handle.read(chunk_size):
+                digest.update(chunk)
+        # separate files so that moving bytes between them changes the digest
+        digest.update(b"\0" + str(os.path.getsize(path)).encode() + b"\0")
+    return digest.hexdigest()
+
+
+def default_cache_directory() -> Path:
+    """
+    Get the cache directory, $HTS_SYNTH_CACHE, else hts_synth in $XDG_CACHE_HOME or ~/.cache.
+    """
+    if directory := os.environ.get(CACHE_ENV_VAR):
+        return Path(directory)
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "hts_synth"
+
+
+@dataclass(slots=True, frozen=True)
+class ModelCache:
+    """
+    On-disk cache of learned quality models.
+
+    Models are stored as .npz files named by a key hashing the contents of the fastq files they
+    were learned from, the kind of model and format version, and the learner parameters. Models
+    are learned once, then loaded by every later run (and every worker process) instead.
+    Files are written under a temporary name and renamed into place, so concurrent builders
+    never see partial files and at worst learn the same model twice.
+
+    Attributes:
+        directory (Path): Directory holding the cached models, created on first write
+
+    Example:
+        >>> cache = ModelCache(Path("models"))
+        >>> model, path = cache.get_or_learn(QualModelKind.MARKOV, ["reads.fq.gz"])  # doctest: +SKIP
+    """
+
+    directory: Path
+
+    SUFFIX: ClassVar[str] = ".npz"
+
+    @classmethod
+    def default(cls) -> ModelCache:
+        return cls(default_cache_directory())
+
+    def key(
+        self,
+        kind: QualModelKind,
+        paths: Sequence[str],
+        bin_edges: Sequence[int] | None = None,
+    ) -> str:
+        """
+        Get the cache key of a model learned from the given files with the given parameters.
+        """
+        params = {
+            "kind": kind.value,
+            "format_version": kind.model_class.FORMAT_VERSION,
+            "bin_edges": None if bin_edges is None else [int(edge) for edge in bin_edges],
+            "fastq": fastq_digest(paths),
+        }
+        encoded = json.dumps(params, sort_keys=True).encode()
+        return f"{kind.value}-{hashlib.blake2b(encoded, digest_size=16).hexdigest()}"
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}{self.SUFFIX}"
+
+    def load(
+        self, key: str, rng: np.random.Generator | None = None, mmap: bool = False
+    ) -> QualSimBase | None:
+        """
+        Load a cached model, or None if it is not cached.
+
+        Cached models are written once and replaced atomically, so they can safely be
+        memory-mapped with mmap.
+        """
+        path = self.path(key)
+        if not path.exists():
+            return None
+        return load_quality_model(path, rng, mmap)
+
+    def store(self, key: str, model: QualSimBase) -> Path:
+        """
+        Save a model to the cache, replacing any model of the same key.
+
+        Returns:
+            Path: Path of the cached model
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path(key)
+        temporary = self.directory / f".{key}.{uuid.uuid4().hex}{self.SUFFIX}"
+        try:
+            model.save(temporary)
+            os.replace(temporary, path)
+        finally:
+            temporary.unlink(missing_ok=True)
+        return path
+
+    def get_or_learn(
+        self,
+        kind: QualModelKind,
+        paths: Sequence[str],
+        bin_edges: Sequence[int] | None = None,
+        workers: int = 1,
+        rng: np.random.Generator | None = None,
+        rebuild: bool = False,
+        mmap: bool = False,
+    ) -> tuple[QualSimBase, Path]:
+        """
+        Load a model from the cache, learning and caching it first if not cached.
+
+        Args:
+            kind (QualModelKind): Kind of model
+            paths (Sequence[str]): Paths of the fastq files to learn from
+            bin_edges (Sequence[int] | None): Bounds of the score bins of Markov models
+            workers (int): Number of worker processes to learn with
+            rng (np.random.Generator | None): Random number generator of the model
+            rebuild (bool): Whether to learn the model again even if cached
+            mmap (bool): Whether to memory-map a cached model rather than read it
+
+        Returns:
+            tuple[QualSimBase, Path]: The model and the path of its cached file
+        """
+        key = self.key(kind, paths, bin_edges)
+        if not rebuild and (model := self.load(key, rng, mmap)) is not None:
+            return model, self.path(key)
+        model = learn_quality_model(kind, paths, workers, bin_edges, rng)
+        return model, self.store(key, model)
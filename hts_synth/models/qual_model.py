@@ -1,11 +1,34 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+from abc import ABC, abstractmethod
 from array import array
-from collections.abc import Sequence
-from typing import Any
+from collections.abc import Iterator, Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, ClassVar, override
 
 import numpy as np
+import numpy.typing as npt
 import pysam
 
-from hts_synth.utils.online_mean import WelfordsRunningMean
+from hts_synth.reads.read_batch import PHRED_OFFSET
+from hts_synth.utils.arrays import ragged_to_padded
+from hts_synth.utils.fastq_reader import read_fastq_blocks, split_fastq
+from hts_synth.utils.npz import load_npz
+from hts_synth.utils.online_stats import OnlineStats
+
+# Highest Phred score representable as printable Phred+33 ASCII ("~")
+MAX_PHRED = 93
+
+# Probability that a base call is wrong, 10^(-Q/10), indexed by Phred score (any uint8)
+PHRED_ERROR_PROBABILITIES = 10.0 ** (-np.arange(256) / 10)
+
+# An open pysam fastq handle, or the path of a plain or gzipped fastq
+type FastqSource = pysam.FastxFile | str | os.PathLike[str]
+
+# The path of a fastq and the byte range [start, end) of it to learn from (see read_fastq_blocks)
+type FastqShard = tuple[str, int, int | None]
 
 
 def refine_quals(
@@ -32,7 +55,131 @@ class NaiveQualModelBase:
     pass
 
 
-class NaiveQualSim(NaiveQualModelBase):
+def check_model_file(
+    data: Mapping[str, npt.NDArray[Any]], model: type[QualSimBase], path: str | os.PathLike[str]
+) -> None:
+    """
+    Check that the contents of a saved model file are of the given model and format version.
+
+    Raises:
+        ValueError: if the file holds another model or format version
+    """
+    name, version = str(data["model"]), int(data["format_version"])
+    if (name, version) != (model.MODEL_NAME, model.FORMAT_VERSION):
+        raise ValueError(
+            f"{path} holds a {name} model (format {version}), expected {model.MODEL_NAME} "
+            + f"(format {model.FORMAT_VERSION})"
+        )
+
+
+class QualSimBase(NaiveQualModelBase, ABC):
+    """
+    Base of quality models which simulate quality arrays for batches of reads.
+
+    Subclasses implement sample_batch, drawing a whole (n, read length) matrix of Phred scores at
+    once; streaming and ragged (variable read length) sampling are built on it.
+    """
+
+    default_chunk_size: ClassVar[int] = 10_000
+    # name and version of the saved model format, see save and load
+    MODEL_NAME: ClassVar[str]
+    FORMAT_VERSION: ClassVar[int] = 1
+
+    _rng: np.random.Generator
+
+    def __init__(self, rng: np.random.Generator):
+        """
+        Initialise object.
+
+        Args:
+            rng (np.random.Generator): Random number generator to use for simulation
+        """
+        self._rng = rng
+
+    def reseed(self, rng: np.random.Generator) -> None:
+        """
+        Replace the random number generator used for simulation.
+        """
+        self._rng = rng
+
+    @property
+    @abstractmethod
+    def read_length(self) -> int: ...
+
+    @abstractmethod
+    def save(self, path: str | os.PathLike[str]) -> None:
+        """
+        Save the model to a .npz file which load can read back.
+        """
+
+    @classmethod
+    @abstractmethod
+    def load(
+        cls,
+        path: str | os.PathLike[str],
+        rng: np.random.Generator | None = None,
+        mmap: bool = False,
+    ) -> QualSimBase:
+        """
+        Load a model saved with save, memory-mapping its parameters read-only if mmap.
+        """
+
+    @abstractmethod
+    def sample_batch(self, n: int, read_length: int | None = None) -> npt.NDArray[np.uint8]:
+        """
+        Simulate the quality arrays of n reads.
+
+        Args:
+            n (int): number of reads
+            read_length (int | None): length of the reads, defaults to the model length
+
+        Returns:
+            npt.NDArray[np.uint8]: (n, read_length) matrix of Phred scores
+        """
+
+    def yield_batches(
+        self, n: int, chunk_size: int | None = None
+    ) -> Iterator[npt.NDArray[np.uint8]]:
+        """
+        Simulate n quality arrays, streamed as matrices of at most chunk_size reads.
+
+        Args:
+            n (int): total number of results to return
+            chunk_size (int | None): maximum number of reads per matrix, defaults to default_chunk_size
+        """
+        chunk_size = chunk_size or self.default_chunk_size
+        for start in range(0, n, chunk_size):
+            yield self.sample_batch(min(chunk_size, n - start))
+
+    def yield_n(self, n: int, chunk_size: int | None = None) -> Iterator[list[int]]:
+        """
+        Return n simulated quality arrays.
+
+        Scores are sampled in chunks (see yield_batches) and handed out one read at a time.
+
+        Args:
+            n (int): total number of results to return
+            chunk_size (int | None): number of reads sampled at once, defaults to default_chunk_size
+        """
+        for batch in self.yield_batches(n, chunk_size):
+            yield from batch.tolist()
+
+    def get_quality_arrays(self, lengths: npt.NDArray[np.int64]) -> npt.NDArray[np.uint8]:
+        """
+        Simulate quality scores for a batch of reads of the given lengths.
+
+        Args:
+            lengths (npt.NDArray[np.int64]): The length of each read.
+
+        Returns:
+            npt.NDArray[np.uint8]: Quality scores of all reads, back to back.
+        """
+        max_length = int(lengths.max()) if len(lengths) else 0
+        quals = self.sample_batch(len(lengths), max_length)
+        return quals[np.arange(max_length) < lengths[:, None]]
+
+
+class NaiveQualSim(QualSimBase):
     """
     A naive model of base quality which can simulate quality arrays based on input per-position normal distributions.
 
@@ -42,6 +189,9 @@ class NaiveQualSim(NaiveQualModelBase):
     For each position the model simply samples a score from a normal distribution with the provided mean and (sample) SD.
     Read length is implicit to the length of the model parameters provided at init.
 
+    Scores are sampled for many reads at once as an (n, read length) matrix, rounded and clipped to the valid
+    Phred range [0, MAX_PHRED], and returned as uint8 arrays ready for a ReadBatch.
+
     The class also contains an online learning algorithm to learn parameters from an input pysam.FastxFile (fastq).
     The algorithm uses Welford's Running Mean so as to be reasonably efficient.
 
@@ -51,9 +201,12 @@ class NaiveQualSim(NaiveQualModelBase):
         rng (np.random.Generator): Random number generator to use for simulation, None will instantiate an unseeded generator
     """
 
+    MODEL_NAME: ClassVar[str] = "naive"
+
     means: list[float]
     sds: list[float]
-    _rng: np.random.Generator
+    _means: npt.NDArray[np.float64]
+    _sds: npt.NDArray[np.float64]
 
     def __init__(
         self,
@@ -70,38 +223,84 @@ class NaiveQualSim(NaiveQualModelBase):
         """
         self.means = [x[0] for x in distribution_by_posn]
         self.sds = [x[1] for x in distribution_by_posn]
-        if rng is not None:
-            self._rng = rng
+        self._means = np.asarray(self.means, dtype=np.float64)
+        self._sds = np.asarray(self.sds, dtype=np.float64)
+        super().__init__(rng if rng is not None else np.random.default_rng(default_seed))
+
+    @property
+    @override
+    def read_length(self) -> int:
+        return len(self._means)
+
+    @override
+    def sample_batch(self, n: int, read_length: int | None = None) -> npt.NDArray[np.uint8]:
+        """
+        Simulate the quality arrays of n reads in a single draw.
+
+        Args:
+            n (int): number of reads
+            read_length (int | None): length of the reads, defaults to the model length. Positions
+                beyond the model length are drawn from the distribution of its last position
+
+        Returns:
+            npt.NDArray[np.uint8]: (n, read_length) matrix of Phred scores
+        """
+        read_length = self.read_length if read_length is None else read_length
+        if read_length <= self.read_length:
+            means, sds = self._means[:read_length], self._sds[:read_length]
         else:
-            self._rng = np.random.default_rng(default_seed)
+            pad = (0, read_length - self.read_length)
+            means, sds = np.pad(self._means, pad, mode="edge"), np.pad(self._sds, pad, mode="edge")
 
-    def _yield_result(
-        self,
-    ) -> list[int]:
-        sampled_quals = [int(self._rng.normal(*x)) for x in zip(self.means, self.sds)]
-        return sampled_quals
+        quals = self._rng.normal(means, sds, size=(n, read_length))
+        return np.clip(np.rint(quals), 0, MAX_PHRED).astype(np.uint8)
 
-    def yield_n(self, n: int):
+    @override
+    def save(self, path: str | os.PathLike[str]) -> None:
         """
-        Return n simulated quality arrays.
+        Save the model parameters to a .npz file.
+        """
+        np.savez(
+            path,
+            model=self.MODEL_NAME,
+            format_version=self.FORMAT_VERSION,
+            means=self._means,
+            sds=self._sds,
+        )
+
+    @classmethod
+    @override
+    def load(
+        cls,
+        path: str | os.PathLike[str],
+        rng: np.random.Generator | None = None,
+        mmap: bool = False,
+    ) -> NaiveQualSim:
+        """
+        Load a model saved with save.
 
         Args:
-            n (int): total number of results to return
+            path (str | os.PathLike[str]): Path of the .npz file
+            rng (np.random.Generator | None): Random number generator to use for simulation
+            mmap (bool): Whether to memory-map the saved arrays while reading them
         """
-        for _ in range(n):
-            yield self._yield_result()
+        data = load_npz(path, mmap)
+        check_model_file(data, cls, path)
+        return cls(list(zip(data["means"].tolist(), data["sds"].tolist())), rng)
 
 
 class NaiveQualLearner(NaiveQualModelBase):
     """
     Online learning algorithm for building model parameters from real data, from which NaiveQualSim can then simulate data.
 
+    Positions are fixed by the first observation; later observations are truncated to its length.
+
     Attributes:
-        online_means (list[WelfordsRunningMean]): online learner for each position
+        stats (OnlineStats): online statistics of each position
         nobs (int): number of observations
     """
 
-    online_means: list[WelfordsRunningMean]
+    stats: OnlineStats
     _nobs: int
 
     def __init__(self, initial_qualities: list[int]) -> None:
@@ -111,7 +310,8 @@ class NaiveQualLearner(NaiveQualModelBase):
         Args:
             initial_qualities (list[int]): the first observation from data, with which to prime the learner instance (i.e. start the online means)
         """
-        self.online_means = [WelfordsRunningMean(q) for q in initial_qualities]
+        self.stats = OnlineStats.create(len(initial_qualities))
+        self.stats.update([initial_qualities])
         self._nobs = 1
 
     def update(
@@ -124,9 +324,7 @@ class NaiveQualLearner(NaiveQualModelBase):
         Args:
             new_quals (list[int]): quality scores of the new observation
         """
-        for rm, val in zip(self.online_means, new_quals):
-            # zip exhausts on shortest iterable
-            rm.update(val)
+        self.stats.update([new_quals[: len(self.stats)]])
         self._nobs += 1
 
     @property
@@ -144,11 +342,7 @@ class NaiveQualLearner(NaiveQualModelBase):
         """
         Return distribution model of quality score for each position as learned so far.
         """
-        model: list[tuple[float, float]] = []
-        for rm in self.online_means:
-            model.append(rm.yield_moments())
-
-        return model
+        return self.stats.moments.yield_moments()
 
     @classmethod
     def model_from_fastq(
@@ -158,24 +352,218 @@ class NaiveQualLearner(NaiveQualModelBase):
         """
         From a fastq file handle as opened by pysam, learn a model from that data.
 
+        Learning is delegated to the vectorized BlockQualLearner, so reads may vary in length;
+        each position is learned from the reads long enough to cover it.
+
         Args:
             fq (pysam.FastxFile): Open pysam file handle to fastq
         """
-        # ASSUMPTION: No length variance in reads input
-        # NOTE: zip is really useful here since it exhausts on the shortest iterable
-        # which means we can very quietly deal with slightly short sequences
-        # TODO: Add entry if we find a longer read than we expected
-        rinit = next(fq)
-        init_quals = refine_quals(rinit.get_quality_array())
-        if init_quals is None:
-            raise ValueError
-
-        learner = cls(init_quals)
-
-        for read in fq:
-            quals = refine_quals(read.get_quality_array())
-            if quals is None:
-                raise ValueError
-            learner.update(quals)
+        return BlockQualLearner.learn_fastq(fq).yield_model()
+
+
+def _stack_qualities(quals: list[str]) -> tuple[npt.NDArray[np.uint8], npt.NDArray[np.int64]]:
+    lengths = np.fromiter(map(len, quals), dtype=np.int64, count=len(quals))
+    flat = np.frombuffer("".join(quals).encode("ascii"), dtype=np.uint8) - PHRED_OFFSET
+    return ragged_to_padded(flat, lengths), lengths
+
+
+def quality_blocks(
+    fq: FastqSource, block_size: int, start: int = 0, end: int | None = None
+) -> Iterator[tuple[npt.NDArray[np.uint8], npt.NDArray[np.int64]]]:
+    """
+    Read the qualities of a fastq in blocks of block_size reads.
+
+    Fastq paths are parsed straight into arrays by read_fastq_blocks, which is much faster than
+    iterating the records of an open pysam handle, and may be read from a byte range [start, end)
+    of an uncompressed fastq.
+
+    Yields:
+        tuple[npt.NDArray[np.uint8], npt.NDArray[np.int64]]: zero padded (reads, positions) matrix
+            of Phred scores and the length of each read
+
+    Raises:
+        ValueError: if a byte range is given with a pysam handle
+    """
+    if isinstance(fq, (str, os.PathLike)):
+        for block in read_fastq_blocks(fq, block_reads=block_size, start=start, end=end):
+            yield block.padded_qualities()
+        return
+    if start > 0 or end is not None:
+        raise ValueError("Byte ranges require the path of a fastq")
+
+    quals: list[str] = []
+    for read in fq:
+        if read.quality is None:
+            raise ValueError(f"Read {read.name} has no qualities")
+        quals.append(read.quality)
+        if len(quals) >= block_size:
+            yield _stack_qualities(quals)
+            quals = []
+    if quals:
+        yield _stack_qualities(quals)
+
+
+def fastq_shards(paths: Sequence[str], workers: int) -> list[FastqShard]:
+    """
+    Split fastq files into about workers shards overall, to be learned in parallel and merged.
+
+    Uncompressed files are split into byte ranges (see split_fastq), so even a single file is
+    learned by all workers; compressed files are learned whole.
+    """
+    parts = -(-workers // len(paths)) if paths else 1
+    return [(path, start, end) for path in paths for start, end in split_fastq(path, parts)]
+
+
+def _learn_fastq_shard(shard: FastqShard) -> BlockQualLearner:
+    path, start, end = shard
+    return BlockQualLearner.learn_fastq(path, start=start, end=end)
+
+
+class BlockQualLearner(NaiveQualModelBase):
+    """
+    Vectorized learner of NaiveQualSim model parameters from real data.
+
+    Reads are stacked into blocks of padded quality matrices and reduced per position with array
+    operations into count, mean and m2 (see OnlineMoments), rather than updating one Python object
+    per position per read. Learners of different inputs, e.g. learned in different processes, can
+    be combined with merge, giving the same model as learning from all inputs in one.
+
+    Attributes:
+        stats (OnlineStats): per-position statistics learned so far
+    """
+
+    default_block_size: ClassVar[int] = 10_000
+
+    stats: OnlineStats
+    _nobs: int
+
+    def __init__(self, histogram: bool = False, sketch_accuracy: float | None = None) -> None:
+        """
+        Initialise object without observations.
+
+        Args:
+            histogram (bool): whether to also collect a histogram of the scores of each position
+            sketch_accuracy (float | None): relative accuracy of a quantile sketch of each position,
+                None to collect no sketch
+        """
+        self.stats = OnlineStats.create(
+            histogram_values=MAX_PHRED + 1 if histogram else None,
+            sketch_accuracy=sketch_accuracy,
+        )
+        self._nobs = 0
+
+    def update_block(
+        self, quals: npt.ArrayLike, lengths: npt.NDArray[np.int64] | None = None
+    ) -> None:
+        """
+        Update the statistics with a block of reads.
+
+        Args:
+            quals (npt.ArrayLike): (reads, positions) matrix of quality scores
+            lengths (npt.NDArray[np.int64] | None): length of each read if rows are padded
+        """
+        block = np.atleast_2d(np.asarray(quals))
+        self.stats.update(block, lengths)
+        self._nobs += block.shape[0]
+
+    def update(self, new_quals: Sequence[int]) -> None:
+        """
+        Update the statistics with the quality scores of a single read.
+        """
+        self.update_block([new_quals])
+
+    def merge(self, other: BlockQualLearner) -> None:
+        """
+        Combine the observations of another learner into this one.
+        """
+        self.stats.merge(other.stats)
+        self._nobs += other._nobs
+
+    @property
+    def observations(self) -> int:
+        """
+        Number of total observations the model has learned from so far.
+        """
+        return self._nobs
+
+    def yield_model(self) -> list[tuple[float, float]]:
+        """
+        Return distribution model of quality score for each position as learned so far.
+
+        The model stops before the first position observed too few times to finalise, e.g. one
+        covered only by a few reads longer than the rest. NaiveQualSim draws positions beyond the
+        model from its last position.
+
+        Raises:
+            RuntimeError: if even the first position is observed too few times.
+        """
+        moments = self.stats.moments
+        length = moments.observed_length()
+        if length == 0:
+            raise RuntimeError("Insufficient observations to finalise")
+        return moments.head(length).yield_moments()
+
+    @classmethod
+    def learn_fastq(
+        cls,
+        fq: FastqSource,
+        block_size: int | None = None,
+        start: int = 0,
+        end: int | None = None,
+    ) -> BlockQualLearner:
+        """
+        Learn from all reads of a fastq, given as a path or a file handle as opened by pysam.
+
+        Args:
+            fq (FastqSource): Path of a plain or gzipped fastq, or open pysam file handle to fastq
+            block_size (int | None): number of reads stacked per block, defaults to default_block_size
+            start (int): byte offset of the range of an uncompressed fastq path to learn from
+            end (int | None): byte offset of the end of the range, None for the end of the file
+        """
+        learner = cls()
+        learner.update_fastq(fq, block_size, start, end)
+        return learner
+
+    def update_fastq(
+        self,
+        fq: FastqSource,
+        block_size: int | None = None,
+        start: int = 0,
+        end: int | None = None,
+    ) -> None:
+        """
+        Update the statistics with all reads of a fastq, given as a path or a pysam file handle.
+
+        Args:
+            fq (FastqSource): Path of a plain or gzipped fastq, or open pysam file handle to fastq
+            block_size (int | None): number of reads stacked per block, defaults to default_block_size
+            start (int): byte offset of the range of an uncompressed fastq path to learn from
+            end (int | None): byte offset of the end of the range, None for the end of the file
+        """
+        for quals, lengths in quality_blocks(fq, block_size or self.default_block_size, start, end):
+            self.update_block(quals, lengths)
+
+    @classmethod
+    def model_from_fastqs(cls, paths: Sequence[str], workers: int = 1) -> list[tuple[float, float]]:
+        """
+        Learn a single model from several fastq files, learned in parallel and merged.
+
+        With several workers, uncompressed files are also split into byte ranges (see
+        fastq_shards), so a single large file is learned by all workers.
+
+        Args:
+            paths (Sequence[str]): Paths of the fastq files
+            workers (int): Number of worker processes
+        """
+        if workers > 1:
+            with ProcessPoolExecutor(
+                workers, mp_context=multiprocessing.get_context("spawn")
+            ) as pool:
+                learners = list(pool.map(_learn_fastq_shard, fastq_shards(paths, workers)))
         else:
-            return learner.yield_model()
+            learners = [_learn_fastq_shard((path, 0, None)) for path in paths]
+
+        learner = cls()
+        for partial in learners:
+            learner.merge(partial)
+        return learner.yield_model()
@@ -3,22 +3,60 @@ from collections.abc import Sequence
 from faker.providers import BaseProvider
 
 from hts_synth.ref import generate_variant, seq_converter
+from hts_synth.ref.haplotypes import HaplotypeBatch
+from hts_synth.utils.rng import RngContext, RngStream
 
 
 class MutatedSequenceProvider(BaseProvider):
     """Mutated Sequence Provider."""
 
-    def mutated_sequence(self, sequence: str, events: Sequence[int]) -> str:
+    def _rng_context(self, rng: RngContext | None) -> RngContext:
+        # Without an explicit context, follow the Faker instance's seed
+        return rng if rng is not None else RngContext(self.generator.random.getrandbits(64))
+
+    def mutated_sequence(
+        self, sequence: str, events: Sequence[int], rng: RngContext | None = None
+    ) -> str:
         """
         Get mutated sequence.
 
         :param sequence: sequence to mutate
         :param events: number of insertions, deletions, and substitutions to apply
+        :param rng: source of randomness, defaults to one seeded from the Faker instance
         :return: mutated sequence string
         """
-        generator = generate_variant.VariantGenerator(ref_sequence=sequence, events=events)
-        variants = generator.generate_random_variant_sequence()
-        alt_length = len(variants)
+        generator = generate_variant.VariantGenerator(
+            ref_sequence=sequence,
+            events=events,
+            rng=self._rng_context(rng).generator(RngStream.VARIANTS),
+        )
+        variants = generator.generate_sparse_variants()
+        alt_length = len(sequence) + sum(v.alt_ref_delta for v in variants)
         return seq_converter.apply_variants(
             ref_start=0, ref_seq=sequence, alt_length=alt_length, variants=variants
         )
+
+    def mutated_sequences(
+        self,
+        sequence: str,
+        events: Sequence[int],
+        n: int,
+        rng: RngContext | None = None,
+    ) -> HaplotypeBatch:
+        """
+        Get n independently mutated copies of a sequence.
+
+        :param sequence: sequence to mutate
+        :param events: number of insertions, deletions, and substitutions to apply to each copy
+        :param n: number of copies
+        :param rng: source of randomness, defaults to one seeded from the Faker instance
+        :return: batch of mutated sequences with the events applied to each
+        """
+        generator = generate_variant.VariantGenerator(
+            ref_sequence=sequence,
+            events=events,
+            rng=self._rng_context(rng).generator(RngStream.VARIANTS),
+        )
+        variant_sets = generator.generate_variant_array_batch(n)
+        sequences, lengths = seq_converter.apply_variant_sets(sequence, variant_sets)
+        return HaplotypeBatch(sequences=sequences, lengths=lengths, variants=variant_sets)
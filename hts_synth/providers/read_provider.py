@@ -4,6 +4,7 @@ from pysam import AlignedSegment
 from ..reads.read_generator import QualityModel, ReadGenerator
 from ..ref.enums import VariantType
 from ..ref.reference import ReferenceSegment
+from ..utils.rng import RngContext
 
 
 class ReadProvider(BaseProvider):
@@ -23,11 +24,16 @@ class ReadProvider(BaseProvider):
         self,
         reference_sequence: ReferenceSegment | str = "ATGCTGTG",
         error_probabilities: dict[VariantType, float] | None = None,
+        rng: RngContext | None = None,
     ) -> AlignedSegment:
+        if rng is None:
+            # Without an explicit context, follow the Faker instance's seed
+            rng = RngContext(self.generator.random.getrandbits(64))
         quality_model = QualityModel()
         generator = ReadGenerator(
             reference_segment=reference_sequence,
             quality_model=quality_model,
             error_probabilities=error_probabilities,
+            rng=rng,
         )
         return next(generator.emit_reads(1))
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import math
+from collections.abc import Callable
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+
+from ..ref.region_index import ContigIntervals
+
+# most candidate placements drawn per vectorized step when placing reads over targets
+_CANDIDATE_BLOCK = 1 << 22
+# lowest acceptance rate batches of candidates are sized for
+_MIN_TARGET_RATE = 1e-3
+
+
+@dataclass(slots=True, frozen=True)
+class InsertSizeDistribution:
+    """
+    Normal distribution of the length of sequenced fragments (the insert size of read pairs).
+
+    Attributes:
+        mean (float): Mean fragment length.
+        sd (float): Standard deviation of the fragment length, 0 for fragments of a fixed length.
+
+    Example:
+        >>> InsertSizeDistribution(mean=400, sd=50).sample(rng, 3, minimum=150, maximum=5000)
+        array([386, 452, 371])  # doctest: +SKIP
+    """
+
+    mean: float
+    sd: float = 0.0
+
+    def __post_init__(self):
+        if self.mean <= 0 or self.sd < 0:
+            raise ValueError("Insert size mean must be positive and sd non-negative")
+
+    def sample(
+        self, rng: np.random.Generator, n: int, minimum: int, maximum: int
+    ) -> npt.NDArray[np.int64]:
+        """
+        Draw n fragment lengths, rounded and clipped to [minimum, maximum].
+        """
+        lengths = np.rint(rng.normal(self.mean, self.sd, size=n))
+        return np.clip(lengths, minimum, maximum).astype(np.int64)
+
+
+@dataclass(slots=True, frozen=True)
+class FragmentSampler:
+    """
+    Uniform placement of fixed length reads within a segment of reference.
+
+    All start positions of a batch are drawn in a single vectorized step. The reads themselves are
+    cut from a shared buffer of the segment (see windows), so a segment of any length is read once
+    however many reads cover it. With targets, reads (or fragments) are drawn as before and kept
+    only if they overlap a target, drawing batches of candidates until enough are kept.
+
+    Attributes:
+        segment_length (int): Length of the segment reads are placed in.
+        read_length (int): Number of reference bases covered by each read.
+        start_positions (int | None): Number of positions, from the start of the segment, reads
+            (or fragments) may start at. None for every position they fit at.
+        targets (ContigIntervals | None): Intervals of the segment, on contig 0 (see
+            ContigIntervals.within), every read (or fragment) must overlap. None for no targets.
+
+    Example:
+        >>> sampler = FragmentSampler(segment_length=5000, read_length=150)
+        >>> sampler.reads_for_depth(30)
+        1000
+    """
+
+    segment_length: int
+    read_length: int
+    start_positions: int | None = None
+    targets: ContigIntervals | None = None
+
+    def __post_init__(self):
+        if not 0 < self.read_length <= self.segment_length:
+            raise ValueError(
+                f"Read length must be between 1 and the segment length ({self.segment_length})"
+            )
+        if self.start_positions is not None and self.start_positions < 1:
+            raise ValueError("Reads need at least one start position")
+
+    @property
+    def n_positions(self) -> int:
+        """
+        Number of distinct start positions of a read.
+        """
+        fitting = self.segment_length - self.read_length + 1
+        if self.start_positions is None:
+            return fitting
+        return min(fitting, self.start_positions)
+
+    def reads_for_depth(self, depth: float) -> int:
+        """
+        Get the number of reads giving a mean depth of at least depth over the segment.
+        """
+        return math.ceil(depth * self.segment_length / self.read_length)
+
+    def pairs_for_depth(self, depth: float) -> int:
+        """
+        Get the number of read pairs giving a mean depth of at least depth over the segment.
+        """
+        return math.ceil(depth * self.segment_length / (2 * self.read_length))
+
+    def sample_starts(self, rng: np.random.Generator, n: int) -> npt.NDArray[np.int64]:
+        """
+        Draw the 0-based start position, within the segment, of each of n reads.
+        """
+
+        def draw(size: int) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+            starts = rng.integers(0, self.n_positions, size=size, dtype=np.int64)
+            return starts, np.full(size, self.read_length, dtype=np.int64)
+
+        return self._sample_over_targets(n, draw)[0]
+
+    def sample_fragments(
+        self, rng: np.random.Generator, n: int, insert_sizes: InsertSizeDistribution
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+        """
+        Draw the start and length of n fragments placed uniformly within the segment.
+
+        Fragments are at least one read and at most the segment long, so both reads of a pair
+        lie within their fragment (and overlap when it is shorter than two reads).
+
+        Returns:
+            tuple: The 0-based start of each fragment within the segment and its length.
+        """
+
+        def draw(size: int) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+            lengths = insert_sizes.sample(rng, size, self.read_length, self.segment_length)
+            positions = self.segment_length - lengths + 1
+            if self.start_positions is not None:
+                positions = np.minimum(positions, self.start_positions)
+            return (rng.random(size) * positions).astype(np.int64), lengths
+
+        return self._sample_over_targets(n, draw)
+
+    def _sample_over_targets(
+        self,
+        n: int,
+        draw: Callable[[int], tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]],
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+        """
+        Draw batches of candidate placements until n overlap a target, or n placements if none.
+
+        Each batch is sized from the fraction of candidates kept so far.
+
+        Raises:
+            ValueError: if a block's worth of candidates all miss every target.
+        """
+        targets = self.targets
+        if targets is None:
+            return draw(n)
+        kept_starts: list[npt.NDArray[np.int64]] = []
+        kept_lengths: list[npt.NDArray[np.int64]] = []
+        kept = drawn = 0
+        while kept < n:
+            rate = max(kept / drawn, _MIN_TARGET_RATE) if drawn else 1.0
+            size = min(math.ceil(1.1 * (n - kept) / rate), _CANDIDATE_BLOCK)
+            starts, lengths = draw(size)
+            overlap = targets.overlaps(np.zeros(size, dtype=np.int32), starts, starts + lengths)
+            kept_starts.append(starts[overlap])
+            kept_lengths.append(lengths[overlap])
+            kept += int(np.count_nonzero(overlap))
+            drawn += size
+            if kept == 0 and drawn >= _CANDIDATE_BLOCK:
+                raise ValueError("No placement of reads in the segment overlaps its targets")
+        return np.concatenate(kept_starts)[:n], np.concatenate(kept_lengths)[:n]
+
+    def mate_starts(
+        self, starts: npt.NDArray[np.int64], lengths: npt.NDArray[np.int64]
+    ) -> npt.NDArray[np.int64]:
+        """
+        Get the start of the window of the reverse read (R2) of each fragment.
+        """
+        return starts + lengths - self.read_length
+
+    def windows(
+        self, segment: npt.NDArray[np.uint8], starts: npt.NDArray[np.int64]
+    ) -> npt.NDArray[np.uint8]:
+        """
+        Get the bases covered by reads starting at starts, as a (reads, read length) matrix.
+
+        The matrix rows are gathered through a strided window view of segment.
+        """
+        return np.lib.stride_tricks.sliding_window_view(segment, self.read_length)[starts]
+
+    def depth(self, starts: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+        """
+        Get the number of reads starting at starts which cover each base of the segment.
+        """
+        changes = np.bincount(starts, minlength=self.segment_length + 1)
+        changes -= np.bincount(starts + self.read_length, minlength=self.segment_length + 1)
+        return np.cumsum(changes[: self.segment_length])
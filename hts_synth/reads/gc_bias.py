@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import math
+from collections.abc import Callable
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+
+from ..ref.gc_content import GCProfile
+
+DEFAULT_GC_OPTIMUM = 0.45
+# weight of the least covered fragments, so that any fragment can be placed
+MIN_GC_WEIGHT = 1e-3
+# most candidate fragments drawn per vectorized step
+_CANDIDATE_BLOCK = 1 << 22
+
+FragmentDraw = Callable[[int], tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]]
+
+
+@dataclass(slots=True, frozen=True)
+class GCBias:
+    """
+    Coverage of fragments as a function of their GC fraction, as seen in PCR amplified libraries.
+
+    A fragment of GC fraction gc is covered with relative weight
+    exp(-strength * ((gc - optimum) / 0.5) ** 2), 1 at the optimum and at least MIN_GC_WEIGHT.
+    Fragments are placed by rejection (see sample): candidates are drawn uniformly in batches,
+    their GC fractions read from a GCProfile of the segment in O(1) each, and each is kept with
+    probability its weight.
+
+    Attributes:
+        strength (float): How steeply coverage falls away from the optimum, 0 for no bias. At
+            strength 1, fragments with a GC fraction 0.25 from the optimum are covered 0.78 times
+            as deeply as at the optimum, and 0.37 times at 0.5 from it.
+        optimum (float): GC fraction of the most covered fragments.
+
+    Example:
+        >>> GCBias(strength=2).weights(np.array([0.45, 0.2, 0.7])).round(2).tolist()
+        [1.0, 0.61, 0.61]
+    """
+
+    strength: float
+    optimum: float = DEFAULT_GC_OPTIMUM
+
+    def __post_init__(self):
+        if self.strength < 0 or not 0 <= self.optimum <= 1:
+            raise ValueError("GC bias strength must be non-negative and its optimum in [0, 1]")
+
+    def weights(self, fractions: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        """
+        Get the relative coverage of fragments of each GC fraction.
+        """
+        weights = np.exp(-self.strength * ((fractions - self.optimum) / 0.5) ** 2)
+        return np.maximum(weights, MIN_GC_WEIGHT)
+
+    def sample(
+        self, rng: np.random.Generator, n: int, draw: FragmentDraw, profile: GCProfile
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+        """
+        Place n fragments, drawing batches of uniformly placed candidates until n are kept.
+
+        Each batch is sized from the acceptance rate seen so far, so most segments need one or two
+        batches.
+
+        Args:
+            rng (np.random.Generator): Generator the acceptance of candidates is drawn from.
+            n (int): Number of fragments to place.
+            draw (FragmentDraw): Draws the start and length of a number of candidate fragments,
+                e.g. FragmentSampler.sample_fragments.
+            profile (GCProfile): GC profile of the positions draw places fragments at.
+
+        Returns:
+            tuple: The start and length of each kept fragment, in the order drawn.
+        """
+        kept_starts: list[npt.NDArray[np.int64]] = []
+        kept_lengths: list[npt.NDArray[np.int64]] = []
+        kept = drawn = 0
+        while kept < n:
+            rate = max(kept / drawn, MIN_GC_WEIGHT) if drawn else 1.0
+            size = min(math.ceil(1.1 * (n - kept) / rate), _CANDIDATE_BLOCK)
+            starts, lengths = draw(size)
+            accept = rng.random(size) < self.weights(profile.fractions(starts, starts + lengths))
+            kept_starts.append(starts[accept])
+            kept_lengths.append(lengths[accept])
+            kept += int(np.count_nonzero(accept))
+            drawn += size
+        return np.concatenate(kept_starts)[:n], np.concatenate(kept_lengths)[:n]
+
+    def mean_weight(self, profile: GCProfile, fragment_length: int) -> float:
+        """
+        Get the mean weight of fragments of a length over every start of a profile's segment.
+
+        This is the expected acceptance rate of fragments placed uniformly in the segment, which
+        makes a segment's share of all fragments proportional to its positions times its mean
+        weight.
+        """
+        starts = profile.start + np.arange(len(profile) - fragment_length + 1, dtype=np.int64)
+        if len(starts) == 0:
+            return 0.0
+        return float(self.weights(profile.fractions(starts, starts + fragment_length)).mean())
@@ -0,0 +1,465 @@
+from __future__ import annotations
+
+import math
+import os
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
+from typing import ClassVar, override
+
+import numpy as np
+import numpy.typing as npt
+
+from ..models.qual_model import QualSimBase
+from ..ref.enums import VariantType
+from ..ref.gc_content import GCProfile
+from ..ref.reference import Reference
+from ..ref.region_index import ContigIntervals
+from ..utils.arrays import lengths_to_offsets, ragged_arange
+from ..utils.rng import RngContext, RngStream
+from .fragments import InsertSizeDistribution
+from .gc_bias import GCBias
+from .parallel import emit_shards
+from .read_batch import ReadBatch
+from .read_generator import ErrorMode, QualityModel, ReadGenerator
+from .read_names import ReadNamer
+
+DEFAULT_WINDOW_SIZE = 1 << 20
+# number of reads placed per vectorized draw
+_PLACEMENT_BLOCK = 1 << 22
+
+
+def read_bed(path: str | os.PathLike[str], contigs: Sequence[str]) -> ContigIntervals:
+    """
+    Read the intervals of a BED file, merging overlapping intervals.
+
+    Header, track and browser lines are skipped and columns beyond the third are ignored.
+
+    Raises:
+        ValueError: if an interval is on a contig not in contigs, or ends before it starts.
+    """
+    contig_ids = {name: i for i, name in enumerate(contigs)}
+    ids: list[int] = []
+    starts: list[int] = []
+    ends: list[int] = []
+    with open(path) as bed:
+        for line in bed:
+            if not line.strip() or line.startswith(("#", "track", "browser")):
+                continue
+            chrom, start, end = line.split("\t", 3)[:3]
+            if chrom not in contig_ids:
+                raise ValueError(f"BED contig {chrom} is not in the reference")
+            if int(end) < int(start):
+                raise ValueError(
+                    f"BED interval {chrom}:{start}-{end.strip()} ends before it starts"
+                )
+            ids.append(contig_ids[chrom])
+            starts.append(int(start))
+            ends.append(int(end))
+    return ContigIntervals.from_intervals(ids, starts, ends)
+
+
+@dataclass(slots=True, frozen=True)
+class GenomeWindows:
+    """
+    Windows tiling the read start positions of a genome, weighted by their number.
+
+    Reads (or fragments) lie within regions: whole contigs, or e.g. contigs less their gaps. With
+    targets, they must also overlap a target, so their starts are limited to the span - 1 bases
+    before each target and the target itself, and every read placed in a window is checked to
+    overlap one (see FragmentSampler). The start positions are cut into windows of at most window
+    size positions. A window's segment extends span - 1 bases beyond its last start, so every read
+    (or fragment) starting in the window lies in its segment. The cumulative number of start
+    positions of the windows makes placing reads a binary search (see sample_counts): placing n
+    reads costs O(n log windows), and the table is built in O(windows).
+
+    Attributes:
+        contigs (tuple[str, ...]): Names of all contigs of the reference, in FASTA order.
+        contig_ids (npt.NDArray[np.int32]): Index in contigs of each window.
+        starts (npt.NDArray[np.int64]): 0-based start of each window segment.
+        ends (npt.NDArray[np.int64]): End-exclusive end of each window segment.
+        positions (npt.NDArray[np.int64]): Cumulative number of read start positions, one more
+            entry than windows.
+        span (int): Reference bases covered by a read (or a fragment) placed in a window.
+        total_length (int): Number of bases of the sampled regions, or of the targets within them.
+        targets (ContigIntervals | None): Parts of the targets within the regions, which every
+            read (or fragment) overlaps, None if reads are placed anywhere in the regions.
+
+    Example:
+        >>> windows = GenomeWindows.from_lengths(["chr1", "chr2"], [5000, 2000], span=150)
+        >>> windows.sample_counts(np.random.default_rng(1), 100)  # doctest: +SKIP
+        array([73, 27])
+    """
+
+    contigs: tuple[str, ...]
+    contig_ids: npt.NDArray[np.int32]
+    starts: npt.NDArray[np.int64]
+    ends: npt.NDArray[np.int64]
+    positions: npt.NDArray[np.int64]
+    span: int
+    total_length: int
+    targets: ContigIntervals | None = None
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @classmethod
+    def from_lengths(
+        cls,
+        contigs: Sequence[str],
+        lengths: Sequence[int],
+        span: int,
+        regions: ContigIntervals | None = None,
+        window_size: int = DEFAULT_WINDOW_SIZE,
+        targets: ContigIntervals | None = None,
+    ) -> GenomeWindows:
+        """
+        Tile the read start positions of whole contigs, or regions of them, with windows.
+
+        Args:
+            contigs (Sequence[str]): Names of the contigs, e.g. from the FASTA index.
+            lengths (Sequence[int]): Length of each contig.
+            span (int): Reference bases covered by each read or fragment. Regions shorter than
+                span are dropped.
+            regions (ContigIntervals | None): Regions reads must lie in (e.g. the usable regions
+                of a RegionIndex), None for whole contigs. Regions are clipped to their contig.
+            window_size (int): Maximum number of read start positions per window.
+            targets (ContigIntervals | None): Intervals reads must overlap (e.g. from read_bed),
+                None for none. Targets only need room for a read around them, so targets
+                shorter than span are kept.
+        """
+        if span < 1 or window_size < 1:
+            raise ValueError("Span and window size must be positive")
+        contig_lengths = np.asarray(lengths, dtype=np.int64)
+        if regions is None:
+            regions = ContigIntervals.whole(lengths)
+        regions = ContigIntervals.from_intervals(
+            regions.contig_ids,
+            regions.starts,
+            np.minimum(regions.ends, contig_lengths[regions.contig_ids]),
+        )
+        # positions at which a read lies within its region
+        allowed = ContigIntervals.from_intervals(
+            regions.contig_ids, regions.starts, regions.ends - span + 1
+        )
+        if targets is not None:
+            targets = targets.intersect(regions)
+            # positions at which a read of span bases overlaps a target
+            allowed = allowed.intersect(targets.pad(span - 1, 0, lengths))
+
+        n_windows = -(-allowed.lengths // window_size)
+        # window k of an interval holds start positions [k * window_size, (k + 1) * window_size)
+        window_offsets = ragged_arange(np.zeros(len(n_windows), dtype=np.int64), n_windows)
+        window_offsets *= window_size
+        interval_of_window = np.repeat(np.arange(len(n_windows)), n_windows)
+        window_starts = allowed.starts[interval_of_window] + window_offsets
+        n_starts = np.minimum(allowed.lengths[interval_of_window] - window_offsets, window_size)
+
+        return cls(
+            contigs=tuple(contigs),
+            contig_ids=allowed.contig_ids[interval_of_window].astype(np.int32),
+            starts=window_starts,
+            ends=window_starts + n_starts + span - 1,
+            positions=lengths_to_offsets(n_starts),
+            span=span,
+            total_length=int(
+                targets.lengths.sum() if targets is not None else (allowed.lengths + span - 1).sum()
+            ),
+            targets=targets,
+        )
+
+    def segments(self) -> ContigIntervals:
+        """
+        Get the bases covered by the segments of the windows, merged.
+        """
+        return ContigIntervals.from_intervals(self.contig_ids, self.starts, self.ends)
+
+    def sample_counts(
+        self,
+        rng: np.random.Generator,
+        n: int,
+        weights: npt.NDArray[np.float64] | None = None,
+    ) -> npt.NDArray[np.int64]:
+        """
+        Place n reads uniformly over all start positions, returning the number in each window.
+
+        Args:
+            rng (np.random.Generator): Generator the placement is drawn from.
+            n (int): Number of reads to place.
+            weights (npt.NDArray[np.float64] | None): Relative weight of the start positions of
+                each window (e.g. GCBias.mean_weight), None for uniform placement.
+        """
+        if len(self) == 0 or self.positions[-1] == 0:
+            raise ValueError("No read start positions to sample from")
+        cumulative = self.positions
+        if weights is not None:
+            cumulative = np.concatenate(([0.0], np.cumsum(np.diff(self.positions) * weights)))
+            if cumulative[-1] <= 0:
+                raise ValueError("No read start positions of positive weight to sample from")
+        counts = np.zeros(len(self), dtype=np.int64)
+        for start in range(0, n, _PLACEMENT_BLOCK):
+            size = min(_PLACEMENT_BLOCK, n - start)
+            if weights is None:
+                draws = rng.integers(0, self.positions[-1], size=size)
+            else:
+                draws = rng.random(size) * cumulative[-1]
+            windows = np.searchsorted(cumulative, draws, side="right") - 1
+            counts += np.bincount(windows, minlength=len(self))
+        return counts
+
+
+class GenomeReadGenerator:
+    """
+    Generate reads placed over a whole genome, or target regions of it.
+
+    Reads are first placed over the windows of the genome in one vectorized step (see
+    GenomeWindows.sample_counts), then generated window by window in genome order: each window is
+    fetched once and all of its reads are generated together by a ReadGenerator of the window
+    segment, which places them uniformly over the window's start positions (and over its
+    targets). The generator of the last window is kept, so a window split across successive
+    shards is fetched once. With a GC bias, windows are weighted by the
+    mean weight of their fragments (see GCBias.mean_weight), which costs a pass over the windows
+    before placement, and reads are placed by GC fraction within each window. Windows are packed into shards of at most
+    shard size reads (splitting windows holding more), generated in parallel as for
+    ReadGenerator.
+
+    Attributes:
+        reference (Reference): Reference the windows are fetched from.
+        windows (GenomeWindows): Windows reads are placed in.
+
+    Example:
+        >>> reference = Reference("genome.fa")  # doctest: +SKIP
+        >>> windows = GenomeWindows.from_lengths(
+        ...     reference.fasta.references, reference.fasta.lengths, span=150
+        ... )  # doctest: +SKIP
+        >>> generator = GenomeReadGenerator(reference, windows, QualityModel(), read_length=150)
+        >>> batches = generator.emit_batches(1_000_000, workers=4)  # doctest: +SKIP
+    """
+
+    default_shard_size: ClassVar[int] = ReadGenerator.default_shard_size
+
+    def __init__(
+        self,
+        reference: Reference,
+        windows: GenomeWindows,
+        quality_model: QualityModel | QualSimBase,
+        error_probabilities: dict[VariantType, float] | None = None,
+        rng: RngContext | None = None,
+        read_namer: ReadNamer | None = None,
+        error_mode: ErrorMode = ErrorMode.FIXED,
+        read_length: int = 150,
+        insert_sizes: InsertSizeDistribution | None = None,
+        gc_bias: GCBias | None = None,
+    ):
+        """
+        Initialise a GenomeReadGenerator.
+
+        Args:
+            reference (Reference): Reference the windows are fetched from.
+            windows (GenomeWindows): Windows reads are placed in, with a span of at least the
+                read length.
+            quality_model (QualityModel | QualSimBase): Quality model, as for ReadGenerator.
+            error_probabilities (dict[VariantType, float] | None): Error probabilities, as for
+                ReadGenerator.
+            rng (RngContext | None): Source of all randomness, an unseeded context if None.
+            read_namer (ReadNamer | None): Naming scheme of generated reads.
+            error_mode (ErrorMode): How errors are placed, as for ReadGenerator.
+            read_length (int): Number of reference bases covered by each read.
+            insert_sizes (InsertSizeDistribution | None): Distribution of fragment lengths, which
+                makes the generator emit read pairs.
+            gc_bias (GCBias | None): Coverage bias of reads (or fragments) by their GC fraction,
+                None to place them uniformly.
+        """
+        if windows.span < read_length:
+            raise ValueError("Window span must be at least the read length")
+        self.reference: Reference = reference
+        self.windows: GenomeWindows = windows
+        self.quality_model: QualityModel | QualSimBase = quality_model
+        self.error_probabilities: dict[VariantType, float] | None = error_probabilities
+        self.rng: RngContext = rng if rng is not None else RngContext()
+        self.read_namer: ReadNamer = read_namer or ReadNamer()
+        self.error_mode: ErrorMode = error_mode
+        self.read_length: int = read_length
+        self.insert_sizes: InsertSizeDistribution | None = insert_sizes
+        self.gc_bias: GCBias | None = gc_bias
+        # (window, number of reads) of each piece of work, and the first piece of each shard
+        self._piece_windows: npt.NDArray[np.int64] = np.zeros(0, dtype=np.int64)
+        self._piece_counts: npt.NDArray[np.int64] = np.zeros(0, dtype=np.int64)
+        self._shard_pieces: npt.NDArray[np.int64] = np.zeros(1, dtype=np.int64)
+        # first shard and read (or pair) of the current plan, and of the next one
+        self._first_shard: int = 0
+        self._first_read: int = 0
+        self._next_shard: int = 0
+        self._next_read: int = 0
+        # shared by successive plans, so that each places its reads anew
+        self._placement_rng: np.random.Generator | None = None
+        # the last window and the generator of its reads
+        self._window_generator: tuple[int, ReadGenerator] | None = None
+
+    @override
+    def __getstate__(self) -> dict[str, object]:
+        # workers fetch their own windows
+        state = self.__dict__.copy()
+        state["_window_generator"] = None
+        return state
+
+    @staticmethod
+    def span_for(read_length: int, insert_sizes: InsertSizeDistribution | None = None) -> int:
+        """
+        Get the window span covering reads, or all but the longest (beyond 4 sd) fragments.
+        """
+        if insert_sizes is None:
+            return read_length
+        return max(read_length, math.ceil(insert_sizes.mean + 4 * insert_sizes.sd))
+
+    def reads_for_depth(self, depth: float) -> int:
+        """
+        Get the number of reads (or pairs) giving a mean depth of at least depth over the windows.
+        """
+        reads_per_unit = 2 if self.insert_sizes is not None else 1
+        return math.ceil(depth * self.windows.total_length / (reads_per_unit * self.read_length))
+
+    def window_weights(self) -> npt.NDArray[np.float64]:
+        """
+        Get the mean GC bias weight of the fragments of each window.
+
+        Each window is fetched and profiled once, and weighted by fragments of the mean fragment
+        length (or the read length) at every start position, so the weights are exact for reads
+        and fixed length fragments.
+        """
+        if self.gc_bias is None:
+            return np.ones(len(self.windows))
+        length = self.read_length
+        if self.insert_sizes is not None:
+            length = max(length, round(self.insert_sizes.mean))
+        weights = np.zeros(len(self.windows))
+        for window in range(len(self.windows)):
+            start, end = int(self.windows.starts[window]), int(self.windows.ends[window])
+            chrom = self.windows.contigs[int(self.windows.contig_ids[window])]
+            profile = GCProfile.from_reference(self.reference, chrom, start, end)
+            weights[window] = self.gc_bias.mean_weight(profile, min(length, end - start))
+        return weights
+
+    def plan(self, amount: int, shard_size: int | None = None) -> list[int]:
+        """
+        Place amount reads (or pairs) over the windows and pack the windows into shards.
+
+        Placement is drawn from the placement stream of the generator's RngContext, so the plan
+        (and the reads) depend only on the seed, amount, shard size and earlier plans. The plan
+        continues the run of earlier plans: its shards and reads are numbered on from theirs.
+
+        Returns:
+            list[int]: The number of reads in each shard.
+        """
+        shard_size = shard_size or self.default_shard_size
+        if self._placement_rng is None:
+            self._placement_rng = self.rng.generator(RngStream.PLACEMENT)
+        weights = self.window_weights() if self.gc_bias is not None else None
+        counts = self.windows.sample_counts(self._placement_rng, amount, weights)
+        windows = np.flatnonzero(counts)
+        # cut the run of reads at the end of every window and every multiple of shard size
+        ends = np.cumsum(counts[windows])
+        boundaries = np.append(np.arange(0, amount, shard_size, dtype=np.int64), amount)
+        cuts = np.unique(np.concatenate((ends - counts[windows], ends, boundaries)))
+        self._piece_windows = windows[np.searchsorted(ends, cuts[:-1], side="right")]
+        self._piece_counts = np.diff(cuts)
+        self._shard_pieces = np.searchsorted(cuts, boundaries)
+        shard_sizes: list[int] = np.diff(boundaries).tolist()
+        self._first_shard, self._first_read = self._next_shard, self._next_read
+        self._next_shard += len(shard_sizes)
+        self._next_read += amount
+        return shard_sizes
+
+    def generate_shard(self, index: int, start: int, amount: int) -> ReadBatch:
+        """
+        Generate the reads of one shard of the current plan, window by window.
+
+        Args:
+            index (int): Index of the shard within the run.
+            start (int): Index of the first read (or pair) of the shard within the run.
+            amount (int): Number of reads (or pairs) in the shard.
+        """
+        shard_rng = self.rng.shard(index)
+        local = index - self._first_shard
+        if not 0 <= local < len(self._shard_pieces) - 1:
+            raise RuntimeError(f"Shard {index} is not in the current plan")
+        pieces = range(int(self._shard_pieces[local]), int(self._shard_pieces[local + 1]))
+        if int(self._piece_counts[pieces.start : pieces.stop].sum()) != amount:
+            raise RuntimeError(f"Shard {index} of the current plan does not hold {amount} reads")
+        batches: list[ReadBatch] = []
+        first_read = start
+        for number, piece in enumerate(pieces):
+            window = int(self._piece_windows[piece])
+            count = int(self._piece_counts[piece])
+            contig_id = int(self.windows.contig_ids[window])
+            generator = self.window_generator(window, shard_rng.shard(number))
+            batch = generator.generate_batch(count, first_read)
+            batch.reference_ids[batch.reference_ids >= 0] = contig_id
+            batch.next_reference_ids[batch.next_reference_ids >= 0] = contig_id
+            batches.append(batch)
+            first_read += count
+        return ReadBatch.concatenate(batches)
+
+    def window_generator(self, window: int, rng: RngContext) -> ReadGenerator:
+        """
+        Get the generator of the reads of a window, seeded by rng.
+
+        The generator of the last window is reused, so its segment is fetched (and GC profiled)
+        once however many successive pieces of work fall in the window.
+        """
+        if self._window_generator is not None and self._window_generator[0] == window:
+            generator = self._window_generator[1]
+            generator.reseed(rng)
+            return generator
+        contig_id = int(self.windows.contig_ids[window])
+        start, end = int(self.windows.starts[window]), int(self.windows.ends[window])
+        targets = self.windows.targets
+        generator = ReadGenerator(
+            self.reference.get_sequence(self.windows.contigs[contig_id], start, end),
+            self.quality_model,
+            self.error_probabilities,
+            rng=rng,
+            read_namer=self.read_namer,
+            error_mode=self.error_mode,
+            read_length=self.read_length,
+            insert_sizes=self.insert_sizes,
+            gc_bias=self.gc_bias,
+            start_positions=int(
+                self.windows.positions[window + 1] - self.windows.positions[window]
+            ),
+            targets=targets.within(contig_id, start, end) if targets is not None else None,
+        )
+        self._window_generator = (window, generator)
+        return generator
+
+    def emit_batches(
+        self, amount: int = 1, workers: int = 1, shard_size: int | None = None
+    ) -> Iterator[ReadBatch]:
+        """
+        Generate amount reads (or read pairs) over the genome, one batch per shard.
+
+        Args:
+            amount (int): The number of reads (or read pairs) to generate.
+            workers (int): Number of processes to generate reads in.
+            shard_size (int | None): Maximum number of reads per shard, defaults to
+                default_shard_size. As for ReadGenerator, the output does not depend on workers.
+
+        Each call makes a new plan continuing the run (see plan), so its batches must be consumed
+        before the next call.
+
+        Returns:
+            Iterator[ReadBatch]: The reads of each shard, in genome order.
+        """
+        shard_sizes = self.plan(amount, shard_size)
+        return self._emit_shards(shard_sizes, workers, self._first_shard, self._first_read)
+
+    def _emit_shards(
+        self, shard_sizes: list[int], workers: int, first_shard: int, first_read: int
+    ) -> Iterator[ReadBatch]:
+        if workers > 1:
+            yield from emit_shards(
+                self, shard_sizes, workers, first_shard=first_shard, first_read=first_read
+            )
+        else:
+            for index, shard_amount in enumerate(shard_sizes, first_shard):
+                yield self.generate_shard(index, first_read, shard_amount)
+                first_read += shard_amount
@@ -0,0 +1,74 @@
+import multiprocessing
+from collections import deque
+from collections.abc import Iterator, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import accumulate
+from typing import Protocol
+
+from .read_batch import ReadBatch
+
+
+class ShardGenerator(Protocol):
+    def generate_shard(self, index: int, start: int, amount: int) -> ReadBatch: ...
+
+
+_worker_generator: ShardGenerator | None = None
+
+
+def _init_worker(generator: ShardGenerator) -> None:
+    global _worker_generator
+    _worker_generator = generator
+
+
+def _run_shard(index: int, start: int, amount: int) -> ReadBatch:
+    if _worker_generator is None:
+        raise RuntimeError("Worker process was not initialised with a generator")
+    return _worker_generator.generate_shard(index, start, amount)
+
+
+def emit_shards(
+    generator: ShardGenerator,
+    shard_sizes: Sequence[int],
+    workers: int,
+    max_pending: int | None = None,
+    first_shard: int = 0,
+    first_read: int = 0,
+) -> Iterator[ReadBatch]:
+    """
+    Generate shards of reads in a process pool and yield them in shard order.
+
+    Each worker receives its own copy of the generator once, then shards are generated with
+    ReadGenerator.generate_shard. At most max_pending shards are queued or held at a time, so
+    memory use stays bounded when the consumer is slower than the workers.
+
+    Args:
+        generator (ShardGenerator): Generator to copy into each worker, e.g. a ReadGenerator
+        shard_sizes (Sequence[int]): Number of reads in each shard
+        workers (int): Number of worker processes
+        max_pending (int | None): Maximum number of shards in flight, defaults to twice the workers
+        first_shard (int): Index of the first shard within the generator's run
+        first_read (int): Index of the first read of the first shard within the generator's run
+    """
+    max_pending = max_pending or 2 * workers
+    with ProcessPoolExecutor(
+        workers,
+        # fork is unsafe once numpy or the caller have started threads
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(generator,),
+    ) as pool:
+        pending: deque[Future[ReadBatch]] = deque()
+        # (index, first read, amount) of each shard
+        starts = accumulate(shard_sizes, initial=first_read)
+        shards = zip(range(first_shard, first_shard + len(shard_sizes)), starts, shard_sizes)
+        for index, start, amount in shards:
+            pending.append(pool.submit(_run_shard, index, start, amount))
+            if len(pending) >= max_pending:
+                break
+
+        while pending:
+            batch = pending.popleft().result()
+            next_shard = next(shards, None)
+            if next_shard is not None:
+                pending.append(pool.submit(_run_shard, *next_shard))
+            yield batch
@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+from pysam import AlignedSegment
+
+from ..ref.seq_converter import reverse_complement_ragged
+from ..utils.arrays import lengths_to_offsets, ragged_arange
+from ..wrappers.sam_wrapper import SamFlag
+from .truth_alignment import TruthAlignments
+
+PHRED_OFFSET = 33
+
+
+@dataclass(slots=True)
+class ReadBatch:
+    """
+    A batch of reads stored as contiguous arrays (struct of arrays).
+
+    Bases and qualities of all reads are stored back to back and delimited by the shared
+    offsets array. pysam AlignedSegments are only built on request, and FASTQ/SAM text is
+    serialised straight from the arrays.
+
+    As in SAM, reads flagged READ_REVERSE_STRAND are stored reverse complemented (on the forward
+    strand of the reference); FASTQ, sequence and quality lines reverse complement them back.
+
+    Attributes:
+        names (list[str]): Read names.
+        sequences (npt.NDArray[np.uint8]): Concatenated ASCII bases of all reads.
+        qualities (npt.NDArray[np.uint8]): Concatenated Phred quality scores of all reads.
+        offsets (npt.NDArray[np.int64]): Offsets of each read into sequences and qualities,
+            one more than the number of reads.
+        flags (npt.NDArray[np.uint16]): SAM flag of each read.
+        reference_ids (npt.NDArray[np.int32]): Reference index of each read, -1 if unplaced.
+        reference_starts (npt.NDArray[np.int64]): 0-based reference start of each read, -1 if unplaced.
+        next_reference_ids (npt.NDArray[np.int32]): Reference index of the next segment (the
+            mate) of each read, -1 if there is none.
+        next_reference_starts (npt.NDArray[np.int64]): 0-based reference start of the next
+            segment of each read, -1 if there is none.
+        template_lengths (npt.NDArray[np.int64]): Signed observed template length (TLEN) of
+            each read, positive for the leftmost segment and 0 if unknown.
+        mapping_qualities (npt.NDArray[np.uint8]): Mapping quality of each read.
+        alignments (TruthAlignments | None): CIGAR, MD and NM of each read, None if the reads
+            are unmapped.
+    """
+
+    names: list[str]
+    sequences: npt.NDArray[np.uint8]
+    qualities: npt.NDArray[np.uint8]
+    offsets: npt.NDArray[np.int64]
+    flags: npt.NDArray[np.uint16]
+    reference_ids: npt.NDArray[np.int32]
+    reference_starts: npt.NDArray[np.int64]
+    next_reference_ids: npt.NDArray[np.int32]
+    next_reference_starts: npt.NDArray[np.int64]
+    template_lengths: npt.NDArray[np.int64]
+    mapping_qualities: npt.NDArray[np.uint8]
+    alignments: TruthAlignments | None = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def lengths(self) -> npt.NDArray[np.int64]:
+        return np.diff(self.offsets)
+
+    def sequence(self, i: int) -> str:
+        """Get the bases of the i-th read."""
+        return self.sequences[self.offsets[i] : self.offsets[i + 1]].tobytes().decode("ascii")
+
+    def quality_string(self, i: int) -> str:
+        """Get the Phred+33 encoded qualities of the i-th read."""
+        quals = self.qualities[self.offsets[i] : self.offsets[i + 1]] + PHRED_OFFSET
+        return quals.tobytes().decode("ascii")
+
+    @classmethod
+    def concatenate(cls, batches: Sequence[ReadBatch]) -> ReadBatch:
+        """
+        Join batches end to end into a single batch.
+
+        The batch only keeps alignments if every batch has them.
+        """
+        alignments = [b.alignments for b in batches if b.alignments is not None]
+        return cls(
+            names=[name for batch in batches for name in batch.names],
+            sequences=np.concatenate([b.sequences for b in batches]),
+            qualities=np.concatenate([b.qualities for b in batches]),
+            offsets=lengths_to_offsets(np.concatenate([b.lengths for b in batches])),
+            flags=np.concatenate([b.flags for b in batches]),
+            reference_ids=np.concatenate([b.reference_ids for b in batches]),
+            reference_starts=np.concatenate([b.reference_starts for b in batches]),
+            next_reference_ids=np.concatenate([b.next_reference_ids for b in batches]),
+            next_reference_starts=np.concatenate([b.next_reference_starts for b in batches]),
+            template_lengths=np.concatenate([b.template_lengths for b in batches]),
+            mapping_qualities=np.concatenate([b.mapping_qualities for b in batches]),
+            alignments=TruthAlignments.concatenate(alignments)
+            if len(alignments) == len(batches)
+            else None,
+        )
+
+    def take(self, rows: npt.NDArray[np.intp] | slice) -> ReadBatch:
+        """
+        Get a batch of the selected reads.
+
+        For instance, take(slice(0, None, 2)) gets the first reads of an interleaved batch of pairs.
+        """
+        rows = np.arange(len(self))[rows]
+        lengths = self.lengths[rows]
+        bases = ragged_arange(self.offsets[rows], lengths)
+        return ReadBatch(
+            names=[self.names[i] for i in rows.tolist()],
+            sequences=self.sequences[bases],
+            qualities=self.qualities[bases],
+            offsets=lengths_to_offsets(lengths),
+            flags=self.flags[rows],
+            reference_ids=self.reference_ids[rows],
+            reference_starts=self.reference_starts[rows],
+            next_reference_ids=self.next_reference_ids[rows],
+            next_reference_starts=self.next_reference_starts[rows],
+            template_lengths=self.template_lengths[rows],
+            mapping_qualities=self.mapping_qualities[rows],
+            alignments=self.alignments.take(rows) if self.alignments is not None else None,
+        )
+
+    def unmap_empty_reads(self, pairs: bool = False) -> None:
+        """
+        Flag reads left without bases (every base deleted by errors) unmapped, in place.
+
+        SAM cannot align a read without bases, so such reads lose their alignment and mapping
+        quality. The mate of an unmapped read is flagged MATE_UNMAPPED and neither is in a proper
+        pair; as SAM recommends, the unmapped read takes the position of its mapped mate.
+
+        Args:
+            pairs (bool): Whether the batch holds read pairs, interleaved as R1, R2, R1, R2, ...
+        """
+        empty = self.lengths == 0
+        if not empty.any():
+            return
+        self.flags[empty] |= np.uint16(SamFlag.READ_UNMAPPED)
+        self.mapping_qualities[empty] = 0
+        if not pairs:
+            return
+        # the index of each read's mate
+        mates = np.arange(len(self)) ^ 1
+        self.flags[empty[mates]] |= np.uint16(SamFlag.MATE_UNMAPPED)
+        in_pair = empty | empty[mates]
+        self.flags[in_pair] &= ~np.uint16(SamFlag.READ_MAPPED_IN_PROPER_PAIR)
+        self.template_lengths[in_pair] = 0
+        alone = empty & ~empty[mates]
+        self.reference_starts[alone] = self.reference_starts[mates[alone]]
+        self.next_reference_starts[mates[alone]] = self.reference_starts[alone]
+
+    def aligned_segment(self, i: int) -> AlignedSegment:
+        """
+        Build a pysam AlignedSegment for the i-th read.
+        """
+        read = AlignedSegment()
+        read.query_name = self.names[i]
+        read.query_sequence = self.sequence(i)
+        read.query_qualities_str = self.quality_string(i)
+        read.flag = int(self.flags[i])
+        read.reference_id = int(self.reference_ids[i])
+        read.reference_start = int(self.reference_starts[i])
+        read.next_reference_id = int(self.next_reference_ids[i])
+        read.next_reference_start = int(self.next_reference_starts[i])
+        read.template_length = int(self.template_lengths[i])
+        read.mapping_quality = int(self.mapping_qualities[i])
+        if self.alignments is not None and not read.is_unmapped:
+            read.cigartuples = self.alignments.cigar_tuples(i)
+            read.set_tag("NM", int(self.alignments.edit_distances[i]))
+            read.set_tag("MD", self.alignments.md_string(i))
+        return read
+
+    def to_aligned_segments(self) -> Iterator[AlignedSegment]:
+        """
+        Lazily build a pysam AlignedSegment for each read.
+        """
+        for i in range(len(self)):
+            yield self.aligned_segment(i)
+
+    def _join_lines(
+        self, fields: Sequence[tuple[npt.NDArray[np.uint8], npt.NDArray[np.int64]] | bytes]
+    ) -> bytes:
+        """
+        Serialise one record per read, made of one line per field.
+
+        Each field is either a buffer of back to back runs with their lengths, one run per read,
+        or a constant line written for every read.
+        """
+        n = len(self)
+        runs = [
+            (np.frombuffer(f, dtype=np.uint8), np.full(n, len(f), dtype=np.int64), True)
+            if isinstance(f, bytes)
+            else (*f, False)
+            for f in fields
+        ]
+        record_lengths = np.sum([lengths for _, lengths, _ in runs], axis=0) + len(runs)
+        line_starts = np.cumsum(record_lengths) - record_lengths
+
+        out = np.empty(int(record_lengths.sum()), dtype=np.uint8)
+        for values, lengths, constant in runs:
+            if constant:
+                out[line_starts[:, None] + np.arange(len(values))] = values
+            else:
+                out[ragged_arange(line_starts, lengths)] = values
+            line_starts = line_starts + lengths
+            out[line_starts] = ord("\n")
+            line_starts += 1
+        return out.tobytes()
+
+    def as_sequenced(self) -> tuple[npt.NDArray[np.uint8], npt.NDArray[np.uint8]]:
+        """
+        Get the bases and qualities of all reads in the orientation they were sequenced in.
+        """
+        reverse = (self.flags & SamFlag.READ_REVERSE_STRAND) != 0
+        if not reverse.any():
+            return self.sequences, self.qualities
+        return reverse_complement_ragged(self.sequences, self.qualities, self.offsets, reverse)
+
+    def to_fastq(self) -> bytes:
+        """
+        Serialise the batch as FASTQ records.
+        """
+        names = [f"@{name}".encode("ascii") for name in self.names]
+        name_lengths = np.fromiter(map(len, names), dtype=np.int64, count=len(names))
+        sequences, qualities = self.as_sequenced()
+        return self._join_lines(
+            [
+                (np.frombuffer(b"".join(names), dtype=np.uint8), name_lengths),
+                (sequences, self.lengths),
+                b"+",
+                (qualities + PHRED_OFFSET, self.lengths),
+            ]
+        )
+
+    def to_sequence_lines(self) -> bytes:
+        """
+        Serialise the bases of each read, one read per line.
+        """
+        sequences, _ = self.as_sequenced()
+        return self._join_lines([(sequences, self.lengths)])
+
+    def to_quality_lines(self) -> bytes:
+        """
+        Serialise the Phred+33 encoded qualities of each read, one read per line.
+        """
+        _, qualities = self.as_sequenced()
+        return self._join_lines([(qualities + PHRED_OFFSET, self.lengths)])
+
+    def to_sam(self, reference_names: Sequence[str]) -> bytes:
+        """
+        Serialise the batch as SAM records (without header).
+
+        Args:
+            reference_names (Sequence[str]): Reference names indexed by reference_ids.
+        """
+        seqs = self.sequences.tobytes().decode("ascii")
+        quals = (self.qualities + PHRED_OFFSET).tobytes().decode("ascii")
+        offsets = self.offsets.tolist()
+        cigars, tags = self._sam_alignment_fields()
+        lines: list[str] = []
+        for i, (flag, ref_id, start, next_id, next_start, tlen, mapq) in enumerate(
+            zip(
+                self.flags.tolist(),
+                self.reference_ids.tolist(),
+                self.reference_starts.tolist(),
+                self.next_reference_ids.tolist(),
+                self.next_reference_starts.tolist(),
+                self.template_lengths.tolist(),
+                self.mapping_qualities.tolist(),
+            )
+        ):
+            placed = 0 <= ref_id < len(reference_names)
+            if placed and next_id == ref_id:
+                next_name = "="
+            elif 0 <= next_id < len(reference_names):
+                next_name = reference_names[next_id]
+            else:
+                next_name = "*"
+            unmapped = flag & SamFlag.READ_UNMAPPED
+            fields = (
+                self.names[i],
+                flag,
+                reference_names[ref_id] if placed else "*",
+                start + 1,
+                mapq,
+                "*" if unmapped else cigars[i],
+                next_name,
+                next_start + 1,
+                tlen,
+                # reads without bases (see unmap_empty_reads) have no sequence or qualities
+                seqs[offsets[i] : offsets[i + 1]] or "*",
+                quals[offsets[i] : offsets[i + 1]] or "*",
+            )
+            lines.append("\t".join(map(str, fields)) + ("" if unmapped else tags[i]) + "\n")
+        return "".join(lines).encode("ascii")
+
+    def _sam_alignment_fields(self) -> tuple[list[str], list[str]]:
+        """
+        Get the CIGAR and the NM and MD tag fields (with their leading tab) of each read.
+        """
+        if self.alignments is None:
+            return ["*"] * len(self), [""] * len(self)
+        text, lengths = self.alignments.cigar_text()
+        cigar_text = text.tobytes().decode("ascii")
+        cigar_offsets = lengths_to_offsets(lengths).tolist()
+        md_text = self.alignments.md.tobytes().decode("ascii")
+        md_offsets = self.alignments.md_offsets.tolist()
+        cigars = [cigar_text[cigar_offsets[i] : cigar_offsets[i + 1]] for i in range(len(self))]
+        tags = [
+            f"\tNM:i:{nm}\tMD:Z:{md_text[md_offsets[i] : md_offsets[i + 1]]}"
+            for i, nm in enumerate(self.alignments.edit_distances.tolist())
+        ]
+        return cigars, tags
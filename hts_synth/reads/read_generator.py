@@ -1,11 +1,28 @@
 from collections.abc import Iterable, Iterator
+from enum import StrEnum
+from typing import ClassVar
 
-import pysam
+import numpy as np
+import numpy.typing as npt
 from pysam import AlignedSegment
 
+from ..models.qual_model import PHRED_ERROR_PROBABILITIES, QualSimBase
 from ..ref.enums import VariantType
+from ..ref.gc_content import GCProfile
 from ..ref.generate_variant import VariantGenerator
 from ..ref.reference import ReferenceSegment
+from ..ref.region_index import ContigIntervals
+from ..ref.seq_converter import apply_variant_sets_ragged, as_sequence_buffer
+from ..ref.variant_arrays import VariantArraysBatch
+from ..utils.arrays import lengths_to_offsets, ragged_reverse_index
+from ..utils.rng import RngContext, RngStream
+from ..wrappers.sam_wrapper import SamFlag
+from .fragments import FragmentSampler, InsertSizeDistribution
+from .gc_bias import GCBias
+from .parallel import emit_shards
+from .read_batch import ReadBatch
+from .read_names import ReadNamer
+from .truth_alignment import TruthAlignments
 
 
 class QualityModel:
@@ -14,8 +31,20 @@ class QualityModel:
 
     This class provides functionality to generate quality scores for sequences
     of specified lengths. Currently serves as a placeholder implementation.
+
+    Attributes:
+        rng (np.random.Generator | None): Random number generator to use for simulation.
     """
 
+    def __init__(self, rng: np.random.Generator | None = None):
+        self.rng: np.random.Generator | None = rng
+
+    def reseed(self, rng: np.random.Generator) -> None:
+        """
+        Replace the random number generator used for simulation.
+        """
+        self.rng = rng
+
     def get_quality_scores(self, length: int) -> Iterable[int]:
         """
         Generate quality scores for a sequence of given length.
@@ -33,6 +62,55 @@ class QualityModel:
         """
         return [0 for _ in range(length)]
 
+    def get_quality_arrays(self, lengths: npt.NDArray[np.int64]) -> npt.NDArray[np.uint8]:
+        """
+        Generate quality scores for a batch of sequences of the given lengths.
+
+        Args:
+            lengths (npt.NDArray[np.int64]): The length of each sequence.
+
+        Returns:
+            npt.NDArray[np.uint8]: Quality scores of all sequences, back to back.
+        """
+        return np.zeros(int(lengths.sum()), dtype=np.uint8)
+
+
+class ErrorMode(StrEnum):
+    """
+    How ReadGenerator places sequencing errors.
+
+    FIXED applies round(probability * length) events of each type to every read, at uniformly
+    random positions. QUALITY samples qualities first and errs at each base with the probability
+    given by its Phred score, splitting errors between types in proportion to the error
+    probabilities, so errors fall where qualities are low.
+    """
+
+    FIXED = "fixed"
+    QUALITY = "quality"
+
+
+def _align_qualities(
+    qualities: npt.NDArray[np.uint8], variant_sets: VariantArraysBatch
+) -> npt.NDArray[np.uint8]:
+    """
+    Get the qualities of reads altered by per-base errors, back to back.
+
+    Args:
+        qualities (npt.NDArray[np.uint8]): (reads, bases) quality of each reference base
+        variant_sets (VariantArraysBatch): at most one event per base of each read, as from
+            VariantGenerator.generate_error_batch
+
+    Returns:
+        npt.NDArray[np.uint8]: Deleted bases lose their quality and inserted bases take the
+            quality of the base they precede.
+    """
+    n, ref_length = qualities.shape
+    rows = np.repeat(np.arange(n), variant_sets.set_sizes)
+    copies = np.ones(n * ref_length, dtype=np.int64)
+    # insertions (ref_len 0) add a copy, deletions (alt_len 0) remove one
+    copies[rows * ref_length + variant_sets.pos] += variant_sets.alt_len - variant_sets.ref_len
+    return np.repeat(qualities.ravel(), copies)
+
 
 class ReadGenerator:
     """
@@ -58,20 +136,55 @@ class ReadGenerator:
         VariantType.SUBSTITUTION: 0.05,
     }
 
+    default_shard_size: ClassVar[int] = 10_000
+
     def __init__(
         self,
         reference_segment: ReferenceSegment | str,
-        quality_model: QualityModel,
+        quality_model: QualityModel | QualSimBase,
         error_probabilities: dict[VariantType, float] | None = None,
-        paired: bool = True,
+        paired: bool | None = None,
+        rng: RngContext | None = None,
+        read_namer: ReadNamer | None = None,
+        error_mode: ErrorMode = ErrorMode.FIXED,
+        read_length: int | None = None,
+        insert_sizes: InsertSizeDistribution | None = None,
+        gc_bias: GCBias | None = None,
+        start_positions: int | None = None,
+        targets: ContigIntervals | None = None,
     ):
         """
         Initialize a ReadGenerator with quality model and error probabilities.
 
         Args:
-            quality_model (QualityModel): Object that provides quality score generation functionality.
+            quality_model (QualityModel | QualSimBase): Object that provides quality score generation
+                functionality, e.g. a learned model.
             error_probabilities (dict[VariantType, float] | None): Optional dictionary mapping VariantType to error
                 probability rates. If None, uses class default values.
+            paired (bool | None): Whether reads are flagged as paired. None (the default) pairs
+                reads exactly when insert sizes are given, so single reads carry no pairing
+                flags or mate fields. Single reads flagged as paired have an unmapped mate.
+            rng (RngContext | None): Source of all randomness used by the generator and its quality
+                model. If None, an unseeded context is created.
+            read_namer (ReadNamer | None): Naming scheme of generated reads, defaults to plain
+                counter-based names.
+            error_mode (ErrorMode): How errors are placed. ErrorMode.QUALITY requires a quality
+                model simulating qualities (a QualSimBase), and uses the error probabilities
+                only as the relative weights of each error type.
+            read_length (int | None): Number of reference bases covered by each read, placed
+                uniformly within the reference segment (see FragmentSampler). None makes every
+                read cover the whole segment.
+            insert_sizes (InsertSizeDistribution | None): Distribution of fragment lengths,
+                which makes the generator emit read pairs (see generate_batch). Requires a read
+                length, and paired not to be False.
+            gc_bias (GCBias | None): Coverage bias of reads (or fragments) by their GC fraction,
+                None to place them uniformly. Requires a read length.
+            start_positions (int | None): Number of positions, from the start of the segment,
+                reads (or fragments) may start at, None for any position they fit at. Requires a
+                read length.
+            targets (ContigIntervals | None): Intervals of the segment (see
+                ContigIntervals.within) every read (or fragment) must overlap, None to place them
+                anywhere. Requires a read length.
 
         Example:
             >>> quality_model = QualityModel()
@@ -80,12 +193,55 @@ class ReadGenerator:
         """
         self.reference_segment: ReferenceSegment | str = reference_segment
 
-        self.quality_model: QualityModel = quality_model
+        self.quality_model: QualityModel | QualSimBase = quality_model
 
         if error_probabilities:
             self.error_probabilities = error_probabilities
 
-        self.paired: bool = paired
+        self.paired: bool = paired if paired is not None else insert_sizes is not None
+
+        if error_mode == ErrorMode.QUALITY and not isinstance(quality_model, QualSimBase):
+            raise ValueError("Quality driven errors require a quality model which simulates")
+        self.error_mode: ErrorMode = error_mode
+
+        self.read_namer: ReadNamer = read_namer or ReadNamer()
+
+        self.fragment_sampler: FragmentSampler | None = None
+        if read_length is not None:
+            self.fragment_sampler = FragmentSampler(
+                len(self._input_sequence()), read_length, start_positions, targets
+            )
+        elif start_positions is not None or targets is not None:
+            raise ValueError("Placing reads over targets requires a read length")
+
+        if insert_sizes is not None and (not self.paired or self.fragment_sampler is None):
+            raise ValueError("Read pairs require paired and a read length")
+        self.insert_sizes: InsertSizeDistribution | None = insert_sizes
+
+        if gc_bias is not None and self.fragment_sampler is None:
+            raise ValueError("GC bias requires a read length")
+        self.gc_bias: GCBias | None = gc_bias
+        # built on first use, once per segment
+        self._gc_profile: GCProfile | None = None
+
+        self.rng: RngContext = rng if rng is not None else RngContext()
+        # shards and reads (or pairs) emitted so far, so that successive calls continue the run
+        self._next_shard: int = 0
+        self._next_read: int = 0
+        self.variant_rng: np.random.Generator | None = None
+        self.placement_rng: np.random.Generator = np.random.default_rng()
+        self.reseed(self.rng)
+
+    def reseed(self, rng: RngContext) -> None:
+        """
+        Draw all further randomness of the generator and its quality model from rng.
+
+        Args:
+            rng (RngContext): Context providing the variant, quality and placement streams.
+        """
+        self.variant_rng = rng.generator(RngStream.VARIANTS)
+        self.placement_rng = rng.generator(RngStream.PLACEMENT)
+        self.quality_model.reseed(rng.generator(RngStream.QUALITIES))
 
     def _generate(self) -> AlignedSegment:
         """
@@ -116,70 +272,342 @@ class ReadGenerator:
             >>> read = generator.generate(100, "ATCGATCG")
             >>> print(read.query_sequence)  # Potentially mutated sequence
         """
+        return self.generate_batch(1).aligned_segment(0)
+
+    def _input_sequence(self) -> str:
         # Get segment sequence if held in class
         if type(self.reference_segment) is ReferenceSegment:
-            input_sequence = self.reference_segment.sequence
+            return self.reference_segment.sequence
         elif type(self.reference_segment) is str:
-            input_sequence = self.reference_segment
+            return self.reference_segment
         else:
             raise ValueError(
                 "Generator reference segment must be either a 'ReferenceSegment' or a str"
             )
 
+    def _sample_placements(
+        self, amount: int
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+        """
+        Draw the start and length of amount reads (or fragments) within the segment.
+
+        Placement is uniform, or weighted by GC fraction if the generator has a GC bias.
+        """
+        sampler = self.fragment_sampler
+        if sampler is None:
+            raise ValueError("Placing reads requires a read length")
+        insert_sizes = self.insert_sizes
+
+        def draw(n: int) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+            if insert_sizes is not None:
+                return sampler.sample_fragments(self.placement_rng, n, insert_sizes)
+            return sampler.sample_starts(self.placement_rng, n), np.full(n, sampler.read_length)
+
+        if self.gc_bias is None:
+            return draw(amount)
+        if self._gc_profile is None:
+            self._gc_profile = GCProfile.from_bases(as_sequence_buffer(self._input_sequence()))
+        return self.gc_bias.sample(self.placement_rng, amount, draw, self._gc_profile)
+
+    def _apply_errors(
+        self,
+        input_sequence: str,
+        amount: int,
+        window_starts: npt.NDArray[np.int64] | None,
+        reverse: npt.NDArray[np.bool_] | None = None,
+    ) -> tuple[
+        VariantArraysBatch, npt.NDArray[np.uint8], npt.NDArray[np.int64], npt.NDArray[np.uint8]
+    ]:
+        """
+        Draw and apply the errors of amount reads, of the whole input sequence or of its windows.
+
+        Reads are returned on the forward strand. Qualities of the reads selected by reverse are
+        simulated in reverse, so that they run 5' to 3' on the reverse strand.
+
+        Returns:
+            tuple: The variant set of each read, the bases of all reads back to back, the
+                length of each read and the qualities of all reads back to back.
+        """
+        read_length = len(input_sequence)
+        if window_starts is not None and self.fragment_sampler is not None:
+            read_length = self.fragment_sampler.read_length
+        sequence_buffer = as_sequence_buffer(input_sequence)
+
+        if self.error_mode == ErrorMode.QUALITY and isinstance(self.quality_model, QualSimBase):
+            variant_generator = VariantGenerator(input_sequence, [], self.variant_rng)
+            read_qualities = self.quality_model.sample_batch(amount, read_length)
+            if reverse is not None:
+                read_qualities[reverse] = read_qualities[reverse, ::-1]
+            variant_sets = variant_generator.generate_error_batch(
+                PHRED_ERROR_PROBABILITIES[read_qualities],
+                self.error_probabilities,
+                window_starts=window_starts,
+            )
+            sequences, lengths = apply_variant_sets_ragged(
+                sequence_buffer, variant_sets, window_starts=window_starts
+            )
+            return variant_sets, sequences, lengths, _align_qualities(read_qualities, variant_sets)
+
         # Generate numbers of events based on error probabilities dict
         # [num_insertions, num_deletions, num_substitutions]
-        events = [round(rate * len(input_sequence)) for rate in self.error_probabilities.values()]
+        events = [round(rate * read_length) for rate in self.error_probabilities.values()]
+
+        variant_generator = VariantGenerator(input_sequence, events, self.variant_rng)
+        variant_sets = variant_generator.generate_variant_array_batch(
+            amount, window_starts=window_starts, window_length=read_length
+        )
+
+        if window_starts is None:
+            # Every set is drawn with the same event counts, so all span the same reference bases
+            ref_span = int(variant_sets.ref_spans[0]) if amount else read_length
+            sequence_buffer = sequence_buffer[:ref_span]
+        sequences, lengths = apply_variant_sets_ragged(
+            sequence_buffer, variant_sets, window_starts=window_starts
+        )
+        qualities = self.quality_model.get_quality_arrays(lengths)
+        if reverse is not None:
+            qualities = qualities[ragged_reverse_index(lengths_to_offsets(lengths), reverse)]
+        return variant_sets, sequences, lengths, qualities
+
+    def generate_batch(self, amount: int, first_read: int = 0) -> ReadBatch:
+        """
+        Generate a batch of synthetic reads with simulated sequencing errors.
+
+        Variants for all reads are drawn and applied together, and the reads are returned as a
+        ReadBatch of contiguous arrays rather than one AlignedSegment per read. With a read
+        length, each read covers a uniformly placed window of the reference segment, otherwise
+        the whole segment. With insert sizes, amount read pairs are generated instead (see
+        generate_pairs).
 
-        variant_generator = VariantGenerator(input_sequence, events)
+        Reads of a ReferenceSegment are mapped at their origin, with their true alignment (CIGAR,
+        MD and NM) derived from the errors applied to them (see TruthAlignments). Reads of a
+        plain sequence are unmapped.
 
-        read = AlignedSegment()
+        Args:
+            amount (int): The number of reads (or read pairs) to generate.
+            first_read (int): Index of the first read (or pair) within the run, used to name the
+                reads.
 
-        read.query_sequence = "".join(
-            variant.alt for variant in variant_generator.generate_random_variant_sequence()
+        Returns:
+            ReadBatch: The generated reads.
+        """
+        if self.insert_sizes is not None:
+            return self.generate_pairs(amount, first_read)
+
+        input_sequence = self._input_sequence()
+        window_starts = None
+        if self.fragment_sampler is not None:
+            window_starts = self._sample_placements(amount)[0]
+        variant_sets, sequences, lengths, qualities = self._apply_errors(
+            input_sequence, amount, window_starts
         )
 
-        read.query_qualities_str = pysam.qualities_to_qualitystring(
-            qualities=self.quality_model.get_quality_scores(len(read.query_sequence))  # pyright: ignore[reportArgumentType]
+        contig = None
+        alignments = None
+        mate_flag = SamFlag.READ_PAIRED | SamFlag.MATE_UNMAPPED if self.paired else 0
+        if type(self.reference_segment) is ReferenceSegment:
+            contig = self.reference_segment.chrom
+            reference_ids = np.zeros(amount, dtype=np.int32)
+            alignments, shifts = TruthAlignments.from_events(
+                variant_sets, as_sequence_buffer(input_sequence), window_starts
+            )
+            reference_starts = self.reference_segment.start + shifts
+            if window_starts is not None:
+                reference_starts += window_starts
+            flag = mate_flag
+        else:
+            reference_ids = np.full(amount, -1, dtype=np.int32)
+            reference_starts = np.full(amount, -1, dtype=np.int64)
+            flag = SamFlag.READ_UNMAPPED | mate_flag
+
+        names = self.read_namer.names(
+            first_read,
+            amount,
+            contig,
+            reference_starts,
+            np.full(amount, bool(flag & SamFlag.READ_REVERSE_STRAND)),
+            variant_sets.set_sizes,
+        )
+
+        batch = ReadBatch(
+            names=names,
+            sequences=sequences,
+            qualities=qualities,
+            offsets=lengths_to_offsets(lengths),
+            flags=np.full(amount, flag, dtype=np.uint16),
+            reference_ids=reference_ids,
+            reference_starts=reference_starts,
+            next_reference_ids=np.full(amount, -1, dtype=np.int32),
+            next_reference_starts=np.full(amount, -1, dtype=np.int64),
+            template_lengths=np.zeros(amount, dtype=np.int64),
+            mapping_qualities=np.full(amount, 20, dtype=np.uint8),
+            alignments=alignments,
         )
+        batch.unmap_empty_reads()
+        return batch
+
+    def generate_pairs(self, amount: int, first_pair: int = 0) -> ReadBatch:
+        """
+        Generate a batch of read pairs, interleaved as R1, R2, R1, R2, ...
 
-        # TODO actually generate read properties - meaningful name and correct flag
-        # Should this function return a pair of reads for paired end sequencing?
-        # Should this be a seperate function?
+        Fragment starts and lengths are drawn together from the insert size distribution, then
+        both reads of all pairs are cut as windows of the shared segment buffer and have their
+        errors applied in one step: R1 covers the first read length bases of its fragment on the
+        forward strand, R2 the last read length bases on the reverse strand (stored, as in SAM,
+        reverse complemented back to the forward strand). Mates share a name and carry each
+        other's position, and the TLEN spanned by their alignments (positive for the leftmost).
 
-        read.query_name = "synthetic_read/1"
-        read.reference_id = 0
+        Args:
+            amount (int): The number of read pairs to generate.
+            first_pair (int): Index of the first pair within the run, used to name the reads.
+
+        Returns:
+            ReadBatch: The 2 * amount generated reads.
+        """
+        if self.insert_sizes is None or self.fragment_sampler is None:
+            raise ValueError("Read pairs require insert sizes and a read length")
+        sampler = self.fragment_sampler
+        starts, fragment_lengths = self._sample_placements(amount)
+        window_starts = np.column_stack((starts, sampler.mate_starts(starts, fragment_lengths)))
+        reverse = np.tile([False, True], amount)
+        variant_sets, sequences, lengths, qualities = self._apply_errors(
+            self._input_sequence(), 2 * amount, window_starts.ravel(), reverse
+        )
 
+        contig = None
+        alignments = None
+        pair_flag = SamFlag.READ_PAIRED
         if type(self.reference_segment) is ReferenceSegment:
-            read.reference_start = self.reference_segment.start
-            read.next_reference_start = self.reference_segment.start + len(read.query_sequence)
+            contig = self.reference_segment.chrom
+            reference_ids = np.zeros(2 * amount, dtype=np.int32)
+            alignments, shifts = TruthAlignments.from_events(
+                variant_sets, as_sequence_buffer(self._input_sequence()), window_starts.ravel()
+            )
+            reference_starts = self.reference_segment.start + window_starts.ravel() + shifts
+            mates = reference_starts.reshape(amount, 2)
+            # each read points at the other read of its pair
+            next_reference_starts = mates[:, ::-1].ravel()
+            ends = (reference_starts + alignments.reference_lengths).reshape(amount, 2)
+            spans = ends.max(axis=1) - mates.min(axis=1)
+            # TLEN is positive for the leftmost read, R1 if both start together
+            first_left = mates[:, 0] <= mates[:, 1]
+            template_lengths = np.column_stack(
+                (np.where(first_left, spans, -spans), np.where(first_left, -spans, spans))
+            ).ravel()
+            fragment_starts = mates.min(axis=1)
+            pair_flag |= SamFlag.READ_MAPPED_IN_PROPER_PAIR
+        else:
+            reference_ids = np.full(2 * amount, -1, dtype=np.int32)
+            reference_starts = np.full(2 * amount, -1, dtype=np.int64)
+            next_reference_starts = reference_starts
+            template_lengths = np.zeros(2 * amount, dtype=np.int64)
+            fragment_starts = np.full(amount, -1, dtype=np.int64)
+            pair_flag |= SamFlag.READ_UNMAPPED | SamFlag.MATE_UNMAPPED
+
+        first = pair_flag | SamFlag.FIRST_IN_PAIR | SamFlag.MATE_REVERSE_STRAND
+        second = pair_flag | SamFlag.SECOND_IN_PAIR | SamFlag.READ_REVERSE_STRAND
+        flags = np.tile(np.array([first, second], dtype=np.uint16), amount)
+
+        pair_names = self.read_namer.names(
+            first_pair,
+            amount,
+            contig,
+            fragment_starts,
+            np.zeros(amount, dtype=np.bool_),
+            variant_sets.set_sizes.reshape(amount, 2).sum(axis=1),
+        )
+
+        batch = ReadBatch(
+            names=[name for name in pair_names for _ in range(2)],
+            sequences=sequences,
+            qualities=qualities,
+            offsets=lengths_to_offsets(lengths),
+            flags=flags,
+            reference_ids=reference_ids,
+            reference_starts=reference_starts,
+            next_reference_ids=reference_ids,
+            next_reference_starts=next_reference_starts,
+            template_lengths=template_lengths,
+            mapping_qualities=np.full(2 * amount, 20, dtype=np.uint8),
+            alignments=alignments,
+        )
+        batch.unmap_empty_reads(pairs=True)
+        return batch
+
+    def generate_shard(self, index: int, start: int, amount: int) -> ReadBatch:
+        """
+        Generate one shard of reads, seeded only by the generator's RngContext and the shard index.
+
+        Args:
+            index (int): Index of the shard within the run.
+            start (int): Index of the first read of the shard within the run.
+            amount (int): Number of reads in the shard.
+        """
+        self.reseed(self.rng.shard(index))
+        return self.generate_batch(amount, start)
+
+    def emit_batches(
+        self, amount: int = 1, workers: int = 1, shard_size: int | None = None
+    ) -> Iterator[ReadBatch]:
+        """
+        Generate synthetic reads from the same reference sequence, one batch per shard.
 
-        read.is_paired = self.paired
-        read.mapping_quality = 20
+        Successive calls continue the run: their shards and reads are numbered on from those of
+        earlier calls, so each call draws new reads with new names.
 
-        return read
+        Args:
+            amount (int): The number of reads (or read pairs) to generate.
+            workers (int): Number of processes to generate reads in.
+            shard_size (int | None): Number of reads per shard, defaults to default_shard_size.
+                Shards are seeded independently of the number of workers, so for a given
+                RngContext and shard size the output is identical for any number of workers.
 
-    def emit_reads(self, amount: int = 1) -> Iterator[AlignedSegment]:
+        Returns:
+            Iterator[ReadBatch]: The reads of each shard, in order.
+        """
+        shard_size = shard_size or self.default_shard_size
+        shard_sizes = [min(shard_size, amount - start) for start in range(0, amount, shard_size)]
+        first_shard, first_read = self._next_shard, self._next_read
+        self._next_shard += len(shard_sizes)
+        self._next_read += amount
+        return self._emit_shards(shard_sizes, workers, first_shard, first_read)
+
+    def _emit_shards(
+        self, shard_sizes: list[int], workers: int, first_shard: int, first_read: int
+    ) -> Iterator[ReadBatch]:
+        if workers > 1:
+            yield from emit_shards(
+                self, shard_sizes, workers, first_shard=first_shard, first_read=first_read
+            )
+        else:
+            for index, shard_amount in enumerate(shard_sizes, first_shard):
+                yield self.generate_shard(index, first_read, shard_amount)
+                first_read += shard_amount
+
+    def emit_reads(
+        self, amount: int = 1, workers: int = 1, shard_size: int | None = None
+    ) -> Iterator[AlignedSegment]:
         """
         Generate multiple synthetic reads from the same reference sequence.
 
         Creates a specified number of independent synthetic reads, each with
         potentially different mutations applied based on the error probabilities.
+        Reads are generated in batches (see emit_batches) and converted to
+        AlignedSegments as they are consumed.
 
         Args:
-            reference_position (int): The starting position within the reference genome
-                where these reads originate.
-            reference_sequence (str): The reference DNA sequence to use as the basis
-                for read generation.
-            amount (int): The number of reads to generate. Defaults to 10.
+            amount (int): The number of reads to generate. Defaults to 1.
+            workers (int): Number of processes to generate reads in.
+            shard_size (int | None): Number of reads per shard, defaults to default_shard_size.
 
         Yields:
             AlignedSegment: Individual synthetic reads, each potentially containing
                 different mutations from the same reference sequence.
 
         Example:
-            >>> generator = ReadGenerator(QualityModel())
-            >>> reads = list(generator.generate_multiple(100, "ATCGATCG", 5))
+            >>> generator = ReadGenerator("ATCGATCG", QualityModel())
+            >>> reads = list(generator.emit_reads(5))
             >>> len(reads)  # 5
         """
-        for _ in range(amount):
-            yield self._generate()
+        for batch in self.emit_batches(amount, workers, shard_size):
+            yield from batch.to_aligned_segments()
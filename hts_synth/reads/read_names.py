@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+
+
+@dataclass(slots=True, frozen=True)
+class ReadNamer:
+    """
+    Deterministic, counter-based read names.
+
+    Each read is named by its index within the run, ``{prefix}.{index}``, so names are unique,
+    compact and ordered, and independent of how the run was sharded. Optionally the truth of
+    each read is appended as ``:{contig}:{position}:{strand}:{events}``, with the 0-based
+    origin position, ``+``/``-`` strand and number of applied events. Unplaced reads have
+    contig ``*`` and position -1.
+
+    Attributes:
+        prefix (str): Prefix of every name.
+        truth (bool): Whether to append truth information.
+
+    Example:
+        >>> ReadNamer("sim").names(10, 2)
+        ['sim.10', 'sim.11']
+        >>> ReadNamer(truth=True).names(
+        ...     0, 1, "chr1", np.array([99]), np.array([True]), np.array([3])
+        ... )
+        ['read.0:chr1:99:-:3']
+    """
+
+    prefix: str = "read"
+    truth: bool = False
+
+    def names(
+        self,
+        first: int,
+        n: int,
+        contig: str | None = None,
+        reference_starts: npt.NDArray[np.int64] | None = None,
+        reverse: npt.NDArray[np.bool_] | None = None,
+        event_counts: npt.NDArray[np.int64] | None = None,
+    ) -> list[str]:
+        """
+        Name a batch of consecutive reads.
+
+        The truth arguments are only used when truth is set, and default to an unplaced,
+        forward strand read without events.
+
+        Args:
+            first (int): Index of the first read within the run.
+            n (int): Number of reads.
+            contig (str | None): Contig all reads originate from, None if unplaced.
+            reference_starts (npt.NDArray[np.int64] | None): 0-based origin of each read.
+            reverse (npt.NDArray[np.bool_] | None): Whether each read is on the reverse strand.
+            event_counts (npt.NDArray[np.int64] | None): Number of events applied to each read.
+
+        Returns:
+            list[str]: Name of each read.
+        """
+        counters = range(first, first + n)
+        if not self.truth:
+            return [f"{self.prefix}.{i}" for i in counters]
+
+        contig = contig or "*"
+        starts = reference_starts.tolist() if reference_starts is not None else [-1] * n
+        strands = np.where(reverse, "-", "+").tolist() if reverse is not None else ["+"] * n
+        events = event_counts.tolist() if event_counts is not None else [0] * n
+        return [
+            f"{self.prefix}.{i}:{contig}:{start}:{strand}:{count}"
+            for i, start, strand, count in zip(counters, starts, strands, events)
+        ]
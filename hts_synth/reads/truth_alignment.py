@@ -0,0 +1,326 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+from enum import IntEnum
+
+import numpy as np
+import numpy.typing as npt
+
+from ..ref.variant_arrays import VariantArraysBatch
+from ..utils.arrays import (
+    decimal_ascii,
+    lengths_to_offsets,
+    ragged_arange,
+    ragged_interleave,
+    ragged_sums,
+)
+
+_CIGAR_CHARS = np.frombuffer(b"MIDNSHP=XB", dtype=np.uint8)
+_UPPER = np.arange(256, dtype=np.uint8)
+_UPPER[np.arange(ord("a"), ord("z") + 1)] -= ord("a") - ord("A")
+
+
+class CigarOp(IntEnum):
+    """
+    CIGAR operations, numbered as in BAM (and pysam cigartuples).
+    """
+
+    MATCH = 0
+    INSERTION = 1
+    DELETION = 2
+    SOFT_CLIP = 4
+
+
+@dataclass(slots=True)
+class TruthAlignments:
+    """
+    The true alignment of each read of a batch to its reference window, as flat arrays.
+
+    Attributes:
+        cigar_ops (npt.NDArray[np.uint8]): CIGAR operations (CigarOp) of all reads, back to back.
+        cigar_lengths (npt.NDArray[np.int64]): Length of each CIGAR operation.
+        cigar_offsets (npt.NDArray[np.int64]): Offsets of each read into the operations, one
+            more than the number of reads.
+        md (npt.NDArray[np.uint8]): ASCII MD tags of all reads, back to back.
+        md_offsets (npt.NDArray[np.int64]): Offsets of each read into md.
+        edit_distances (npt.NDArray[np.int64]): NM tag (mismatches plus inserted and deleted
+            bases) of each read.
+        reference_lengths (npt.NDArray[np.int64]): Number of reference bases each read aligns to.
+    """
+
+    cigar_ops: npt.NDArray[np.uint8]
+    cigar_lengths: npt.NDArray[np.int64]
+    cigar_offsets: npt.NDArray[np.int64]
+    md: npt.NDArray[np.uint8]
+    md_offsets: npt.NDArray[np.int64]
+    edit_distances: npt.NDArray[np.int64]
+    reference_lengths: npt.NDArray[np.int64]
+
+    def __len__(self) -> int:
+        return len(self.edit_distances)
+
+    def cigar_tuples(self, i: int) -> list[tuple[int, int]]:
+        """Get the (operation, length) pairs of the CIGAR of the i-th read."""
+        start, end = self.cigar_offsets[i], self.cigar_offsets[i + 1]
+        return list(zip(self.cigar_ops[start:end].tolist(), self.cigar_lengths[start:end].tolist()))
+
+    def md_string(self, i: int) -> str:
+        """Get the MD tag of the i-th read."""
+        return self.md[self.md_offsets[i] : self.md_offsets[i + 1]].tobytes().decode("ascii")
+
+    def cigar_text(self) -> tuple[npt.NDArray[np.uint8], npt.NDArray[np.int64]]:
+        """
+        Format the CIGAR strings of all reads at once.
+
+        Returns:
+            tuple: The ASCII CIGAR strings back to back, and the length of each.
+        """
+        digits, digit_lengths = decimal_ascii(self.cigar_lengths)
+        text, op_lengths = ragged_interleave(
+            [(digits, digit_lengths), (_CIGAR_CHARS[self.cigar_ops], np.ones_like(digit_lengths))]
+        )
+        return text, ragged_sums(op_lengths, self.cigar_offsets)
+
+    def take(self, rows: npt.NDArray[np.intp]) -> TruthAlignments:
+        """
+        Get the alignments of the selected reads.
+        """
+        cigar_counts = np.diff(self.cigar_offsets)[rows]
+        cigar = ragged_arange(self.cigar_offsets[rows], cigar_counts)
+        md_lengths = np.diff(self.md_offsets)[rows]
+        return TruthAlignments(
+            cigar_ops=self.cigar_ops[cigar],
+            cigar_lengths=self.cigar_lengths[cigar],
+            cigar_offsets=lengths_to_offsets(cigar_counts),
+            md=self.md[ragged_arange(self.md_offsets[rows], md_lengths)],
+            md_offsets=lengths_to_offsets(md_lengths),
+            edit_distances=self.edit_distances[rows],
+            reference_lengths=self.reference_lengths[rows],
+        )
+
+    @classmethod
+    def concatenate(cls, alignments: Sequence[TruthAlignments]) -> TruthAlignments:
+        """
+        Join alignments end to end.
+        """
+        return cls(
+            cigar_ops=np.concatenate([a.cigar_ops for a in alignments]),
+            cigar_lengths=np.concatenate([a.cigar_lengths for a in alignments]),
+            cigar_offsets=lengths_to_offsets(
+                np.concatenate([np.diff(a.cigar_offsets) for a in alignments])
+            ),
+            md=np.concatenate([a.md for a in alignments]),
+            md_offsets=lengths_to_offsets(
+                np.concatenate([np.diff(a.md_offsets) for a in alignments])
+            ),
+            edit_distances=np.concatenate([a.edit_distances for a in alignments]),
+            reference_lengths=np.concatenate([a.reference_lengths for a in alignments]),
+        )
+
+    @classmethod
+    def from_events(
+        cls,
+        variant_sets: VariantArraysBatch,
+        reference: npt.NDArray[np.uint8],
+        window_starts: npt.NDArray[np.int64] | None = None,
+    ) -> tuple[TruthAlignments, npt.NDArray[np.int64]]:
+        """
+        Derive the alignment of each read from the events applied to its reference window.
+
+        The whole batch is processed with array operations over its events (and the reference
+        bases they touch), never over every base of every read. Deletions at either end of a
+        read are trimmed off its alignment, and insertions at either end are soft clipped.
+
+        Args:
+            variant_sets (VariantArraysBatch): The events of each read, relative to its window,
+                as applied by apply_variant_sets_ragged.
+            reference (npt.NDArray[np.uint8]): ASCII bases of the reference sequence.
+            window_starts (npt.NDArray[np.int64] | None): Start of each read's window of the
+                reference, None if every read starts at its first base.
+
+        Returns:
+            tuple: The alignments, and the offset of each read's alignment from its window
+                start (the length of any trimmed leading deletion).
+        """
+        n = len(variant_sets)
+        if window_starts is None:
+            window_starts = np.zeros(n, dtype=np.int64)
+        reads = np.repeat(np.arange(n), variant_sets.set_sizes)
+        pos, ref_len, alt_len = variant_sets.pos, variant_sets.ref_len, variant_sets.alt_len
+        alt_starts = variant_sets.alt_offsets[:-1]
+
+        # Trim chains of deletions off both ends, one deletion per read and end per step
+        keep = np.ones(len(pos), dtype=np.bool_)
+        shifts = np.zeros(n, dtype=np.int64)
+        spans = variant_sets.ref_spans.copy()
+        is_deletion = (alt_len == 0) & (ref_len > 0)
+        while True:
+            leading = keep & is_deletion & (pos == shifts[reads])
+            trailing = keep & is_deletion & ~leading & (pos + ref_len == spans[reads])
+            if not (leading.any() or trailing.any()):
+                break
+            keep &= ~(leading | trailing)
+            np.add.at(shifts, reads[leading], ref_len[leading])
+            np.subtract.at(spans, reads[trailing], ref_len[trailing])
+
+        reads, ref_len, alt_len = reads[keep], ref_len[keep], alt_len[keep]
+        alt_starts = alt_starts[keep]
+        spans -= shifts
+        # insertions next to a trimmed deletion are moved to the end of the alignment
+        pos = np.clip(pos[keep] - shifts[reads], 0, spans[reads])
+
+        ops, lengths, op_reads = _cigar(reads, pos, ref_len, alt_len, spans)
+        cigar_offsets = lengths_to_offsets(np.bincount(op_reads, minlength=n))
+
+        # every reference base of an event is a deleted or aligned base, which may mismatch
+        event_bases = np.repeat(np.arange(len(pos)), ref_len)
+        k = np.arange(len(event_bases)) - (np.cumsum(ref_len) - ref_len)[event_bases]
+        base_reads = reads[event_bases]
+        ref_bases = _UPPER[
+            reference[window_starts[base_reads] + shifts[base_reads] + pos[event_bases] + k]
+        ]
+        deleted = k >= alt_len[event_bases]
+        alt = np.append(variant_sets.alt, np.uint8(0))
+        alt_bases = _UPPER[alt[np.where(deleted, len(alt) - 1, alt_starts[event_bases] + k)]]
+        mismatched = ~deleted & (ref_bases != alt_bases)
+        differs = deleted | mismatched
+
+        md, md_lengths = _md(
+            base_reads[differs],
+            event_bases[differs],
+            pos[event_bases][differs] + k[differs],
+            deleted[differs],
+            ref_bases[differs],
+            spans,
+        )
+        indels = np.where((ops == CigarOp.INSERTION) | (ops == CigarOp.DELETION), lengths, 0)
+        alignments = cls(
+            cigar_ops=ops,
+            cigar_lengths=lengths,
+            cigar_offsets=cigar_offsets,
+            md=md,
+            md_offsets=lengths_to_offsets(md_lengths),
+            edit_distances=ragged_sums(indels, cigar_offsets)
+            + np.bincount(base_reads[mismatched], minlength=n),
+            reference_lengths=spans,
+        )
+        return alignments, shifts
+
+
+def _cigar(
+    reads: npt.NDArray[np.int64],
+    pos: npt.NDArray[np.int64],
+    ref_len: npt.NDArray[np.int64],
+    alt_len: npt.NDArray[np.int64],
+    spans: npt.NDArray[np.int64],
+) -> tuple[npt.NDArray[np.uint8], npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """
+    Build the CIGAR operations of reads from their (sorted, non-overlapping) events.
+
+    Every event gives three operations: the match up to it, its aligned bases, and the insertion
+    or deletion of its remaining bases, and every read a final match. Empty operations are then
+    dropped and neighbouring operations of the same kind merged.
+
+    Returns:
+        tuple: The operations of all reads back to back, their lengths and their reads.
+    """
+    n, n_events = len(spans), len(pos)
+    ends = pos + ref_len
+    same_read = np.zeros(n_events, dtype=np.bool_)
+    same_read[1:] = reads[1:] == reads[:-1]
+    previous_ends = np.where(same_read, np.roll(ends, 1), 0)
+    delta = alt_len - ref_len
+
+    # the slots of event e of read r are 3e + r, 3e + r + 1 and 3e + r + 2, then the final
+    # match of read r takes 3 * (events up to and including r) + r
+    counts = np.bincount(reads, minlength=n)
+    read_ends = np.where(counts > 0, np.append(ends, 0)[np.cumsum(counts) - 1], 0)
+
+    ops = np.zeros(3 * n_events + n, dtype=np.uint8)
+    lengths = np.zeros(3 * n_events + n, dtype=np.int64)
+    slot_reads = np.zeros(3 * n_events + n, dtype=np.int64)
+    slots = 3 * np.arange(n_events) + reads
+    lengths[slots] = pos - previous_ends
+    lengths[slots + 1] = np.minimum(ref_len, alt_len)
+    indel = np.where(delta > 0, CigarOp.INSERTION, CigarOp.DELETION).astype(np.uint8)
+    # insertions before the first or after the last aligned base are soft clips
+    clipped = (ref_len == 0) & ((pos == 0) | (pos == spans[reads]))
+    ops[slots + 2] = np.where(clipped, CigarOp.SOFT_CLIP, indel)
+    lengths[slots + 2] = np.abs(delta)
+    for offset in range(3):
+        slot_reads[slots + offset] = reads
+    finals = 3 * np.cumsum(counts) + np.arange(n)
+    lengths[finals] = spans - read_ends
+    slot_reads[finals] = np.arange(n)
+
+    used = lengths > 0
+    ops, lengths, slot_reads = ops[used], lengths[used], slot_reads[used]
+    starts = np.ones(len(ops), dtype=np.bool_)
+    starts[1:] = (ops[1:] != ops[:-1]) | (slot_reads[1:] != slot_reads[:-1])
+    run_starts = np.flatnonzero(starts)
+    merged = np.add.reduceat(lengths, run_starts) if len(run_starts) else lengths
+    return ops[run_starts], merged, slot_reads[run_starts]
+
+
+def _md(
+    reads: npt.NDArray[np.int64],
+    events: npt.NDArray[np.int64],
+    pos: npt.NDArray[np.int64],
+    deleted: npt.NDArray[np.bool_],
+    bases: npt.NDArray[np.uint8],
+    spans: npt.NDArray[np.int64],
+) -> tuple[npt.NDArray[np.uint8], npt.NDArray[np.int64]]:
+    """
+    Build the MD tags of reads from their mismatched and deleted reference bases.
+
+    Each such base, with the event it belongs to, is written as the number of matching bases
+    before it (omitted within a run of deleted bases), a caret starting a run of deleted bases, and the base itself; every tag
+    ends with the number of matching bases after its last such base.
+
+    Returns:
+        tuple: The MD tags of all reads back to back, and the length of each.
+    """
+    n, n_bases = len(spans), len(pos)
+    same_read = np.zeros(n_bases, dtype=np.bool_)
+    same_read[1:] = reads[1:] == reads[:-1]
+    previous_ends = np.where(same_read, np.roll(pos, 1) + 1, 0)
+    # deleted bases continue a run unless a mismatch or insertion (another event) separates them
+    continues = (
+        deleted
+        & same_read
+        & np.roll(deleted, 1)
+        & (previous_ends == pos)
+        & (events - np.roll(events, 1) <= 1)
+    )
+
+    # items are each base then the final count of each read, as slots in read order
+    counts = np.bincount(reads, minlength=n)
+    n_items = n_bases + n
+    numbers = np.zeros(n_items, dtype=np.int64)
+    has_number = np.ones(n_items, dtype=np.bool_)
+    caret = np.zeros(n_items, dtype=np.bool_)
+    has_base = np.zeros(n_items, dtype=np.bool_)
+    item_bases = np.zeros(n_items, dtype=np.uint8)
+
+    slots = np.arange(n_bases) + reads
+    numbers[slots] = pos - previous_ends
+    has_number[slots] = ~continues
+    caret[slots] = deleted & ~continues
+    has_base[slots] = True
+    item_bases[slots] = bases
+    last_ends = np.where(counts > 0, np.append(pos + 1, 0)[np.cumsum(counts) - 1], 0)
+    finals = np.cumsum(counts) + np.arange(n)
+    numbers[finals] = spans - last_ends
+
+    digits, digit_lengths = decimal_ascii(numbers[has_number])
+    number_lengths = np.zeros(n_items, dtype=np.int64)
+    number_lengths[has_number] = digit_lengths
+    text, item_lengths = ragged_interleave(
+        [
+            (digits, number_lengths),
+            (np.full(int(caret.sum()), ord("^"), dtype=np.uint8), caret.astype(np.int64)),
+            (item_bases[has_base], has_base.astype(np.int64)),
+        ]
+    )
+    return text, ragged_sums(item_lengths, lengths_to_offsets(counts + 1))
@@ -1,4 +1,4 @@
-from enum import IntEnum
+from enum import IntEnum, StrEnum
 
 
 class VariantType(IntEnum):
@@ -12,3 +12,22 @@ class VariantClassification(IntEnum):
     CLASSIFIED = 0
     UNCLASSIFIED = 1
     MONOMORPHIC = 2
+
+
+class ReferenceBackend(StrEnum):
+    """
+    How Reference reads bases: through the FASTA index, or from a packed copy of the FASTA.
+    """
+
+    FAIDX = "faidx"
+    PACKED = "packed"
+
+
+class LowComplexityMode(StrEnum):
+    """
+    How sampling treats low complexity regions: as any other, avoiding them, or only near them.
+    """
+
+    INCLUDE = "include"
+    EXCLUDE = "exclude"
+    ONLY = "only"
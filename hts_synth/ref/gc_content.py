@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+
+from .reference import Reference
+
+_IS_GC = np.zeros(256, dtype=np.bool_)
+_IS_GC[np.frombuffer(b"GCgc", dtype=np.uint8)] = True
+
+
+@dataclass(slots=True, frozen=True)
+class GCProfile:
+    """
+    Cumulative G/C counts of a segment of reference, giving the GC fraction of any interval in O(1).
+
+    The profile is built once, in one pass over the segment's bases, then the GC fraction of any
+    number of intervals (e.g. candidate fragments) is computed together from two lookups each. It
+    holds 4 bytes per base, so profiles are built for the contigs or windows being sampled
+    rather than for a whole genome at once.
+
+    Attributes:
+        start (int): Reference position of the first base of the segment.
+        prefix (npt.NDArray[np.uint32]): Number of G or C bases before each position of the
+            segment, one more entry than bases.
+
+    Example:
+        >>> profile = GCProfile.from_bases(np.frombuffer(b"ACGTGGCCAT", dtype=np.uint8))
+        >>> profile.fractions(np.array([0, 4]), np.array([4, 8])).tolist()
+        [0.5, 1.0]
+    """
+
+    start: int
+    prefix: npt.NDArray[np.uint32]
+
+    def __len__(self) -> int:
+        return len(self.prefix) - 1
+
+    @classmethod
+    def from_bases(cls, bases: npt.NDArray[np.uint8], start: int = 0) -> GCProfile:
+        """
+        Build the profile of a segment from its ASCII bases (either case).
+        """
+        prefix = np.zeros(len(bases) + 1, dtype=np.uint32)
+        _ = np.cumsum(_IS_GC[bases], dtype=np.uint32, out=prefix[1:])
+        return cls(start, prefix)
+
+    @classmethod
+    def from_reference(
+        cls, reference: Reference, chrom: str, start: int = 0, end: int | None = None
+    ) -> GCProfile:
+        """
+        Build the profile of a contig, or of a segment of it, of a Reference.
+        """
+        if end is None:
+            end = reference.fasta.get_reference_length(chrom)
+        return cls.from_bases(reference.fetch_array(chrom, start, end), start)
+
+    def counts(
+        self, starts: npt.NDArray[np.int64], ends: npt.NDArray[np.int64]
+    ) -> npt.NDArray[np.int64]:
+        """
+        Get the number of G or C bases of each interval, in reference coordinates.
+        """
+        return self.prefix[ends - self.start].astype(np.int64) - self.prefix[starts - self.start]
+
+    def fractions(
+        self, starts: npt.NDArray[np.int64], ends: npt.NDArray[np.int64]
+    ) -> npt.NDArray[np.float64]:
+        """
+        Get the GC fraction of each interval, in reference coordinates (0 for empty intervals).
+        """
+        return self.counts(starts, ends) / np.maximum(ends - starts, 1)
@@ -1,10 +1,42 @@
 import random
-from collections.abc import Sequence
+from collections.abc import Iterator, Mapping, Sequence
 
 import numpy as np
+import numpy.typing as npt
 
+from ..utils.arrays import lengths_to_offsets
 from .enums import VariantType
 from .variant import Variant
+from .variant_arrays import VariantArrays, VariantArraysBatch
+
+_BASES_ASCII = np.frombuffer(b"ACGT", dtype=np.uint8)
+# Index of each ASCII base in _BASES_ASCII, 0 for anything else (e.g. N)
+_BASE_CODES = np.zeros(256, dtype=np.int64)
+_BASE_CODES[_BASES_ASCII] = np.arange(len(_BASES_ASCII))
+_BASE_CODES[np.frombuffer(b"acgt", dtype=np.uint8)] = np.arange(len(_BASES_ASCII))
+
+
+def _sample_distinct_sorted(
+    rng: np.random.Generator, n_rows: int, population: int, k: int
+) -> npt.NDArray[np.int64]:
+    """
+    Draw k distinct values from range(population) for each of n_rows rows, sorted within rows.
+    """
+    if k == 0:
+        return np.zeros((n_rows, 0), dtype=np.int64)
+    if 2 * k > population:
+        # Dense draws: rejection would mostly collide, so rank random keys instead
+        return np.sort(np.argsort(rng.random((n_rows, population)), axis=1)[:, :k], axis=1)
+
+    draws = np.sort(rng.integers(0, population, size=(n_rows, k)), axis=1)
+    while True:
+        dup = np.zeros(draws.shape, dtype=bool)
+        dup[:, 1:] = draws[:, 1:] == draws[:, :-1]
+        n_dup = int(np.count_nonzero(dup))
+        if not n_dup:
+            return draws
+        draws[dup] = rng.integers(0, population, size=n_dup)
+        draws.sort(axis=1)
 
 
 class VariantGenerator:
@@ -20,9 +52,13 @@ class VariantGenerator:
         ref_offset (int): Tracking offset for reference sequence position adjustments.
         events (Sequence[int]): Number of each variant type to generate.
         ref_sequence (str): The reference genomic sequence.
+        rng (np.random.Generator | None): Random number generator to draw from, None uses the
+            global random and numpy.random state.
     """
 
-    def __init__(self, ref_sequence: str, events: Sequence[int]):
+    def __init__(
+        self, ref_sequence: str, events: Sequence[int], rng: np.random.Generator | None = None
+    ):
         """
         Initialise a VariantGenerator with a reference sequence and event counts.
 
@@ -33,6 +69,9 @@ class VariantGenerator:
                                   - events[0]: Number of insertions (VariantType.INSERTION)
                                   - events[1]: Number of deletions (VariantType.DELETION)
                                   - events[2]: Number of substitutions (VariantType.SUBSTITUTION)
+            rng (np.random.Generator | None): Random number generator to draw from, usually
+                provided by RngContext.generator. None uses the global random and numpy.random
+                state.
 
         Note:
             The events parameter should have at least 3 elements corresponding to
@@ -42,6 +81,24 @@ class VariantGenerator:
         self.ref_offset: int = 0
         self.events: Sequence[int] = events
         self.ref_sequence: str = ref_sequence
+        self.rng: np.random.Generator | None = rng
+        self._alt_bases: Iterator[str] = iter(())
+
+    def _permutation(self, n: int) -> npt.NDArray[np.int64]:
+        if self.rng is None:
+            return np.random.permutation(n)
+        return self.rng.permutation(n)
+
+    def _draw_alt_bases(self, n: int) -> npt.NDArray[np.uint8]:
+        if self.rng is None:
+            return np.frombuffer(
+                "".join(random.choice(self.bases) for _ in range(n)).encode("ascii"),
+                dtype=np.uint8,
+            )
+        return _BASES_ASCII[self.rng.integers(0, len(_BASES_ASCII), size=n)]
+
+    def _next_alt_base(self) -> str:
+        return next(self._alt_bases, None) or self._draw_alt_bases(1).tobytes().decode("ascii")
 
     def generate_random_variant_sequence(self):
         """
@@ -67,7 +124,13 @@ class VariantGenerator:
         alt_length = ref_length + (num_insertions - num_deletions)
         total_length = max(ref_length, alt_length)
         num_events = num_insertions + num_deletions + num_substitutions
-        event_indices = list(np.random.permutation(total_length)[:num_events])
+        event_indices = list(self._permutation(total_length)[:num_events])
+
+        # Alternative bases are drawn up front, in position order
+        num_alt = len(event_indices) - len(
+            event_indices[num_insertions : num_insertions + num_deletions]
+        )
+        self._alt_bases = iter(self._draw_alt_bases(num_alt).tobytes().decode("ascii"))
 
         variant_sequence = []
         for i in range(total_length):
@@ -78,6 +141,241 @@ class VariantGenerator:
 
         return variant_sequence
 
+    def generate_variant_arrays(self) -> VariantArrays:
+        """
+        Generate the same random variants as generate_random_variant_sequence, as arrays.
+
+        Event positions and types are drawn in a single pass and only the events themselves are
+        materialised, so the cost scales with the number of events rather than the length of
+        the reference sequence. For the same random state the result describes exactly the
+        sequence produced by joining the alternative bases of generate_random_variant_sequence.
+
+        Returns:
+            VariantArrays: Event positions (in reference coordinates), reference lengths and
+                alternative bases. Substitutions which happen to draw the reference base are
+                not events and are omitted.
+        """
+        ref_length = len(self.ref_sequence)
+        num_insertions = self.events[VariantType.INSERTION]
+        num_deletions = self.events[VariantType.DELETION]
+        num_substitutions = self.events[VariantType.SUBSTITUTION]
+        alt_length = ref_length + (num_insertions - num_deletions)
+        total_length = max(ref_length, alt_length)
+        num_events = num_insertions + num_deletions + num_substitutions
+        event_indices = self._permutation(total_length)[:num_events]
+
+        # Event types follow the order of event_indices, as in get_ref_alt
+        event_types = np.repeat(
+            [VariantType.INSERTION, VariantType.DELETION, VariantType.SUBSTITUTION],
+            [num_insertions, num_deletions, num_substitutions],
+        )[: len(event_indices)]
+        order = np.argsort(event_indices, kind="stable")
+        event_indices = event_indices[order]
+        event_types = event_types[order]
+
+        is_insertion = event_types == VariantType.INSERTION
+        has_alt = event_types != VariantType.DELETION
+
+        # Each insertion shifts every later index one base back along the reference
+        pos = event_indices - (np.cumsum(is_insertion) - is_insertion)
+        ref_span = total_length - int(is_insertion.sum())
+
+        # Alternative bases are drawn in position order, as in generate_random_variant_sequence
+        alt_bases = self._draw_alt_bases(int(has_alt.sum()))
+        ref_bases = np.frombuffer(self.ref_sequence[:ref_span].encode("ascii"), dtype=np.uint8)
+
+        alt_all = np.zeros(len(event_types), dtype=np.uint8)
+        alt_all[has_alt] = alt_bases
+
+        # Drop substitutions that drew the reference base
+        is_substitution = event_types == VariantType.SUBSTITUTION
+        keep = np.ones(len(event_types), dtype=bool)
+        keep[is_substitution] = alt_all[is_substitution] != ref_bases[pos[is_substitution]]
+
+        alt_len = has_alt[keep].astype(np.int64)
+
+        return VariantArrays(
+            pos=pos[keep].astype(np.int64),
+            ref_len=(~is_insertion[keep]).astype(np.int64),
+            alt=alt_all[keep][has_alt[keep]],
+            alt_offsets=lengths_to_offsets(alt_len),
+            ref_span=ref_span,
+        )
+
+    def _windows(
+        self, n: int, window_starts: npt.NDArray[np.int64] | None, window_length: int | None
+    ) -> tuple[int, npt.NDArray[np.int64]]:
+        """
+        Get the length of the reference each of n sets applies to, and the start of each.
+        """
+        if window_starts is None:
+            return len(self.ref_sequence), np.zeros(n, dtype=np.int64)
+        if window_length is None or len(window_starts) != n:
+            raise ValueError("Windows need a length and a start for every set")
+        if len(window_starts) and (
+            window_starts.min() < 0 or window_starts.max() + window_length > len(self.ref_sequence)
+        ):
+            raise ValueError("Windows must lie within the reference sequence")
+        return window_length, window_starts
+
+    def generate_variant_array_batch(
+        self,
+        n: int,
+        rng: np.random.Generator | None = None,
+        window_starts: npt.NDArray[np.int64] | None = None,
+        window_length: int | None = None,
+    ) -> VariantArraysBatch:
+        """
+        Generate n independent random variant sets in one vectorised pass.
+
+        Each set follows the same distribution as generate_variant_arrays, but positions, event
+        types and alternative bases for all sets are drawn together as (n, events) arrays.
+
+        Args:
+            n (int): Number of independent variant sets to generate.
+            rng (np.random.Generator | None): Random number generator to draw from, None uses
+                the generator's own, or an unseeded generator if it has none.
+            window_starts (npt.NDArray[np.int64] | None): Start of the window of the reference
+                sequence each set applies to, None if every set applies to the whole sequence.
+            window_length (int | None): Length of the windows, required with window_starts.
+
+        Returns:
+            VariantArraysBatch: The event tables of all sets, back to back. With windows,
+                positions are relative to the start of each set's window.
+        """
+        rng = (
+            rng
+            if rng is not None
+            else self.rng
+            if self.rng is not None
+            else np.random.default_rng()
+        )
+        ref_length, window_starts = self._windows(n, window_starts, window_length)
+        num_insertions = self.events[VariantType.INSERTION]
+        num_deletions = self.events[VariantType.DELETION]
+        num_substitutions = self.events[VariantType.SUBSTITUTION]
+        alt_length = ref_length + (num_insertions - num_deletions)
+        total_length = max(ref_length, alt_length)
+        num_events = min(num_insertions + num_deletions + num_substitutions, total_length)
+
+        labels = np.repeat(
+            [VariantType.INSERTION, VariantType.DELETION, VariantType.SUBSTITUTION],
+            [num_insertions, num_deletions, num_substitutions],
+        )[:num_events]
+        event_indices = _sample_distinct_sorted(rng, n, total_length, num_events)
+        event_types = rng.permuted(np.broadcast_to(labels, (n, num_events)), axis=1)
+
+        is_insertion = event_types == VariantType.INSERTION
+        has_alt = event_types != VariantType.DELETION
+        is_substitution = event_types == VariantType.SUBSTITUTION
+
+        # Each insertion shifts every later index one base back along the reference
+        pos = event_indices - (np.cumsum(is_insertion, axis=1) - is_insertion)
+        ref_span = total_length - is_insertion.sum(axis=1)
+        alt = _BASES_ASCII[rng.integers(0, len(_BASES_ASCII), size=(n, num_events))]
+
+        # Drop substitutions that drew the reference base
+        ref_bases = np.frombuffer(self.ref_sequence.encode("ascii"), dtype=np.uint8)
+        ref_pos = pos + window_starts[:, None]
+        keep = np.ones((n, num_events), dtype=bool)
+        keep[is_substitution] = alt[is_substitution] != ref_bases[ref_pos[is_substitution]]
+
+        return VariantArraysBatch(
+            pos=pos[keep].astype(np.int64),
+            ref_len=(~is_insertion[keep]).astype(np.int64),
+            alt=alt[keep & has_alt],
+            alt_offsets=lengths_to_offsets(has_alt[keep].astype(np.int64)),
+            set_offsets=lengths_to_offsets(keep.sum(axis=1)),
+            ref_spans=ref_span.astype(np.int64),
+        )
+
+    def generate_error_batch(
+        self,
+        error_probabilities: npt.NDArray[np.float64],
+        type_weights: Mapping[VariantType, float] | Sequence[float],
+        rng: np.random.Generator | None = None,
+        window_starts: npt.NDArray[np.int64] | None = None,
+    ) -> VariantArraysBatch:
+        """
+        Draw per-base errors of many reads at once, each base failing with its own probability.
+
+        One Bernoulli draw is made per base of every read, and each error is an insertion (before
+        the base), a deletion or a substitution of the base, in proportion to type_weights.
+        Substitutions always change the base, so every error is an event.
+
+        Args:
+            error_probabilities (npt.NDArray[np.float64]): (reads, bases) probability of an error
+                at each base of the reference sequence (or of each read's window), e.g. from the
+                quality of each base
+            type_weights (Mapping[VariantType, float] | Sequence[float]): relative weights of
+                insertions, deletions and substitutions, indexed by VariantType
+            rng (np.random.Generator | None): Random number generator to draw from, None uses
+                the generator's own, or an unseeded generator if it has none.
+            window_starts (npt.NDArray[np.int64] | None): Start of the window of the reference
+                sequence each read covers, None if every read covers the whole sequence.
+
+        Returns:
+            VariantArraysBatch: The event tables of all reads, back to back, each spanning the
+                whole reference sequence or its window. With windows, positions are relative to
+                the start of each read's window.
+        """
+        rng = (
+            rng
+            if rng is not None
+            else self.rng
+            if self.rng is not None
+            else np.random.default_rng()
+        )
+        n, ref_length = error_probabilities.shape
+        ref_length, window_starts = self._windows(
+            n, window_starts, ref_length if window_starts is not None else None
+        )
+        if error_probabilities.shape[1] != ref_length:
+            raise ValueError("Error probabilities must cover every base of the reference sequence")
+        error_types = (VariantType.INSERTION, VariantType.DELETION, VariantType.SUBSTITUTION)
+        types = np.array(error_types)
+        weights = np.array([type_weights[t] for t in error_types], dtype=np.float64)
+        if weights.sum() <= 0:
+            raise ValueError("At least one error type must have a positive weight")
+
+        rows, pos = np.nonzero(rng.random((n, ref_length)) < error_probabilities)
+        thresholds = np.cumsum(weights)[:-1] / weights.sum()
+        event_types = types[np.searchsorted(thresholds, rng.random(len(pos)), side="right")]
+        is_insertion = event_types == VariantType.INSERTION
+        is_substitution = event_types == VariantType.SUBSTITUTION
+        has_alt = event_types != VariantType.DELETION
+
+        # Inserted bases are uniform, substituted bases uniform among the other three
+        ref_bases = np.frombuffer(self.ref_sequence.encode("ascii"), dtype=np.uint8)
+        ref_codes = _BASE_CODES[ref_bases[window_starts[rows] + pos]]
+        alt_codes = np.where(
+            is_substitution,
+            (ref_codes + rng.integers(1, len(_BASES_ASCII), size=len(pos))) % len(_BASES_ASCII),
+            rng.integers(0, len(_BASES_ASCII), size=len(pos)),
+        )
+
+        return VariantArraysBatch(
+            pos=pos.astype(np.int64),
+            ref_len=(~is_insertion).astype(np.int64),
+            alt=_BASES_ASCII[alt_codes[has_alt]],
+            alt_offsets=lengths_to_offsets(has_alt.astype(np.int64)),
+            set_offsets=lengths_to_offsets(np.bincount(rows, minlength=n).astype(np.int64)),
+            ref_spans=np.full(n, ref_length, dtype=np.int64),
+        )
+
+    def generate_sparse_variants(self) -> list[Variant]:
+        """
+        Generate random variants as a sparse list holding only the true events.
+
+        Unlike generate_random_variant_sequence, which returns a Variant for every position,
+        only positions where the alternative differs from the reference are returned. Positions
+        are reference coordinates, so the list can be applied directly with apply_variants.
+
+        Returns:
+            list[Variant]: Insertions, deletions and substitutions sorted by position.
+        """
+        return self.generate_variant_arrays().to_variants(self.ref_sequence)
+
     def get_ref_alt(
         self, index: int, event_indices: list[int], num_insertions: int, num_deletions: int
     ):
@@ -110,12 +408,12 @@ class VariantGenerator:
         if index in event_indices:
             if event_indices.index(index) < num_insertions:
                 self.ref_offset -= 1
-                return "", random.choice(self.bases)
+                return "", self._next_alt_base()
             elif event_indices.index(index) < num_insertions + num_deletions:
                 ref_value = self.ref_sequence[index + self.ref_offset]
                 return ref_value, ""
             else:
-                return self.ref_sequence[index + self.ref_offset], random.choice(self.bases)
+                return self.ref_sequence[index + self.ref_offset], self._next_alt_base()
         else:
             return self.ref_sequence[index + self.ref_offset], self.ref_sequence[
                 index + self.ref_offset
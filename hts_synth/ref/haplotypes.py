@@ -0,0 +1,30 @@
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+
+from .variant_arrays import VariantArraysBatch
+
+
+@dataclass(slots=True)
+class HaplotypeBatch:
+    """
+    A batch of independently mutated copies of the same reference sequence.
+
+    Attributes:
+        sequences (npt.NDArray[np.uint8]): (copies, max length) matrix of ASCII bases, zero padded
+            past the end of each row.
+        lengths (npt.NDArray[np.int64]): Length of each mutated sequence.
+        variants (VariantArraysBatch): Events applied to produce each row.
+    """
+
+    sequences: npt.NDArray[np.uint8]
+    lengths: npt.NDArray[np.int64]
+    variants: VariantArraysBatch
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def sequence(self, i: int) -> str:
+        """Get the i-th mutated sequence as a string."""
+        return self.sequences[i, : self.lengths[i]].tobytes().decode("ascii")
@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import ClassVar, override
+
+import numpy as np
+import numpy.typing as npt
+import pysam
+
+_MAGIC = b"HTSPACK\x01"
+_TRAILER = np.dtype([("header_length", "<u8"), ("magic", "S8")])
+
+_BASES = np.frombuffer(b"ACGT", dtype=np.uint8)
+# 2-bit code of each ASCII base (either case), other bytes are masked as N and stored as A
+_CODES = np.zeros(256, dtype=np.uint8)
+_CODES[np.frombuffer(b"ACGTacgt", dtype=np.uint8)] = [0, 1, 2, 3, 0, 1, 2, 3]
+_IS_BASE = np.zeros(256, dtype=np.bool_)
+_IS_BASE[np.frombuffer(b"ACGTacgt", dtype=np.uint8)] = True
+# ASCII bases of the four 2-bit codes of each byte, lowest bits first
+_UNPACK = _BASES[(np.arange(256)[:, None] >> (2 * np.arange(4))) & 3]
+_UNPACK_WORDS = _UNPACK.view(np.uint32).ravel()
+
+DEFAULT_BUILD_CHUNK = 1 << 24
+
+
+@dataclass(slots=True, frozen=True)
+class PackedContig:
+    """
+    Location of a contig within a packed reference file.
+
+    Attributes:
+        name (str): Contig name.
+        length (int): Number of bases.
+        offset (int): Byte offset of the packed bases, four per byte.
+        n_offset (int): Byte offset of the (runs, 2) int64 array of N runs.
+        n_runs (int): Number of runs of N (any non-ACGT base), as 0-based end-exclusive intervals.
+    """
+
+    name: str
+    length: int
+    offset: int
+    n_offset: int
+    n_runs: int
+
+
+def pack_bases(bases: npt.NDArray[np.uint8]) -> npt.NDArray[np.uint8]:
+    """
+    Pack ASCII bases four to a byte, the first base in the lowest two bits (N is packed as A).
+    """
+    codes = _CODES[bases]
+    padded = np.zeros(-(-len(codes) // 4) * 4, dtype=np.uint8)
+    padded[: len(codes)] = codes
+    quads = padded.reshape(-1, 4)
+    packed = quads[:, 0] | (quads[:, 1] << 2) | (quads[:, 2] << 4) | (quads[:, 3] << 6)
+    return packed.astype(np.uint8, copy=False)
+
+
+def find_n_runs(bases: npt.NDArray[np.uint8], offset: int = 0) -> npt.NDArray[np.int64]:
+    """
+    Find the runs of non-ACGT bases, as a (runs, 2) array of start and end positions.
+    """
+    masked = np.concatenate(([False], ~_IS_BASE[bases], [False]))
+    edges = np.flatnonzero(masked[1:] != masked[:-1]).astype(np.int64)
+    return edges.reshape(-1, 2) + offset
+
+
+class PackedReference:
+    """
+    A memory-mapped reference of 2-bit packed bases with a side table of N runs.
+
+    A FASTA is converted once (see build) into a single file next to it. Opening the file maps it
+    read only, so any number of processes share one page cached copy, and a fetch only unpacks
+    the requested bases: packed bytes are viewed in place, expanded through a lookup table and
+    the N runs overlapping the segment (found by binary search) are written back. Bases are
+    stored in upper case, soft masking is not kept, and all non-ACGT bases become N.
+
+    Attributes:
+        path (Path): Path of the packed file.
+        contigs (dict[str, PackedContig]): Location of each contig, in FASTA order.
+
+    Example:
+        >>> packed = PackedReference.open_or_build("genome.fa")  # doctest: +SKIP
+        >>> packed.fetch("chr1", 10_000, 10_010)  # doctest: +SKIP
+        'ACGTNNNNAC'
+    """
+
+    SUFFIX: ClassVar[str] = ".packed"
+    FORMAT_VERSION: ClassVar[int] = 1
+
+    def __init__(self, path: str | os.PathLike[str]):
+        self.path: Path = Path(path)
+        with open(self.path, "rb") as handle:
+            self._mmap: mmap.mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self.data: npt.NDArray[np.uint8] = np.frombuffer(self._mmap, dtype=np.uint8)
+        if len(self.data) < len(_MAGIC) + _TRAILER.itemsize:
+            raise ValueError(f"{self.path} is not a packed reference")
+        trailer = self.data[-_TRAILER.itemsize :].view(_TRAILER)[0]
+        if trailer["magic"] != _MAGIC or bytes(self.data[: len(_MAGIC)]) != _MAGIC:
+            raise ValueError(f"{self.path} is not a packed reference")
+        header_end = len(self.data) - _TRAILER.itemsize
+        header = json.loads(
+            bytes(self.data[header_end - int(trailer["header_length"]) : header_end])
+        )
+        if header["format_version"] != self.FORMAT_VERSION:
+            raise ValueError(
+                f"{self.path} has format version {header['format_version']}, "
+                + f"expected {self.FORMAT_VERSION}"
+            )
+        self.contigs: dict[str, PackedContig] = {
+            contig["name"]: PackedContig(**contig) for contig in header["contigs"]
+        }
+        # views of the packed bases, and in memory copies of the (small) N run tables
+        self._packed: dict[str, npt.NDArray[np.uint8]] = {
+            name: self.data[contig.offset : contig.offset + -(-contig.length // 4)]
+            for name, contig in self.contigs.items()
+        }
+        self._n_runs: dict[str, npt.NDArray[np.int64]] = {
+            name: np.frombuffer(
+                self._mmap, dtype="<i8", count=2 * contig.n_runs, offset=contig.n_offset
+            )
+            .astype(np.int64)
+            .reshape(-1, 2)
+            for name, contig in self.contigs.items()
+        }
+
+    @override
+    def __reduce__(self):
+        # workers reopen the file (sharing its pages) rather than copying the mapped data
+        return (type(self), (self.path,))
+
+    @property
+    def references(self) -> tuple[str, ...]:
+        return tuple(self.contigs)
+
+    @property
+    def lengths(self) -> tuple[int, ...]:
+        return tuple(contig.length for contig in self.contigs.values())
+
+    @classmethod
+    def default_path(cls, fasta_path: str | os.PathLike[str]) -> Path:
+        return Path(f"{fasta_path}{cls.SUFFIX}")
+
+    @classmethod
+    def build(
+        cls,
+        fasta_path: str | os.PathLike[str],
+        path: str | os.PathLike[str] | None = None,
+        chunk_size: int = DEFAULT_BUILD_CHUNK,
+    ) -> PackedReference:
+        """
+        Convert an indexed FASTA into a packed reference file, by default next to the FASTA.
+
+        Contigs are streamed through the FASTA index in chunks, so converting a genome takes
+        little memory. The file is written under a temporary name and renamed into place.
+
+        Args:
+            fasta_path (str | os.PathLike[str]): Path of the FASTA (indexed, or indexable by faidx)
+            path (str | os.PathLike[str] | None): Path of the packed file
+            chunk_size (int): Number of bases converted at a time, rounded down to a multiple of 4
+        """
+        path = Path(path) if path is not None else cls.default_path(fasta_path)
+        chunk_size = max(4, chunk_size - chunk_size % 4)
+        temporary = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+        contigs: list[PackedContig] = []
+        try:
+            with pysam.FastaFile(str(fasta_path)) as fasta, open(temporary, "wb") as out:
+                _ = out.write(_MAGIC)
+                runs: list[npt.NDArray[np.int64]] = []
+                offsets: list[int] = []
+                for name, length in zip(fasta.references, fasta.lengths):
+                    offsets.append(out.tell())
+                    contig_runs: list[npt.NDArray[np.int64]] = []
+                    for start in range(0, length, chunk_size):
+                        chunk = fasta.fetch(name, start, min(start + chunk_size, length))
+                        bases = np.frombuffer(chunk.encode("ascii"), dtype=np.uint8)
+                        _ = out.write(pack_bases(bases).tobytes())
+                        contig_runs.append(find_n_runs(bases, start))
+                    runs.append(_merge_runs(contig_runs))
+
+                for (name, length), offset, n_runs in zip(
+                    zip(fasta.references, fasta.lengths), offsets, runs
+                ):
+                    contigs.append(PackedContig(name, length, offset, out.tell(), len(n_runs)))
+                    _ = out.write(n_runs.astype("<i8").tobytes())
+
+                header = json.dumps(
+                    {
+                        "format_version": cls.FORMAT_VERSION,
+                        "contigs": [asdict(contig) for contig in contigs],
+                    }
+                ).encode()
+                _ = out.write(header)
+                _ = out.write(np.array([(len(header), _MAGIC)], dtype=_TRAILER).tobytes())
+            os.replace(temporary, path)
+        finally:
+            temporary.unlink(missing_ok=True)
+        return cls(path)
+
+    @classmethod
+    def open_or_build(cls, fasta_path: str | os.PathLike[str]) -> PackedReference:
+        """
+        Open the packed reference next to a FASTA, building it first if missing or older.
+        """
+        path = cls.default_path(fasta_path)
+        if path.exists() and path.stat().st_mtime >= Path(fasta_path).stat().st_mtime:
+            try:
+                return cls(path)
+            except ValueError:
+                pass
+        return cls.build(fasta_path, path)
+
+    def _clip(self, chrom: str, start: int, end: int | None) -> tuple[int, int]:
+        try:
+            length = self.contigs[chrom].length
+        except KeyError:
+            raise KeyError(f"Contig {chrom} is not in {self.path}") from None
+        end = length if end is None else min(end, length)
+        start = max(start, 0)
+        return start, max(start, end)
+
+    def n_runs(self, chrom: str) -> npt.NDArray[np.int64]:
+        """
+        Get the runs of N of a contig, as a (runs, 2) array of 0-based end-exclusive intervals.
+        """
+        _ = self._clip(chrom, 0, None)
+        return self._n_runs[chrom]
+
+    def packed(self, chrom: str, start: int = 0, end: int | None = None) -> npt.NDArray[np.uint8]:
+        """
+        Get a view (without copying) of the packed bytes holding the bases of a segment.
+
+        The first base of the segment is base start % 4 of the first byte.
+        """
+        start, end = self._clip(chrom, start, end)
+        return self._packed[chrom][start // 4 : -(-end // 4)]
+
+    def fetch_array(
+        self, chrom: str, start: int = 0, end: int | None = None
+    ) -> npt.NDArray[np.uint8]:
+        """
+        Unpack the ASCII bases of a segment, with 0-based end-exclusive coordinates.
+
+        As with faidx, coordinates beyond the contig are clipped to it.
+        """
+        start, end = self._clip(chrom, start, end)
+        first = start % 4
+        packed = self._packed[chrom][start // 4 : -(-end // 4)]
+        # one 4 byte lookup per packed byte
+        bases = _UNPACK_WORDS[packed].view(np.uint8)[first : first + end - start]
+
+        runs = self._n_runs[chrom]
+        if len(runs):
+            lo = int(np.searchsorted(runs[:, 1], start, side="right"))
+            hi = int(np.searchsorted(runs[:, 0], end, side="left"))
+            for run_start, run_end in runs[lo:hi].tolist():
+                bases[max(run_start, start) - start : min(run_end, end) - start] = ord("N")
+        return bases
+
+    def fetch(self, chrom: str, start: int = 0, end: int | None = None) -> str:
+        """
+        Get the bases of a segment as a string, see fetch_array.
+        """
+        return self.fetch_array(chrom, start, end).tobytes().decode("ascii")
+
+
+def _merge_runs(runs: list[npt.NDArray[np.int64]]) -> npt.NDArray[np.int64]:
+    """
+    Join the N runs of consecutive chunks, merging runs which continue across a chunk boundary.
+    """
+    if not runs:
+        return np.zeros((0, 2), dtype=np.int64)
+    merged = np.concatenate(runs)
+    if len(merged) < 2:
+        return merged
+    # a run ending where the next starts continues it
+    starts = np.ones(len(merged), dtype=np.bool_)
+    starts[1:] = merged[1:, 0] != merged[:-1, 1]
+    ends = np.append(starts[1:], True)
+    return np.column_stack((merged[starts, 0], merged[ends, 1]))
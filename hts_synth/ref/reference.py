@@ -1,8 +1,16 @@
+from typing import override
+
+import numpy as np
+import numpy.typing as npt
 import pysam
 from pysam.libcfaidx import FastaFile
 
+from ..ref.enums import ReferenceBackend
 from ..ref.generate_variant import VariantGenerator
-from ..ref.seq_converter import apply_variants
+from ..ref.haplotypes import HaplotypeBatch
+from ..ref.packed_reference import PackedReference
+from ..ref.segment_cache import DEFAULT_BLOCK_SIZE, SegmentCache
+from ..ref.seq_converter import apply_variant_sets, apply_variants, as_sequence_buffer
 
 
 class ReferenceSegment:
@@ -14,11 +22,100 @@ class ReferenceSegment:
 
 
 class Reference:
-    def __init__(self, fasta_path: str):
+    def __init__(
+        self,
+        fasta_path: str,
+        backend: ReferenceBackend = ReferenceBackend.FAIDX,
+        cache_blocks: int = 0,
+        cache_block_size: int = DEFAULT_BLOCK_SIZE,
+        read_ahead: int = 0,
+    ):
         """
         Initialise a Reference to hold reference information.
+
+        Args:
+            fasta_path (str): Path of the FASTA, indexed or indexable by faidx.
+            backend (ReferenceBackend): Where bases are read from. PACKED reads a memory-mapped
+                2-bit packed copy of the FASTA (see PackedReference), built next to it on first
+                use, which processes share and fetch from without decoding the FASTA.
+            cache_blocks (int): Number of blocks of decoded bases kept in an LRU cache (see
+                SegmentCache), 0 to read every segment from the backend.
+            cache_block_size (int): Number of bases per cached block.
+            read_ahead (int): Number of blocks loaded beyond segments read in sequence.
         """
+        self.fasta_path: str = fasta_path
+        self.backend: ReferenceBackend = backend
         self.fasta: FastaFile = pysam.FastaFile(fasta_path)
+        self.packed: PackedReference | None = None
+        if backend == ReferenceBackend.PACKED:
+            self.packed = PackedReference.open_or_build(fasta_path)
+        self.cache: SegmentCache | None = None
+        if cache_blocks > 0:
+            self.cache = SegmentCache(
+                self._fetch_uncached,
+                dict(zip(self.fasta.references, self.fasta.lengths)),
+                block_size=cache_block_size,
+                max_blocks=cache_blocks,
+                read_ahead=read_ahead,
+            )
+
+    @override
+    def __reduce__(self):
+        # worker processes reopen the FASTA (and packed file), with an empty cache
+        cache = self.cache
+        return (
+            type(self),
+            (
+                self.fasta_path,
+                self.backend,
+                cache.max_blocks if cache is not None else 0,
+                cache.block_size if cache is not None else DEFAULT_BLOCK_SIZE,
+                cache.read_ahead if cache is not None else 0,
+            ),
+        )
+
+    def alignment_header(self) -> pysam.AlignmentHeader:
+        """
+        Build an unsorted SAM/BAM/CRAM header with one @SQ line per contig of the FASTA index.
+        """
+        return pysam.AlignmentHeader.from_dict(
+            {
+                "HD": {"VN": "1.6", "SO": "unsorted"},
+                "SQ": [
+                    {"SN": name, "LN": length}
+                    for name, length in zip(self.fasta.references, self.fasta.lengths)
+                ],
+            }
+        )
+
+    def reference_id(self, chrom: str) -> int:
+        """
+        Get the index of a contig in the FASTA index, as used in alignment headers.
+        """
+        return self.fasta.references.index(chrom)
+
+    def _fetch_uncached(self, chrom: str, start: int, end: int) -> str:
+        if self.packed is not None:
+            return self.packed.fetch(chrom, start, end)
+        return self.fasta.fetch(chrom, start, end)
+
+    def fetch(self, chrom: str, start: int, end: int) -> str:
+        """
+        Get the bases of a segment, with 0-based end-exclusive coordinates.
+
+        Segments are cut from cached blocks when the Reference has a cache.
+        """
+        if self.cache is not None:
+            return self.cache.fetch(chrom, start, end)
+        return self._fetch_uncached(chrom, start, end)
+
+    def fetch_array(self, chrom: str, start: int, end: int) -> npt.NDArray[np.uint8]:
+        """
+        Get the ASCII bases of a segment as an array, with 0-based end-exclusive coordinates.
+        """
+        if self.packed is not None and self.cache is None:
+            return self.packed.fetch_array(chrom, start, end)
+        return as_sequence_buffer(self.fetch(chrom, start, end))
 
     def get_sequence(self, chrom: str, start: int, end: int):
         """
@@ -26,13 +123,22 @@ class Reference:
 
         Returns a ReferenceSegment object.
         """
-        seq = self.fasta.fetch(chrom, start, end)
+        seq = self.fetch(chrom, start, end)
         return ReferenceSegment(chrom, start, end, seq)
 
-    def get_mutated_sequence(self, chrom: str, start: int, end: int, events: list[int]):
+    def get_mutated_sequence(
+        self,
+        chrom: str,
+        start: int,
+        end: int,
+        events: list[int],
+        rng: np.random.Generator | None = None,
+    ):
         """
         Coordinates are 0-based, end-exclusive.
 
+        Variants are drawn from rng, or from the global random state if it is None.
+
         Returns a ReferenceSegment object.
         """
         if len(events) != 3:
@@ -48,24 +154,70 @@ class Reference:
         padded_end = end + abs(length_change)
 
         if padded_end > end:
-            full_reference_sequence = self.fasta.fetch(chrom, start, padded_end)
+            full_reference_sequence = self.fetch(chrom, start, padded_end)
         else:
-            full_reference_sequence = self.fasta.fetch(chrom, start, end)
+            full_reference_sequence = self.fetch(chrom, start, end)
 
         segment_length = end - start
         segment_reference_sequence = full_reference_sequence[:segment_length]
 
-        generator = VariantGenerator(segment_reference_sequence, events)
+        generator = VariantGenerator(segment_reference_sequence, events, rng)
 
-        variants = generator.generate_random_variant_sequence()
+        variants = generator.generate_sparse_variants()
 
         modified_segment_sequence = apply_variants(
             ref_start=0,
             ref_seq=full_reference_sequence,
-            alt_length=len(variants) + length_change,
+            alt_length=len(full_reference_sequence) + length_change,
             variants=variants,
         )
 
         modified_segment_sequence = modified_segment_sequence[:original_length]
 
         return ReferenceSegment(chrom, start, end, modified_segment_sequence)
+
+    def get_mutated_sequences(
+        self,
+        chrom: str,
+        start: int,
+        end: int,
+        events: list[int],
+        n: int,
+        rng: np.random.Generator | None = None,
+    ) -> HaplotypeBatch:
+        """
+        Generate n independently mutated copies of a segment in one call.
+
+        Coordinates are 0-based, end-exclusive. The reference is fetched once and every copy is
+        mutated as in get_mutated_sequence, with events for all copies drawn together.
+
+        Args:
+            chrom (str): Contig name.
+            start (int): Segment start.
+            end (int): Segment end.
+            events (list[int]): Number of insertions, deletions and substitutions per copy.
+            n (int): Number of copies.
+            rng (np.random.Generator | None): Random number generator to draw from, None will
+                instantiate an unseeded generator.
+
+        Returns:
+            HaplotypeBatch: Mutated copies, each truncated to the segment length.
+        """
+        if len(events) != 3:
+            raise ValueError(
+                "Events should contain 3 values - number of insertions, number of deletions, number of substitutions"
+            )
+        num_ins, num_del, _ = events
+        segment_length = end - start
+
+        full_reference_sequence = self.fetch(chrom, start, end + abs(num_ins - num_del))
+
+        generator = VariantGenerator(full_reference_sequence[:segment_length], events)
+        variant_sets = generator.generate_variant_array_batch(n, rng)
+        sequences, lengths = apply_variant_sets(full_reference_sequence, variant_sets)
+
+        return HaplotypeBatch(
+            sequences=sequences[:, :segment_length],
+            lengths=np.minimum(lengths, segment_length),
+            variants=variant_sets,
+        )
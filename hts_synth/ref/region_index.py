@@ -0,0 +1,419 @@
+from __future__ import annotations
+
+import json
+import os
+import uuid
+from collections.abc import Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import ClassVar
+
+import numpy as np
+import numpy.typing as npt
+import pysam
+
+from .packed_reference import DEFAULT_BUILD_CHUNK, find_n_runs
+
+# intervals of all contigs are ordered by contig then position through a single int64 key
+_POSITION_BITS = 40
+
+_UPPER = np.arange(256, dtype=np.uint8)
+_UPPER[ord("a") : ord("z") + 1] -= 32
+_IS_BASE = np.zeros(256, dtype=np.bool_)
+_IS_BASE[np.frombuffer(b"ACGT", dtype=np.uint8)] = True
+
+DEFAULT_LOW_COMPLEXITY_LENGTH = 10
+DEFAULT_MAX_PERIOD = 2
+
+
+def _keys(contig_ids: npt.ArrayLike, positions: npt.ArrayLike) -> npt.NDArray[np.int64]:
+    return (np.asarray(contig_ids, dtype=np.int64) << _POSITION_BITS) + np.asarray(
+        positions, dtype=np.int64
+    )
+
+
+@dataclass(slots=True, frozen=True)
+class ContigIntervals:
+    """
+    Sorted, disjoint 0-based end-exclusive intervals over the contigs of a reference.
+
+    Intervals are ordered by contig then start, so any query is a binary search: see overlaps.
+    Set operations (union, intersect, subtract) sweep the sorted boundaries of both sets once.
+
+    Attributes:
+        contig_ids (npt.NDArray[np.int32]): Contig index of each interval.
+        starts (npt.NDArray[np.int64]): Start of each interval.
+        ends (npt.NDArray[np.int64]): End of each interval.
+    """
+
+    contig_ids: npt.NDArray[np.int32]
+    starts: npt.NDArray[np.int64]
+    ends: npt.NDArray[np.int64]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @property
+    def lengths(self) -> npt.NDArray[np.int64]:
+        return self.ends - self.starts
+
+    @classmethod
+    def empty(cls) -> ContigIntervals:
+        return cls(np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64), np.zeros(0, np.int64))
+
+    @classmethod
+    def whole(cls, lengths: Sequence[int]) -> ContigIntervals:
+        """
+        Get one interval covering each contig.
+        """
+        return cls.from_intervals(
+            np.arange(len(lengths)), np.zeros(len(lengths)), np.asarray(lengths)
+        )
+
+    @classmethod
+    def from_intervals(
+        cls, contig_ids: npt.ArrayLike, starts: npt.ArrayLike, ends: npt.ArrayLike
+    ) -> ContigIntervals:
+        """
+        Build the set of intervals in any order, merging overlapping or touching intervals.
+        """
+        ids = np.asarray(contig_ids, dtype=np.int64)
+        start_keys, end_keys = _keys(ids, starts), _keys(ids, ends)
+        keep = end_keys > start_keys
+        start_keys, end_keys = start_keys[keep], end_keys[keep]
+        order = np.argsort(start_keys, kind="stable")
+        start_keys, end_keys = start_keys[order], np.maximum.accumulate(end_keys[order])
+        if len(start_keys) == 0:
+            return cls.empty()
+        # an interval starting beyond the furthest end so far begins a merged interval
+        first = np.ones(len(start_keys), dtype=np.bool_)
+        first[1:] = start_keys[1:] > end_keys[:-1]
+        last = np.append(first[1:], True)
+        return cls._from_keys(start_keys[first], end_keys[last])
+
+    @classmethod
+    def _from_keys(
+        cls, start_keys: npt.NDArray[np.int64], end_keys: npt.NDArray[np.int64]
+    ) -> ContigIntervals:
+        mask = (1 << _POSITION_BITS) - 1
+        return cls(
+            (start_keys >> _POSITION_BITS).astype(np.int32), start_keys & mask, end_keys & mask
+        )
+
+    def _start_keys(self) -> npt.NDArray[np.int64]:
+        return _keys(self.contig_ids, self.starts)
+
+    def _end_keys(self) -> npt.NDArray[np.int64]:
+        return _keys(self.contig_ids, self.ends)
+
+    def overlaps(
+        self, contig_ids: npt.ArrayLike, starts: npt.ArrayLike, ends: npt.ArrayLike
+    ) -> npt.NDArray[np.bool_]:
+        """
+        Test whether each query interval overlaps any interval of the set, in O(log n) each.
+        """
+        ids = np.asarray(contig_ids)
+        if len(self) == 0:
+            return np.zeros(ids.shape, dtype=np.bool_)
+        # the first interval ending after the query start is the only candidate
+        candidates = np.searchsorted(self._end_keys(), _keys(ids, starts), side="right")
+        found = candidates < len(self)
+        candidate_starts = self._start_keys()[np.minimum(candidates, len(self) - 1)]
+        return found & (candidate_starts < _keys(ids, ends)) & (np.asarray(ends) > starts)
+
+    def _combine(self, other: ContigIntervals, states: tuple[int, ...]) -> ContigIntervals:
+        """
+        Get the stretches whose state, 1 if in self plus 2 if in other, is one of states.
+        """
+        if len(self) + len(other) == 0:
+            return ContigIntervals.empty()
+        keys = np.concatenate(
+            (self._start_keys(), self._end_keys(), other._start_keys(), other._end_keys())
+        )
+        steps = np.repeat(
+            np.array([1, -1, 2, -2], dtype=np.int64), [len(self)] * 2 + [len(other)] * 2
+        )
+        order = np.argsort(keys, kind="stable")
+        keys, state = keys[order], np.cumsum(steps[order])
+        # the state after the last boundary at a position holds until the next position
+        selected = np.isin(state[:-1], states) & (keys[1:] > keys[:-1])
+        return ContigIntervals._from_keys(keys[:-1][selected], keys[1:][selected]).merged()
+
+    def merged(self) -> ContigIntervals:
+        """
+        Merge touching intervals.
+        """
+        return ContigIntervals.from_intervals(self.contig_ids, self.starts, self.ends)
+
+    def union(self, other: ContigIntervals) -> ContigIntervals:
+        return self._combine(other, (1, 2, 3))
+
+    def intersect(self, other: ContigIntervals) -> ContigIntervals:
+        return self._combine(other, (3,))
+
+    def subtract(self, other: ContigIntervals) -> ContigIntervals:
+        return self._combine(other, (1,))
+
+    def complement(self, lengths: Sequence[int]) -> ContigIntervals:
+        """
+        Get the positions of contigs of the given lengths not covered by the set.
+        """
+        return ContigIntervals.whole(lengths).subtract(self)
+
+    def within(self, contig_id: int, start: int, end: int) -> ContigIntervals:
+        """
+        Get the parts of the intervals within [start, end) of a contig, relative to start.
+
+        The parts are returned on contig 0, as intervals of the segment [start, end).
+        """
+        first = int(np.searchsorted(self._end_keys(), _keys(contig_id, start), side="right"))
+        last = int(np.searchsorted(self._start_keys(), _keys(contig_id, end), side="left"))
+        starts = np.maximum(self.starts[first:last], start) - start
+        ends = np.minimum(self.ends[first:last], end) - start
+        return ContigIntervals(np.zeros(len(starts), dtype=np.int32), starts, ends)
+
+    def pad(self, before: int, after: int, lengths: Sequence[int]) -> ContigIntervals:
+        """
+        Extend every interval, clipped to its contig of the given lengths, and merge them.
+        """
+        contig_lengths = np.asarray(lengths, dtype=np.int64)
+        return ContigIntervals.from_intervals(
+            self.contig_ids,
+            np.maximum(self.starts - before, 0),
+            np.minimum(self.ends + after, contig_lengths[self.contig_ids]),
+        )
+
+
+def _repeat_runs(bases: npt.NDArray[np.uint8], period: int, offset: int) -> npt.NDArray[np.int64]:
+    """
+    Find the runs of positions i (from offset) where base i + period repeats ACGT base i.
+
+    Returns:
+        npt.NDArray[np.int64]: (runs, 2) start and end of each run, a run [a, b) spanning the
+            periodic bases [a, b + period).
+    """
+    same = (bases[period:] == bases[:-period]) & _IS_BASE[bases[period:]]
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], same, [False])).astype(np.int8)))
+    return edges.reshape(-1, 2).astype(np.int64) + offset
+
+
+def _join_runs(runs: list[npt.NDArray[np.int64]]) -> npt.NDArray[np.int64]:
+    """
+    Join the runs of consecutive chunks, where a run ending at the start of the next continues.
+    """
+    joined = np.concatenate(runs) if runs else np.zeros((0, 2), dtype=np.int64)
+    if len(joined) == 0:
+        return joined
+    first = np.ones(len(joined), dtype=np.bool_)
+    first[1:] = joined[1:, 0] != joined[:-1, 1]
+    last = np.append(first[1:], True)
+    return np.column_stack((joined[first, 0], joined[last, 1]))
+
+
+@dataclass(slots=True, frozen=True)
+class RegionIndex:
+    """
+    Index of the unusable (N gap) and low complexity regions of a reference.
+
+    Gaps are the runs of any non-ACGT base. Low complexity regions are the runs of at least
+    min_length bases repeating with a period of up to max_period, i.e. homopolymers and (with the
+    default max_period) dinucleotide repeats. Both are found in one chunked pass over the FASTA
+    and cached next to it (see open_or_build), then queried or combined with sampled regions as
+    ContigIntervals.
+
+    Attributes:
+        contigs (tuple[str, ...]): Names of the contigs, in FASTA order.
+        lengths (tuple[int, ...]): Length of each contig.
+        gaps (ContigIntervals): Runs of non-ACGT bases.
+        low_complexity (ContigIntervals): Runs of short period repeats.
+        min_length (int): Minimum length of a low complexity run.
+        max_period (int): Maximum repeat period of a low complexity run.
+
+    Example:
+        >>> index = RegionIndex.open_or_build("genome.fa")  # doctest: +SKIP
+        >>> index.gaps.overlaps([0, 0], [0, 5000], [150, 5150])  # doctest: +SKIP
+        array([ True, False])
+    """
+
+    contigs: tuple[str, ...]
+    lengths: tuple[int, ...]
+    gaps: ContigIntervals
+    low_complexity: ContigIntervals
+    min_length: int = DEFAULT_LOW_COMPLEXITY_LENGTH
+    max_period: int = DEFAULT_MAX_PERIOD
+
+    SUFFIX: ClassVar[str] = ".regions.npz"
+    FORMAT_VERSION: ClassVar[int] = 1
+
+    @classmethod
+    def default_path(cls, fasta_path: str | os.PathLike[str]) -> Path:
+        return Path(f"{fasta_path}{cls.SUFFIX}")
+
+    @classmethod
+    def build(
+        cls,
+        fasta_path: str | os.PathLike[str],
+        min_length: int = DEFAULT_LOW_COMPLEXITY_LENGTH,
+        max_period: int = DEFAULT_MAX_PERIOD,
+        chunk_size: int = DEFAULT_BUILD_CHUNK,
+    ) -> RegionIndex:
+        """
+        Find the gaps and low complexity regions of an indexed FASTA, streamed in chunks.
+
+        Args:
+            fasta_path (str | os.PathLike[str]): Path of the FASTA (indexed, or indexable by faidx)
+            min_length (int): Minimum length of a low complexity run
+            max_period (int): Maximum repeat period of a low complexity run
+            chunk_size (int): Number of bases scanned at a time
+        """
+        if min_length <= max_period or max_period < 1:
+            raise ValueError("Low complexity runs must be longer than their period, at least 1")
+        periods = range(1, max_period + 1)
+        gaps: list[npt.NDArray[np.int64]] = []
+        repeats: list[npt.NDArray[np.int64]] = []
+        with pysam.FastaFile(str(fasta_path)) as fasta:
+            contigs, lengths = tuple(fasta.references), tuple(fasta.lengths)
+            for contig_id, (name, length) in enumerate(zip(contigs, lengths)):
+                contig_gaps: list[npt.NDArray[np.int64]] = []
+                contig_runs: dict[int, list[npt.NDArray[np.int64]]] = {p: [] for p in periods}
+                for start in range(0, length, chunk_size):
+                    stop = min(start + chunk_size, length)
+                    # the last bases of the previous chunk, so repeats are followed across chunks
+                    lead = min(start, max_period)
+                    chunk = fasta.fetch(name, start - lead, stop).encode("ascii")
+                    bases = _UPPER[np.frombuffer(chunk, dtype=np.uint8)]
+                    contig_gaps.append(find_n_runs(bases[lead:], start))
+                    for period in periods:
+                        # repeat positions [start - period, stop - period) belong to this chunk
+                        first = min(start, period)
+                        runs = _repeat_runs(bases[lead - first :], period, start - first)
+                        keep = runs[:, 1] - runs[:, 0] + period >= min_length
+                        keep |= (runs[:, 0] == start - first) | (runs[:, 1] == stop - period)
+                        contig_runs[period].append(runs[keep])
+                gaps.append(_with_contig(contig_id, _join_runs(contig_gaps)))
+                for period in periods:
+                    runs = _join_runs(contig_runs[period])
+                    runs = runs[runs[:, 1] - runs[:, 0] + period >= min_length]
+                    runs[:, 1] += period
+                    repeats.append(_with_contig(contig_id, runs))
+
+        return cls(
+            contigs=contigs,
+            lengths=lengths,
+            gaps=ContigIntervals.from_intervals(*np.concatenate(gaps).T),
+            low_complexity=ContigIntervals.from_intervals(*np.concatenate(repeats).T),
+            min_length=min_length,
+            max_period=max_period,
+        )
+
+    def usable(
+        self,
+        regions: ContigIntervals | None = None,
+        include_gaps: bool = False,
+        exclude_low_complexity: bool = False,
+    ) -> ContigIntervals:
+        """
+        Remove the gaps, and optionally low complexity regions, from regions to sample from.
+
+        Args:
+            regions (ContigIntervals | None): Regions to restrict, None for whole contigs.
+            include_gaps (bool): Whether to keep gaps.
+            exclude_low_complexity (bool): Whether to remove low complexity regions.
+        """
+        regions = regions if regions is not None else ContigIntervals.whole(self.lengths)
+        if not include_gaps:
+            regions = regions.subtract(self.gaps)
+        if exclude_low_complexity:
+            regions = regions.subtract(self.low_complexity)
+        return regions
+
+    def save(self, path: str | os.PathLike[str]) -> None:
+        """
+        Save the index as an npz file, written under a temporary name and renamed into place.
+        """
+        path = Path(path)
+        header = {
+            "format_version": self.FORMAT_VERSION,
+            "contigs": self.contigs,
+            "lengths": self.lengths,
+            "min_length": self.min_length,
+            "max_period": self.max_period,
+        }
+        temporary = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+        try:
+            with open(temporary, "wb") as out:
+                np.savez(
+                    out,
+                    header=np.array(json.dumps(header)),
+                    **{
+                        f"{name}_{field}": getattr(intervals, field)
+                        for name, intervals in (
+                            ("gaps", self.gaps),
+                            ("low_complexity", self.low_complexity),
+                        )
+                        for field in ("contig_ids", "starts", "ends")
+                    },
+                )
+            os.replace(temporary, path)
+        finally:
+            temporary.unlink(missing_ok=True)
+
+    @classmethod
+    def load(cls, path: str | os.PathLike[str]) -> RegionIndex:
+        """
+        Load an index saved by save.
+
+        Raises:
+            ValueError: if the file is not an index of the current format.
+        """
+        try:
+            with np.load(path) as saved:
+                header = json.loads(str(saved["header"]))
+                fields = {name: saved[name] for name in saved.files}
+        except (OSError, KeyError, json.JSONDecodeError) as e:
+            raise ValueError(f"{path} is not a region index") from e
+        if header.get("format_version") != cls.FORMAT_VERSION:
+            raise ValueError(f"{path} has an unsupported region index format")
+        return cls(
+            contigs=tuple(header["contigs"]),
+            lengths=tuple(header["lengths"]),
+            gaps=ContigIntervals(
+                fields["gaps_contig_ids"], fields["gaps_starts"], fields["gaps_ends"]
+            ),
+            low_complexity=ContigIntervals(
+                fields["low_complexity_contig_ids"],
+                fields["low_complexity_starts"],
+                fields["low_complexity_ends"],
+            ),
+            min_length=header["min_length"],
+            max_period=header["max_period"],
+        )
+
+    @classmethod
+    def open_or_build(
+        cls,
+        fasta_path: str | os.PathLike[str],
+        min_length: int = DEFAULT_LOW_COMPLEXITY_LENGTH,
+        max_period: int = DEFAULT_MAX_PERIOD,
+    ) -> RegionIndex:
+        """
+        Load the index cached next to a FASTA, building (and caching) it first if missing.
+
+        The cached index is rebuilt when older than the FASTA, invalid, or built with other
+        low complexity parameters.
+        """
+        path = cls.default_path(fasta_path)
+        if path.exists() and path.stat().st_mtime >= Path(fasta_path).stat().st_mtime:
+            try:
+                index = cls.load(path)
+                if (index.min_length, index.max_period) == (min_length, max_period):
+                    return index
+            except ValueError:
+                pass
+        index = cls.build(fasta_path, min_length, max_period)
+        index.save(path)
+        return index
+
+
+def _with_contig(contig_id: int, runs: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+    return np.column_stack((np.full(len(runs), contig_id, dtype=np.int64), runs))
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Callable, Mapping
+
+DEFAULT_BLOCK_SIZE = 1 << 16
+
+
+class SegmentCache:
+    """
+    A size bounded LRU cache of reference bases, held as fixed blocks of each contig.
+
+    A segment is cut from the blocks covering it, so overlapping and repeated segments (and the
+    padded segments fetched for mutation) are read from the source once. Missing blocks of a
+    segment are loaded with a single call to the source. When a segment starts in or right after
+    the last block of the previous segment of the same contig, the scan is taken to be sequential
+    and read_ahead further blocks are loaded with the missing ones.
+
+    Coordinates beyond a contig are clipped to it, as with faidx. Segments on unknown contigs, with
+    a negative start, or longer than the cache are passed straight to the source.
+
+    Attributes:
+        block_size (int): Number of bases per block; block i of a contig covers
+            [i * block_size, (i + 1) * block_size).
+        max_blocks (int): Maximum number of cached blocks, so at most about
+            max_blocks * block_size bases are held.
+        read_ahead (int): Number of blocks loaded beyond a sequential segment.
+        hits (int): Number of requested blocks found in the cache.
+        misses (int): Number of requested blocks loaded from the source.
+
+    Example:
+        >>> cache = SegmentCache(fasta.fetch, dict(zip(fasta.references, fasta.lengths)))  # doctest: +SKIP
+        >>> cache.fetch("chr1", 100, 110)  # doctest: +SKIP
+        'ACGTACGTAC'
+    """
+
+    def __init__(
+        self,
+        source: Callable[[str, int, int], str],
+        lengths: Mapping[str, int],
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        max_blocks: int = 64,
+        read_ahead: int = 0,
+    ):
+        """
+        Initialise an empty cache.
+
+        Args:
+            source (Callable[[str, int, int], str]): Fetches the bases of a segment given its
+                contig and 0-based end-exclusive coordinates.
+            lengths (Mapping[str, int]): Length of each contig.
+            block_size (int): Number of bases per block.
+            max_blocks (int): Maximum number of cached blocks.
+            read_ahead (int): Number of blocks loaded beyond a sequential segment.
+        """
+        if block_size < 1 or max_blocks < 1 or read_ahead < 0:
+            raise ValueError("Cache block size and capacity must be positive, read ahead >= 0")
+        self.source: Callable[[str, int, int], str] = source
+        self.lengths: dict[str, int] = dict(lengths)
+        self.block_size: int = block_size
+        self.max_blocks: int = max_blocks
+        self.read_ahead: int = read_ahead
+        self.hits: int = 0
+        self.misses: int = 0
+        self._blocks: OrderedDict[tuple[str, int], str] = OrderedDict()
+        self._last: tuple[str, int] | None = None
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        Fraction of requested blocks found in the cache, 0 before any request.
+        """
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    def clear(self):
+        """
+        Drop all cached blocks and reset the counters.
+        """
+        self._blocks.clear()
+        self._last = None
+        self.hits = 0
+        self.misses = 0
+
+    def fetch(self, chrom: str, start: int, end: int) -> str:
+        """
+        Get the bases of a segment, with 0-based end-exclusive coordinates.
+        """
+        length = self.lengths.get(chrom)
+        if length is None or start < 0:
+            return self.source(chrom, start, end)
+        end = min(end, length)
+        if end <= start:
+            return ""
+        first = start // self.block_size
+        last = (end - 1) // self.block_size
+        if last - first + 1 > self.max_blocks:
+            self.misses += last - first + 1
+            return self.source(chrom, start, end)
+
+        previous = self._last
+        sequential = previous is not None and previous[0] == chrom and 0 <= first - previous[1] <= 1
+        self._last = (chrom, last)
+
+        blocks: list[str] = []
+        missing = first
+        for index in range(first, last + 1):
+            block = self._blocks.get((chrom, index))
+            if block is None:
+                continue
+            self._blocks.move_to_end((chrom, index))
+            self.hits += 1
+            # load the run of missing blocks before this one in a single call
+            blocks.extend(self._load(chrom, missing, index - 1, length))
+            blocks.append(block)
+            missing = index + 1
+        if missing <= last:
+            # never read ahead so far that the segment's own blocks are evicted
+            ahead = min(self.read_ahead, self.max_blocks - (last - first + 1)) if sequential else 0
+            blocks.extend(self._load(chrom, missing, last, length, ahead))
+
+        offset = first * self.block_size
+        if len(blocks) == 1:
+            return blocks[0][start - offset : end - offset]
+        return "".join(blocks)[start - offset : end - offset]
+
+    def _load(self, chrom: str, first: int, last: int, length: int, ahead: int = 0) -> list[str]:
+        """
+        Load blocks first to last (and up to ahead more) of a contig, returning first to last.
+        """
+        if last < first:
+            return []
+        n_blocks = -(-length // self.block_size)
+        # read ahead only into blocks which are not cached
+        stop = last
+        while stop < min(last + ahead, n_blocks - 1) and (chrom, stop + 1) not in self._blocks:
+            stop += 1
+
+        size = self.block_size
+        bases = self.source(chrom, first * size, min((stop + 1) * size, length))
+        self.misses += last - first + 1
+        blocks = [bases[i * size : (i + 1) * size] for i in range(stop - first + 1)]
+        for index, block in enumerate(blocks, start=first):
+            self._blocks[(chrom, index)] = block
+        while len(self._blocks) > self.max_blocks:
+            _ = self._blocks.popitem(last=False)
+        return blocks[: last - first + 1]
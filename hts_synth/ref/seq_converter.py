@@ -1,76 +1,211 @@
-import re
-
 # Modified 2025
 from collections.abc import Sequence
 
+import numpy as np
+import numpy.typing as npt
+
 from ..ref.variant import Variant
+from ..ref.variant_arrays import VariantArrays, VariantArraysBatch
+from ..utils.arrays import ragged_arange, ragged_to_padded
 
+# ASCII complement of each byte, other bytes (e.g. N) are their own complement
+_COMPLEMENT = np.arange(256, dtype=np.uint8)
+_COMPLEMENT[np.frombuffer(b"ACGTacgt", dtype=np.uint8)] = np.frombuffer(b"TGCAtgca", dtype=np.uint8)
 
-def apply_variants(
-    ref_start: int, ref_seq: str, alt_length: int, variants: Sequence[Variant]
-) -> str:
+
+def _group_exclusive_cumsum(values: npt.NDArray[np.int64], group_starts: npt.NDArray[np.int64]):
     """
-    Alter a DNA sequence based on a set of variants.
+    Exclusive cumulative sum of values which restarts at the first element of each group.
+    """
+    totals = np.cumsum(values) - values
+    return totals - np.repeat(totals[group_starts], np.diff(np.append(group_starts, len(values))))
 
-    Assumptions:
-    - variants are fully in range of the reference sequence.
-    - variants do not overlap with each other.
-    - variants are sorted by position.
+
+def as_sequence_buffer(seq: str | npt.NDArray[np.uint8]) -> npt.NDArray[np.uint8]:
     """
-    if not variants:
-        return ref_seq
+    Get a read-only uint8 view of an ASCII sequence.
+    """
+    if isinstance(seq, str):
+        return np.frombuffer(seq.encode("ascii"), dtype=np.uint8)
+    return seq
 
-    # Preallocate altered sequence
-    alt_seq = bytearray(alt_length)
 
-    ref = ref_seq
-    ref_start = ref_start
-    ref_length = len(ref_seq)
-    n = len(variants)
+def reverse_complement_ragged(
+    sequences: npt.NDArray[np.uint8],
+    qualities: npt.NDArray[np.uint8],
+    offsets: npt.NDArray[np.int64],
+    reverse: npt.NDArray[np.bool_],
+) -> tuple[npt.NDArray[np.uint8], npt.NDArray[np.uint8]]:
+    """
+    Reverse complement the selected runs of back to back sequences, reversing their qualities.
+
+    Args:
+        sequences (npt.NDArray[np.uint8]): ASCII bases of all runs, back to back
+        qualities (npt.NDArray[np.uint8]): qualities of all runs, back to back
+        offsets (npt.NDArray[np.int64]): offsets delimiting the runs
+        reverse (npt.NDArray[np.bool_]): whether to reverse complement each run
 
-    i = 0  # REF seq base offset
-    j = 0  # ALT seq base offset
-    k = 0  # variant index
+    Returns:
+        tuple: New sequences and qualities, with the unselected runs unchanged.
+    """
+    starts, ends = offsets[:-1][reverse], offsets[1:][reverse]
+    positions = ragged_arange(starts, ends - starts)
+    # the k-th base of a reversed run is taken from its k-th last
+    source = np.repeat(starts + ends - 1, ends - starts) - positions
+    bases, quals = sequences.copy(), qualities.copy()
+    bases[positions] = _COMPLEMENT[sequences[source]]
+    quals[positions] = qualities[source]
+    return bases, quals
+
+
+def apply_variant_sets_ragged(
+    ref: str | npt.NDArray[np.uint8],
+    variant_sets: Sequence[VariantArrays] | VariantArraysBatch,
+    ref_start: int = 0,
+    window_starts: npt.NDArray[np.int64] | None = None,
+) -> tuple[npt.NDArray[np.uint8], npt.NDArray[np.int64]]:
+    """
+    Apply many independent sets of variants to the same reference sequence at once.
 
-    # Next variant (assumption: variants are sorted by position)
-    v: Variant = variants[k]
+    As apply_variant_sets, but the altered sequences are returned back to back in a single
+    buffer rather than as the rows of a padded matrix.
 
-    if v.pos > ref_start:
-        # Copy the head of the reference sequence unaffected by variants
-        delta = v.pos - ref_start
-        alt_seq[:delta] = ref[:delta].encode("ascii")
+    With window_starts, each set instead applies to its own window of ref, starting at its
+    window start and as long as the (common) reference span of the sets, with positions relative
+    to the window start. Windows are read through a strided view of ref, which is never copied.
 
-        i = delta
-        j = delta
+    Returns:
+        tuple[npt.NDArray[np.uint8], npt.NDArray[np.int64]]: The ASCII bases of all altered
+            sequences, concatenated, and the length of each sequence.
+    """
+    if not isinstance(variant_sets, VariantArraysBatch):
+        variant_sets = VariantArraysBatch.from_sets(variant_sets)
+
+    ref_buf = as_sequence_buffer(ref)
+    n_sets = len(variant_sets)
+    ref_length = len(ref_buf)
+    if window_starts is not None:
+        if len(window_starts) != n_sets:
+            raise ValueError("Every variant set needs a window start")
+        if n_sets and np.any(variant_sets.ref_spans != variant_sets.ref_spans[0]):
+            raise ValueError("Windowed variant sets must share a reference span")
+        ref_length = int(variant_sets.ref_spans[0]) if n_sets else 0
+
+    counts = variant_sets.set_sizes
+    set_starts = variant_sets.set_offsets[:-1]
+    row = np.repeat(np.arange(n_sets), counts)
+
+    pos = variant_sets.pos - ref_start
+    ref_len = variant_sets.ref_len
+    alt_len = variant_sets.alt_len
+    alt = variant_sets.alt
+
+    lengths = ref_length + np.bincount(row, weights=alt_len - ref_len, minlength=n_sets).astype(
+        np.int64
+    )
+    row_offsets = np.cumsum(lengths) - lengths
+
+    # Output offset of each event: the reference bases kept before it plus earlier ALT bases
+    nonempty = set_starts[counts > 0]
+    out_start = (
+        pos
+        - _group_exclusive_cumsum(ref_len, nonempty)
+        + _group_exclusive_cumsum(alt_len, nonempty)
+    )
+    alt_idx = np.repeat(row_offsets[row], alt_len) + ragged_arange(out_start, alt_len)
+
+    ref_keep = np.ones((n_sets, ref_length), dtype=bool)
+    ref_keep[np.repeat(row, ref_len), ragged_arange(pos, ref_len)] = False
+
+    out_from_ref = np.ones(int(lengths.sum()), dtype=bool)
+    out_from_ref[alt_idx] = False
+
+    flat = np.empty(len(out_from_ref), dtype=np.uint8)
+    if window_starts is None:
+        refs = np.broadcast_to(ref_buf, (n_sets, ref_length))
+    else:
+        refs = np.lib.stride_tricks.sliding_window_view(ref_buf, ref_length)[window_starts]
+    flat[out_from_ref] = refs[ref_keep]
+    flat[alt_idx] = alt
+    return flat, lengths
+
+
+def apply_variant_sets(
+    ref: str | npt.NDArray[np.uint8],
+    variant_sets: Sequence[VariantArrays] | VariantArraysBatch,
+    ref_start: int = 0,
+) -> tuple[npt.NDArray[np.uint8], npt.NDArray[np.int64]]:
+    """
+    Apply many independent sets of variants to the same reference sequence at once.
 
-    while i < ref_length:
-        ref_pos = ref_start + i
-        if v and v.pos == ref_pos:
-            # Apply variant
-            for c in v.alt:
-                alt_seq[j] = ord(c)
-                j += 1
+    The output length of every set is computed from its events up front; reference runs
+    between events are copied in bulk and no per-base or per-set Python loop is involved.
 
-            # Skip REF bases
-            i += v.ref_len
+    Assumptions:
+    - variants are fully in range of the reference sequence.
+    - variants within a set do not overlap with each other.
+    - variants within a set are sorted by position.
+
+    Args:
+        ref (str | npt.NDArray[np.uint8]): Reference sequence, as a string or ASCII uint8 buffer.
+        variant_sets (Sequence[VariantArrays] | VariantArraysBatch): Variant sets, each applied
+            independently.
+        ref_start (int): Reference position of the first base of ref.
+
+    Returns:
+        tuple[npt.NDArray[np.uint8], npt.NDArray[np.int64]]: A (sets, max length) matrix of
+            ASCII bases, zero padded past the end of each row, and the length of each row.
+    """
+    flat, lengths = apply_variant_sets_ragged(ref, variant_sets, ref_start)
+    return ragged_to_padded(flat, lengths), lengths
 
-            k += 1
-            if k < n:
-                # Step to the next variant
-                v = variants[k]
 
-            else:
-                break
+def apply_variants(
+    ref_start: int,
+    ref_seq: str,
+    alt_length: int | None,
+    variants: Sequence[Variant] | VariantArrays,
+) -> str:
+    """
+    Alter a DNA sequence based on a set of variants.
 
-        else:
-            # Copy REF base
-            alt_seq[j] = ord(ref[i])
+    Variants may be given as a sequence of Variant objects or as VariantArrays. The output
+    length is computed from the variants, so alt_length may be None. A given alt_length is
+    checked against the computed length. Variants starting beyond the end of the reference
+    sequence are not applied.
 
-            i += 1
-            j += 1
+    Assumptions:
+    - variants do not overlap with each other.
+    - variants are sorted by position.
 
-    if i < ref_length:
-        # Copy the tail of the reference sequence unaffected by variants
-        alt_seq[j:] = ref[i:].encode("ascii")
+    Raises:
+        ValueError: if alt_length is given and is not the length of the altered sequence.
+    """
+    if not len(variants):
+        _check_alt_length(alt_length, len(ref_seq))
+        return ref_seq
 
-    return re.sub(r"[^ACGT]", "", alt_seq.decode("ascii"))
+    if not isinstance(variants, VariantArrays):
+        variants = VariantArrays.from_variants(variants)
+
+    # Events must start within the reference; insertions may also append to its end
+    rel = variants.pos - ref_start
+    n = int(np.count_nonzero(rel + (variants.ref_len > 0) <= len(ref_seq)))
+    variants = VariantArrays(
+        pos=variants.pos[:n],
+        ref_len=np.minimum(variants.ref_len[:n], len(ref_seq) - rel[:n]),
+        alt=variants.alt[: variants.alt_offsets[n]],
+        alt_offsets=variants.alt_offsets[: n + 1],
+        ref_span=variants.ref_span,
+    )
+
+    alt_seqs, lengths = apply_variant_sets(ref_seq, [variants], ref_start)
+    _check_alt_length(alt_length, int(lengths[0]))
+    return alt_seqs[0, : lengths[0]].tobytes().decode("ascii")
+
+
+def _check_alt_length(alt_length: int | None, length: int) -> None:
+    if alt_length is not None and alt_length != length:
+        raise ValueError(
+            f"Variants alter the sequence to {length} bases, not the given alt_length {alt_length}"
+        )
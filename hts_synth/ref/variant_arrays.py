@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+
+from ..utils.arrays import lengths_to_offsets
+from .variant import Variant
+
+
+@dataclass(slots=True)
+class VariantArrays:
+    """
+    Columnar, event-only representation of a set of variants.
+
+    Only positions at which the alternative sequence differs from the reference are stored,
+    sorted by position (insertions at a position precede any event consuming the reference
+    base there). Alternative bases of all events are concatenated into a single byte buffer
+    and indexed by ``alt_offsets``.
+
+    Attributes:
+        pos (npt.NDArray[np.int64]): Reference position of each event.
+        ref_len (npt.NDArray[np.int64]): Number of reference bases consumed by each event.
+        alt (npt.NDArray[np.uint8]): Concatenated ASCII alternative bases of all events.
+        alt_offsets (npt.NDArray[np.int64]): Offsets into ``alt``, one more than the number of events.
+        ref_span (int): Number of reference bases (from the first position) the events were
+            generated against.
+    """
+
+    pos: npt.NDArray[np.int64]
+    ref_len: npt.NDArray[np.int64]
+    alt: npt.NDArray[np.uint8]
+    alt_offsets: npt.NDArray[np.int64]
+    ref_span: int
+
+    def __len__(self) -> int:
+        return len(self.pos)
+
+    @property
+    def alt_len(self) -> npt.NDArray[np.int64]:
+        return np.diff(self.alt_offsets)
+
+    @property
+    def alt_ref_delta(self) -> int:
+        """Change in sequence length caused by applying all events."""
+        return len(self.alt) - int(self.ref_len.sum())
+
+    @classmethod
+    def empty(cls, ref_span: int = 0) -> VariantArrays:
+        """Create a variant set with no events."""
+        return cls(
+            pos=np.zeros(0, dtype=np.int64),
+            ref_len=np.zeros(0, dtype=np.int64),
+            alt=np.zeros(0, dtype=np.uint8),
+            alt_offsets=np.zeros(1, dtype=np.int64),
+            ref_span=ref_span,
+        )
+
+    @classmethod
+    def from_variants(cls, variants: Sequence[Variant], ref_span: int = 0) -> VariantArrays:
+        """
+        Pack a sorted sequence of Variant objects into arrays.
+
+        Args:
+            variants (Sequence[Variant]): Variants sorted by position.
+            ref_span (int): Number of reference bases the variants were generated against.
+        """
+        alt = "".join(v.alt for v in variants).encode("ascii")
+        alt_len = np.fromiter((v.alt_len for v in variants), dtype=np.int64, count=len(variants))
+        return cls(
+            pos=np.fromiter((v.pos for v in variants), dtype=np.int64, count=len(variants)),
+            ref_len=np.fromiter((v.ref_len for v in variants), dtype=np.int64, count=len(variants)),
+            alt=np.frombuffer(alt, dtype=np.uint8).copy(),
+            alt_offsets=lengths_to_offsets(alt_len),
+            ref_span=ref_span,
+        )
+
+    def to_variants(self, ref_seq: str, ref_start: int = 0) -> list[Variant]:
+        """
+        Unpack the events into a sparse list of Variant objects, sorted by position.
+
+        Args:
+            ref_seq (str): Reference sequence the events were generated against.
+            ref_start (int): Reference position of the first base of ref_seq.
+        """
+        alt = self.alt.tobytes().decode("ascii")
+        offsets = self.alt_offsets.tolist()
+        variants: list[Variant] = []
+        for k, (pos, ref_len) in enumerate(zip(self.pos.tolist(), self.ref_len.tolist())):
+            rel = pos - ref_start
+            variants.append(
+                Variant(
+                    pos=pos, ref=ref_seq[rel : rel + ref_len], alt=alt[offsets[k] : offsets[k + 1]]
+                )
+            )
+        return variants
+
+
+@dataclass(slots=True)
+class VariantArraysBatch:
+    """
+    Event tables of many independent variant sets, stored back to back.
+
+    Columns are as in VariantArrays, concatenated over all sets, with alt_offsets indexing the
+    whole alt buffer. Individual sets are only materialised as VariantArrays when indexed.
+
+    Attributes:
+        pos (npt.NDArray[np.int64]): Reference position of each event.
+        ref_len (npt.NDArray[np.int64]): Number of reference bases consumed by each event.
+        alt (npt.NDArray[np.uint8]): Concatenated ASCII alternative bases of all events.
+        alt_offsets (npt.NDArray[np.int64]): Offsets into ``alt``, one more than the number of events.
+        set_offsets (npt.NDArray[np.int64]): Offsets of each set into the events, one more than
+            the number of sets.
+        ref_spans (npt.NDArray[np.int64]): Number of reference bases each set was generated against.
+    """
+
+    pos: npt.NDArray[np.int64]
+    ref_len: npt.NDArray[np.int64]
+    alt: npt.NDArray[np.uint8]
+    alt_offsets: npt.NDArray[np.int64]
+    set_offsets: npt.NDArray[np.int64]
+    ref_spans: npt.NDArray[np.int64]
+
+    def __len__(self) -> int:
+        return len(self.ref_spans)
+
+    def __getitem__(self, i: int) -> VariantArrays:
+        start, end = int(self.set_offsets[i]), int(self.set_offsets[i + 1])
+        alt_offsets = self.alt_offsets[start : end + 1]
+        return VariantArrays(
+            pos=self.pos[start:end],
+            ref_len=self.ref_len[start:end],
+            alt=self.alt[alt_offsets[0] : alt_offsets[-1]],
+            alt_offsets=alt_offsets - alt_offsets[0],
+            ref_span=int(self.ref_spans[i]),
+        )
+
+    def __iter__(self) -> Iterator[VariantArrays]:
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def alt_len(self) -> npt.NDArray[np.int64]:
+        return np.diff(self.alt_offsets)
+
+    @property
+    def set_sizes(self) -> npt.NDArray[np.int64]:
+        return np.diff(self.set_offsets)
+
+    @classmethod
+    def from_sets(cls, variant_sets: Sequence[VariantArrays]) -> VariantArraysBatch:
+        """
+        Concatenate independent variant sets into a batch.
+        """
+        if not variant_sets:
+            empty = VariantArrays.empty()
+            return cls(
+                pos=empty.pos,
+                ref_len=empty.ref_len,
+                alt=empty.alt,
+                alt_offsets=empty.alt_offsets,
+                set_offsets=np.zeros(1, dtype=np.int64),
+                ref_spans=np.zeros(0, dtype=np.int64),
+            )
+        return cls(
+            pos=np.concatenate([v.pos for v in variant_sets]),
+            ref_len=np.concatenate([v.ref_len for v in variant_sets]),
+            alt=np.concatenate([v.alt for v in variant_sets]),
+            alt_offsets=lengths_to_offsets(np.concatenate([v.alt_len for v in variant_sets])),
+            set_offsets=lengths_to_offsets(np.array([len(v) for v in variant_sets])),
+            ref_spans=np.array([v.ref_span for v in variant_sets], dtype=np.int64),
+        )
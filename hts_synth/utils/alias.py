@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+
+
+@dataclass(slots=True)
+class AliasTable:
+    """
+    Walker alias tables of many discrete distributions over the same number of outcomes.
+
+    Each draw costs one uniform integer, one uniform float and two lookups, whatever the number of
+    outcomes, and draws from any mix of the tables are vectorized.
+
+    Attributes:
+        prob (npt.NDArray[np.float64]): (tables, outcomes) probability of keeping each drawn outcome
+        alias (npt.NDArray[np.int32]): (tables, outcomes) outcome taken instead when not kept
+    """
+
+    prob: npt.NDArray[np.float64]
+    alias: npt.NDArray[np.int32]
+
+    def __len__(self) -> int:
+        return len(self.prob)
+
+    @property
+    def n_outcomes(self) -> int:
+        return self.prob.shape[1]
+
+    @classmethod
+    def from_weights(cls, weights: npt.ArrayLike) -> AliasTable:
+        """
+        Build the alias tables of the rows of a (tables, outcomes) matrix of non-negative weights.
+
+        All tables are built together with Vose's algorithm, finalising one outcome of every table
+        per step. Rows summing to zero give uniform distributions.
+        """
+        weights = np.atleast_2d(np.asarray(weights, dtype=np.float64))
+        n_tables, n_outcomes = weights.shape
+        totals = weights.sum(axis=1, keepdims=True)
+        scaled = np.where(totals > 0, weights * n_outcomes / np.where(totals > 0, totals, 1), 1.0)
+
+        prob = np.ones((n_tables, n_outcomes), dtype=np.float64)
+        alias = np.tile(np.arange(n_outcomes, dtype=np.int32), (n_tables, 1))
+        active = np.ones((n_tables, n_outcomes), dtype=np.bool_)
+        rows = np.arange(n_tables)
+        for _ in range(n_outcomes - 1):
+            small_mask = active & (scaled < 1)
+            small = np.where(
+                small_mask.any(axis=1), small_mask.argmax(axis=1), active.argmax(axis=1)
+            )
+            active[rows, small] = False
+            large_mask = active & (scaled >= 1)
+            has_large = large_mask.any(axis=1)
+            large = large_mask.argmax(axis=1)
+
+            small_scaled = scaled[rows, small]
+            prob[rows, small] = np.where(has_large, small_scaled, 1.0)
+            alias[rows, small] = np.where(has_large, large, small)
+            scaled[rows, large] -= np.where(has_large, 1.0 - small_scaled, 0.0)
+        # the last outcome of every table is kept outright (prob is already 1)
+        return cls(np.minimum(prob, 1.0), alias)
+
+    def sample(
+        self, rng: np.random.Generator, tables: npt.NDArray[np.intp] | int
+    ) -> npt.NDArray[np.int32]:
+        """
+        Draw one outcome from each of the given tables.
+
+        Args:
+            rng (np.random.Generator): Random number generator to draw from
+            tables (npt.NDArray[np.intp] | int): Index of the table to draw each outcome from
+
+        Returns:
+            npt.NDArray[np.int32]: One outcome per entry of tables, with the same shape
+        """
+        tables = np.asarray(tables)
+        outcomes = rng.integers(self.n_outcomes, size=tables.shape)
+        keep = rng.random(tables.shape) < self.prob[tables, outcomes]
+        return np.where(keep, outcomes, self.alias[tables, outcomes]).astype(np.int32)
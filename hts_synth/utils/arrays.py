@@ -0,0 +1,96 @@
+from collections.abc import Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+
+def ragged_arange(
+    starts: npt.NDArray[np.int64], lengths: npt.NDArray[np.int64]
+) -> npt.NDArray[np.int64]:
+    """
+    Concatenate ``arange(start, start + length)`` for each start and length pair.
+    """
+    run_offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - run_offsets, lengths) + np.arange(int(lengths.sum()))
+
+
+def ragged_reverse_index(
+    offsets: npt.NDArray[np.int64], reverse: npt.NDArray[np.bool_]
+) -> npt.NDArray[np.int64]:
+    """
+    Get the index reversing the selected runs of back to back values, delimited by offsets.
+    """
+    index = np.arange(int(offsets[-1]))
+    starts, ends = offsets[:-1][reverse], offsets[1:][reverse]
+    positions = ragged_arange(starts, ends - starts)
+    # the k-th value of a reversed run is taken from its k-th last
+    index[positions] = np.repeat(starts + ends - 1, ends - starts) - positions
+    return index
+
+
+def lengths_to_offsets(lengths: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+    """
+    Get the n + 1 offsets delimiting n consecutive runs of the given lengths.
+    """
+    return np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+
+
+def ragged_to_padded(
+    flat: npt.NDArray[np.uint8], lengths: npt.NDArray[np.int64]
+) -> npt.NDArray[np.uint8]:
+    """
+    Scatter consecutive runs of the given lengths into the rows of a zero-padded matrix.
+    """
+    max_length = int(lengths.max()) if len(lengths) else 0
+    padded = np.zeros((len(lengths), max_length), dtype=flat.dtype)
+    padded[np.arange(max_length) < lengths[:, None]] = flat
+    return padded
+
+
+def ragged_sums(
+    values: npt.NDArray[np.int64], offsets: npt.NDArray[np.int64]
+) -> npt.NDArray[np.int64]:
+    """
+    Sum each run of back to back values, delimited by offsets (empty runs sum to zero).
+    """
+    totals = np.concatenate(([0], np.cumsum(values)))
+    return totals[offsets[1:]] - totals[offsets[:-1]]
+
+
+def ragged_interleave(
+    fields: Sequence[tuple[npt.NDArray[np.uint8], npt.NDArray[np.int64]]],
+) -> tuple[npt.NDArray[np.uint8], npt.NDArray[np.int64]]:
+    """
+    Join the i-th runs of every field, for each i.
+
+    Args:
+        fields (Sequence[tuple]): Back to back runs of values with the length of each run,
+            every field having the same number of runs.
+
+    Returns:
+        tuple: The joined runs back to back, and the length of each.
+    """
+    lengths = np.sum([field_lengths for _, field_lengths in fields], axis=0, dtype=np.int64)
+    out = np.empty(int(lengths.sum()), dtype=np.uint8)
+    starts = np.cumsum(lengths) - lengths
+    for values, field_lengths in fields:
+        out[ragged_arange(starts, field_lengths)] = values
+        starts = starts + field_lengths
+    return out, lengths
+
+
+def decimal_ascii(
+    values: npt.NDArray[np.int64],
+) -> tuple[npt.NDArray[np.uint8], npt.NDArray[np.int64]]:
+    """
+    Format non-negative integers in decimal, as back to back ASCII digits with their lengths.
+    """
+    lengths = np.ones(len(values), dtype=np.int64)
+    max_value = int(values.max()) if len(values) else 0
+    for exponent in range(1, len(str(max_value))):
+        lengths += values >= 10**exponent
+    runs = np.repeat(np.arange(len(values)), lengths)
+    # digit k of a d digit value is value // 10 ** (d - 1 - k) % 10
+    exponents = lengths[runs] - 1 - (np.arange(len(runs)) - (np.cumsum(lengths) - lengths)[runs])
+    digits = values[runs] // 10**exponents % 10
+    return (digits + ord("0")).astype(np.uint8), lengths
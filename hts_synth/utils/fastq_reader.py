@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import gzip
+import os
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import BinaryIO
+
+import numpy as np
+import numpy.typing as npt
+
+from .arrays import lengths_to_offsets, ragged_arange, ragged_to_padded
+
+# Phred+33, as in reads.read_batch (not imported to keep utils free of package dependencies)
+_PHRED_OFFSET = 33
+_GZIP_MAGIC = b"\x1f\x8b"
+_NEWLINE = ord("\n")
+_CARRIAGE_RETURN = ord("\r")
+_HEADER = ord("@")
+_SEPARATOR = ord("+")
+
+DEFAULT_CHUNK_BYTES = 1 << 22
+
+
+@dataclass(slots=True)
+class FastqBlock:
+    """
+    The qualities (and optionally bases) of a block of consecutive fastq records, as flat arrays.
+
+    Records of every length are stored back to back, delimited by their lengths.
+
+    Attributes:
+        qualities (npt.NDArray[np.uint8]): Phred scores of all records, back to back
+        lengths (npt.NDArray[np.int64]): length of each record
+        bases (npt.NDArray[np.uint8] | None): ASCII bases of all records, back to back, if read
+    """
+
+    qualities: npt.NDArray[np.uint8]
+    lengths: npt.NDArray[np.int64]
+    bases: npt.NDArray[np.uint8] | None = None
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    @property
+    def offsets(self) -> npt.NDArray[np.int64]:
+        return lengths_to_offsets(self.lengths)
+
+    def padded_qualities(self) -> tuple[npt.NDArray[np.uint8], npt.NDArray[np.int64]]:
+        """
+        Get the qualities as a zero padded (records, positions) matrix, with the record lengths.
+        """
+        return ragged_to_padded(self.qualities, self.lengths), self.lengths
+
+
+def open_fastq(path: str | os.PathLike[str]) -> BinaryIO:
+    """
+    Open a plain or gzipped (including BGZF) fastq for binary reading, detecting gzip by content.
+    """
+    handle = open(path, "rb")
+    if handle.peek(2)[:2] == _GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=handle, mode="rb")  # pyright: ignore[reportReturnType]
+    return handle
+
+
+def _parse_records(
+    buffer: npt.NDArray[np.uint8], line_ends: npt.NDArray[np.intp], with_bases: bool
+) -> FastqBlock:
+    """
+    Parse a buffer of complete four line fastq records, given the position of every newline.
+    """
+    if len(line_ends) % 4:
+        raise ValueError("Truncated fastq record, records must have exactly four lines")
+    line_starts = np.concatenate(([0], line_ends[:-1] + 1))
+    # drop the carriage returns of windows line endings
+    line_stops = line_ends - (buffer[np.maximum(line_ends - 1, 0)] == _CARRIAGE_RETURN)
+
+    headers, sequences, separators, qualities = (line_starts[i::4] for i in range(4))
+    if np.any(buffer[headers] != _HEADER) or np.any(buffer[separators] != _SEPARATOR):
+        raise ValueError("Malformed fastq record, expected '@' header and '+' separator lines")
+
+    lengths = (line_stops[3::4] - qualities).astype(np.int64)
+    sequence_lengths = line_stops[1::4] - sequences
+    if np.any(sequence_lengths != lengths):
+        raise ValueError("Malformed fastq record, sequence and quality lengths differ")
+
+    flat_qualities = buffer[ragged_arange(qualities, lengths)] - _PHRED_OFFSET
+    bases = buffer[ragged_arange(sequences, lengths)] if with_bases else None
+    return FastqBlock(flat_qualities, lengths, bases)
+
+
+def read_fastq_blocks(
+    source: str | os.PathLike[str] | BinaryIO,
+    block_reads: int | None = None,
+    with_bases: bool = False,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    start: int = 0,
+    end: int | None = None,
+) -> Iterator[FastqBlock]:
+    """
+    Stream the records of a plain or gzipped fastq as blocks of flat NumPy arrays.
+
+    The file is read in large chunks, and the lines of all complete records of a chunk are found
+    and gathered with array operations; no per-record Python objects are created, so parsing runs
+    at close to read (or decompression) speed. Records of any length are supported, but must be
+    four lines each (sequences and qualities are not wrapped).
+
+    A byte range [start, end) of an uncompressed fastq reads the records whose header line starts
+    within it: reading starts at the first record boundary (an '@' line two lines before a '+'
+    line) at or after start, and stops before the first record starting at or after end. Ranges
+    tiling a file (see split_fastq) therefore read each record exactly once, so a single file can
+    be read by several processes.
+
+    Args:
+        source (str | os.PathLike[str] | BinaryIO): Path of the fastq, or a binary file object
+        block_reads (int | None): maximum number of records per block, None for whole chunks
+        with_bases (bool): whether to also read the bases of each record
+        chunk_bytes (int): number of bytes read at a time
+        start (int): byte offset of the range to read records from
+        end (int | None): byte offset of the end of the range, None for the end of the file
+
+    Yields:
+        FastqBlock: consecutive blocks of records
+
+    Raises:
+        ValueError: if the fastq is malformed, or a byte range is given for a compressed or
+            unseekable source
+    """
+    handle = open_fastq(source) if isinstance(source, (str, os.PathLike)) else source
+    try:
+        position = 0
+        if start > 0 or end is not None:
+            if isinstance(handle, gzip.GzipFile) or not handle.seekable():
+                raise ValueError("Byte ranges require an uncompressed, seekable fastq")
+            position = _record_start(handle, start, chunk_bytes)
+            _ = handle.seek(position)
+        remainder = b""
+        while end is None or position < end:
+            chunk = handle.read(chunk_bytes)
+            data = remainder + chunk
+            if not chunk:
+                if data.strip():
+                    # last record without a final newline
+                    buffer = _as_array(data + b"\n")
+                    newlines = _newlines(buffer)
+                    n_lines = _lines_before(newlines, len(newlines), _limit(end, position))
+                    if n_lines:
+                        records = _parse_records(buffer, newlines[:n_lines], with_bases)
+                        yield from _split_block(records, block_reads)
+                return
+
+            # cut after the last complete record, i.e. after a multiple of four lines
+            buffer = _as_array(data)
+            newlines = _newlines(buffer)
+            n_complete = len(newlines) - len(newlines) % 4
+            n_complete = _lines_before(newlines, n_complete, _limit(end, position))
+            if n_complete == 0:
+                if len(newlines) >= 4:
+                    # the first complete record starts beyond the range
+                    return
+                remainder = data
+                continue
+            cut = int(newlines[n_complete - 1]) + 1
+            remainder = data[cut:]
+            position += cut
+            records = _parse_records(buffer[:cut], newlines[:n_complete], with_bases)
+            yield from _split_block(records, block_reads)
+    finally:
+        if handle is not source:
+            handle.close()
+
+
+def _limit(end: int | None, position: int) -> int | None:
+    return None if end is None else end - position
+
+
+def _lines_before(newlines: npt.NDArray[np.intp], n_lines: int, limit: int | None) -> int:
+    """
+    Get the number of the first n_lines lines holding the records which start before limit.
+    """
+    if limit is None or n_lines == 0:
+        return n_lines
+    # record k starts after the newline ending the last line of record k - 1
+    record_starts = np.concatenate(([0], newlines[3 : n_lines - 1 : 4] + 1))
+    return 4 * int(np.searchsorted(record_starts, limit))
+
+
+def _record_start(handle: BinaryIO, start: int, chunk_bytes: int) -> int:
+    """
+    Find the byte offset of the first record starting at or after start, or of the end of file.
+
+    A record starts at a line beginning with '@' whose next line but one begins with '+'.
+    Quality lines may begin with '@', but are followed by a header and a sequence line, which
+    never begins with '+'.
+    """
+    if start <= 0:
+        return 0
+    # the byte before start tells whether a line begins at start
+    offset = start - 1
+    _ = handle.seek(offset)
+    data = b""
+    while True:
+        chunk = handle.read(chunk_bytes)
+        data += chunk
+        buffer = _as_array(data)
+        line_starts = _newlines(buffer) + 1
+        # lines whose next line but one begins within the data read so far
+        candidates = line_starts[:-2][line_starts[2:] < len(buffer)]
+        thirds = line_starts[2 : 2 + len(candidates)]
+        matches = np.flatnonzero((buffer[candidates] == _HEADER) & (buffer[thirds] == _SEPARATOR))
+        if len(matches):
+            return offset + int(candidates[matches[0]])
+        if not chunk:
+            return offset + len(data)
+
+
+def split_fastq(path: str | os.PathLike[str], parts: int) -> list[tuple[int, int | None]]:
+    """
+    Split a fastq into byte ranges of about equal size, to be read by read_fastq_blocks.
+
+    Compressed fastqs cannot be read from an arbitrary offset, so they give a single range.
+
+    Returns:
+        list[tuple[int, int | None]]: The start and end of each range, the last ending at None
+    """
+    with open(path, "rb") as handle:
+        if handle.read(2) == _GZIP_MAGIC:
+            return [(0, None)]
+    size = os.path.getsize(path)
+    parts = max(1, min(parts, size))
+    bounds = [size * i // parts for i in range(parts)]
+    return list(zip(bounds, [*bounds[1:], None]))
+
+
+def _as_array(data: bytes) -> npt.NDArray[np.uint8]:
+    return np.frombuffer(data, dtype=np.uint8)
+
+
+def _newlines(buffer: npt.NDArray[np.uint8]) -> npt.NDArray[np.intp]:
+    return np.flatnonzero(buffer == _NEWLINE)
+
+
+def _split_block(block: FastqBlock, block_reads: int | None) -> Iterator[FastqBlock]:
+    if block_reads is None or len(block) <= block_reads:
+        yield block
+        return
+    offsets = block.offsets
+    for start in range(0, len(block), block_reads):
+        stop = min(start + block_reads, len(block))
+        begin, end = int(offsets[start]), int(offsets[stop])
+        yield FastqBlock(
+            block.qualities[begin:end],
+            block.lengths[start:stop],
+            block.bases[begin:end] if block.bases is not None else None,
+        )
+
+
+def read_fastq(source: str | os.PathLike[str] | BinaryIO, with_bases: bool = False) -> FastqBlock:
+    """
+    Read all records of a fastq into a single block, see read_fastq_blocks.
+    """
+    blocks = list(read_fastq_blocks(source, with_bases=with_bases))
+    if not blocks:
+        return FastqBlock(
+            np.zeros(0, dtype=np.uint8),
+            np.zeros(0, dtype=np.int64),
+            np.zeros(0, dtype=np.uint8) if with_bases else None,
+        )
+    return FastqBlock(
+        np.concatenate([block.qualities for block in blocks]),
+        np.concatenate([block.lengths for block in blocks]),
+        np.concatenate([b.bases for b in blocks if b.bases is not None]) if with_bases else None,
+    )
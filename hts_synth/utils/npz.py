@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import os
+import struct
+import zipfile
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+# fixed part of a zip local file header, before the member name and extra field
+_LOCAL_HEADER = struct.Struct("<4s22xHH")
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+
+
+def _member_offset(handle: Any, info: zipfile.ZipInfo) -> int:
+    _ = handle.seek(info.header_offset)
+    signature, name_length, extra_length = _LOCAL_HEADER.unpack(handle.read(_LOCAL_HEADER.size))
+    if signature != _LOCAL_HEADER_SIGNATURE:
+        raise ValueError(f"Corrupt zip member {info.filename}")
+    return info.header_offset + _LOCAL_HEADER.size + name_length + extra_length
+
+
+def _read_header(handle: Any) -> tuple[tuple[int, ...], bool, np.dtype[Any]] | None:
+    """
+    Read the header of a .npy member, or None if its array cannot be memory-mapped.
+    """
+    version = np.lib.format.read_magic(handle)
+    if version == (1, 0):
+        shape, fortran, dtype = np.lib.format.read_array_header_1_0(handle)
+    elif version == (2, 0):
+        shape, fortran, dtype = np.lib.format.read_array_header_2_0(handle)
+    else:
+        return None
+    if not shape or 0 in shape or dtype.hasobject:
+        return None
+    return shape, fortran, dtype
+
+
+def load_npz(path: str | os.PathLike[str], mmap: bool = False) -> dict[str, npt.NDArray[Any]]:
+    """
+    Load all arrays of a .npz file, optionally memory-mapping them read-only.
+
+    np.load ignores mmap_mode for .npz files. Members of files saved with np.savez are stored
+    uncompressed, though, so each can be mapped straight from its offset in the archive: loading
+    costs no reads or copies, and processes mapping the same file share its pages. Compressed
+    members (np.savez_compressed), empty and 0-d arrays are read into memory.
+
+    Args:
+        path (str | os.PathLike[str]): Path of the .npz file
+        mmap (bool): Whether to memory-map the stored arrays
+
+    Returns:
+        dict[str, npt.NDArray[Any]]: Arrays by name
+    """
+    arrays: dict[str, npt.NDArray[Any]] = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as handle:
+        for info in archive.infolist():
+            name = info.filename.removesuffix(".npy")
+            if mmap and info.compress_type == zipfile.ZIP_STORED:
+                _ = handle.seek(_member_offset(handle, info))
+                header = _read_header(handle)
+                if header is not None:
+                    shape, fortran, dtype = header
+                    arrays[name] = np.memmap(
+                        path,
+                        dtype=dtype,
+                        mode="r",
+                        offset=handle.tell(),
+                        shape=shape,
+                        order="F" if fortran else "C",
+                    )
+                    continue
+            with archive.open(info) as member:
+                arrays[name] = np.lib.format.read_array(member, allow_pickle=False)
+    return arrays
@@ -1,6 +1,12 @@
+from __future__ import annotations
+
 import math
+from dataclasses import dataclass
 from typing import ClassVar
 
+import numpy as np
+import numpy.typing as npt
+
 
 class WelfordsRunningMean:
     """
@@ -49,3 +55,120 @@ class WelfordsRunningMean:
         else:
             sd = math.sqrt(m2 / (count - 1))
         return mean, sd
+
+
+@dataclass(slots=True)
+class OnlineMoments:
+    """
+    Vectorized Welford's online mean and variance of many positions at once.
+
+    Holds per-position counts, means and summed squared distances from the mean (m2) in contiguous
+    arrays. Blocks of observations are reduced with array operations and combined with the running
+    aggregate using Chan et al.'s parallel algorithm, which is also used to merge partial aggregates
+    (e.g. learned from different files in different processes). Positions are added as longer
+    observations are seen, so observations may vary in length.
+
+    Attributes:
+        counts (npt.NDArray[np.int64]): number of observations of each position
+        means (npt.NDArray[np.float64]): running mean of each position
+        m2 (npt.NDArray[np.float64]): summed squared distance from the mean of each position
+    """
+
+    _MIN_OBS: ClassVar[int] = 2  # you need at least this many obs to return valid moments
+
+    counts: npt.NDArray[np.int64]
+    means: npt.NDArray[np.float64]
+    m2: npt.NDArray[np.float64]
+
+    @classmethod
+    def zeros(cls, size: int = 0) -> OnlineMoments:
+        """
+        Create an aggregate of size positions without observations.
+        """
+        return cls(
+            counts=np.zeros(size, dtype=np.int64),
+            means=np.zeros(size, dtype=np.float64),
+            m2=np.zeros(size, dtype=np.float64),
+        )
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def _grow(self, size: int) -> None:
+        if size > len(self):
+            pad = (0, size - len(self))
+            self.counts = np.pad(self.counts, pad)
+            self.means = np.pad(self.means, pad)
+            self.m2 = np.pad(self.m2, pad)
+
+    def update(self, values: npt.ArrayLike, lengths: npt.NDArray[np.int64] | None = None) -> None:
+        """
+        Add a block of observations, one row per observation.
+
+        Args:
+            values (npt.ArrayLike): (n, positions) matrix of observations
+            lengths (npt.NDArray[np.int64] | None): number of valid leading positions of each row,
+                for blocks of variable length observations padded to a matrix; None if all are valid
+        """
+        block = np.atleast_2d(np.asarray(values, dtype=np.float64))
+        if lengths is None:
+            valid = np.ones(block.shape, dtype=np.bool_)
+        else:
+            valid = np.arange(block.shape[1]) < lengths[:, None]
+
+        counts = valid.sum(axis=0)
+        sums = np.where(valid, block, 0.0).sum(axis=0)
+        means = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+        deviations = np.where(valid, block - means, 0.0)
+        m2 = np.einsum("ij,ij->j", deviations, deviations)
+
+        self.merge(OnlineMoments(counts, means, m2))
+
+    def merge(self, other: OnlineMoments) -> None:
+        """
+        Combine the observations of another aggregate into this one.
+        """
+        self._grow(len(other))
+        n = len(other)
+        count_a, mean_a, m2_a = self.counts[:n], self.means[:n], self.m2[:n]
+        count_b, mean_b, m2_b = other.counts, other.means, other.m2
+
+        total = count_a + count_b
+        safe_total = np.maximum(total, 1)
+        delta = mean_b - mean_a
+        self.means[:n] = mean_a + delta * count_b / safe_total
+        self.m2[:n] = m2_a + m2_b + delta**2 * count_a * count_b / safe_total
+        self.counts[:n] = total
+
+    def observed_length(self) -> int:
+        """
+        Return the number of leading positions with enough observations to finalise.
+        """
+        poor = np.flatnonzero(self.counts <= self._MIN_OBS)
+        return int(poor[0]) if len(poor) else len(self)
+
+    def head(self, length: int) -> OnlineMoments:
+        """
+        Return a copy of the aggregate of the first length positions.
+        """
+        return OnlineMoments(
+            self.counts[:length].copy(), self.means[:length].copy(), self.m2[:length].copy()
+        )
+
+    def variances(self, population: bool = False) -> npt.NDArray[np.float64]:
+        """
+        Return the sample or population variance of each position.
+        """
+        if np.any(self.counts <= self._MIN_OBS):
+            raise RuntimeError("Insufficient observations to finalise")
+        return self.m2 / (self.counts if population else self.counts - 1)
+
+    def yield_moments(self, population: bool = False) -> list[tuple[float, float]]:
+        """
+        Return the finalised mean and sample or population standard deviation of each position.
+
+        Args:
+            population (bool): whether to return the sample or population sample deviaition
+        """
+        sds = np.sqrt(self.variances(population))
+        return list(zip(self.means.tolist(), sds.tolist()))
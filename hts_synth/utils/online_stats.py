@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+
+from .online_mean import OnlineMoments
+
+
+def _valid_entries(
+    values: npt.ArrayLike, lengths: npt.NDArray[np.int64] | None
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.int64], int]:
+    """
+    Get the valid observations of a (possibly padded) block with the position of each.
+    """
+    block = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    if lengths is None:
+        positions = np.broadcast_to(np.arange(block.shape[1]), block.shape).ravel()
+        return block.ravel(), positions, block.shape[1]
+    valid = np.arange(block.shape[1]) < lengths[:, None]
+    return block[valid], np.nonzero(valid)[1], block.shape[1]
+
+
+def _pad_rows(counts: npt.NDArray[np.int64], size: int) -> npt.NDArray[np.int64]:
+    if size <= len(counts):
+        return counts
+    return np.pad(counts, ((0, size - len(counts)),) + ((0, 0),) * (counts.ndim - 1))
+
+
+def _quantiles_from_counts(
+    counts: npt.NDArray[np.int64], values: npt.NDArray[np.float64], q: npt.ArrayLike
+) -> npt.NDArray[np.float64]:
+    """
+    Get the quantiles of each row of binned counts, with each bin represented by values.
+
+    Returns:
+        npt.NDArray[np.float64]: (quantiles, rows) matrix, nan for rows without observations
+    """
+    q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+    cumulative = np.cumsum(counts, axis=1)
+    totals = cumulative[:, -1] if counts.shape[1] else np.zeros(len(counts), dtype=np.int64)
+    # lower quantile: the first bin whose cumulative count exceeds the rank
+    ranks = np.floor(q[:, None] * np.maximum(totals - 1, 0))
+    bins = (cumulative[None, :, :] <= ranks[:, :, None]).sum(axis=2)
+    quantiles = values[np.minimum(bins, len(values) - 1)]
+    return np.where(totals > 0, quantiles, np.nan)
+
+
+@dataclass(slots=True)
+class PositionHistogram:
+    """
+    Per-position histogram of small non-negative integer observations (e.g. Phred scores).
+
+    Values outside [0, n_values) are clipped to the nearest bin. Quantiles are exact.
+
+    Attributes:
+        counts (npt.NDArray[np.int64]): (positions, n_values) number of observations of each value
+    """
+
+    counts: npt.NDArray[np.int64]
+
+    @classmethod
+    def zeros(cls, size: int, n_values: int) -> PositionHistogram:
+        return cls(np.zeros((size, n_values), dtype=np.int64))
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    @property
+    def n_values(self) -> int:
+        return self.counts.shape[1]
+
+    def update(self, values: npt.ArrayLike, lengths: npt.NDArray[np.int64] | None = None) -> None:
+        """
+        Add a block of observations, as OnlineMoments.update.
+        """
+        entries, positions, width = _valid_entries(values, lengths)
+        self.counts = _pad_rows(self.counts, width)
+        bins = np.clip(np.rint(entries), 0, self.n_values - 1).astype(np.int64)
+        self.counts[:width] += np.bincount(
+            positions * self.n_values + bins, minlength=width * self.n_values
+        ).reshape(width, self.n_values)
+
+    def merge(self, other: PositionHistogram) -> None:
+        if other.n_values != self.n_values:
+            raise ValueError("Cannot merge histograms with different numbers of values")
+        self.counts = _pad_rows(self.counts, len(other))
+        self.counts[: len(other)] += other.counts
+
+    def quantiles(self, q: npt.ArrayLike) -> npt.NDArray[np.float64]:
+        """
+        Get the exact q quantiles of each position, as a (quantiles, positions) matrix.
+        """
+        return _quantiles_from_counts(self.counts, np.arange(self.n_values, dtype=np.float64), q)
+
+
+@dataclass(slots=True)
+class QuantileSketch:
+    """
+    Per-position streaming quantile sketch with a fixed memory footprint.
+
+    Non-negative observations are counted in logarithmically spaced buckets (as in DDSketch), so
+    every quantile is estimated within relative_accuracy of a true observation. Observations at or
+    below min_value fall in a dedicated zero bucket, and those above max_value in the last bucket.
+    Sketches with the same parameters merge exactly by adding counts.
+
+    Attributes:
+        relative_accuracy (float): relative error bound of estimated quantiles
+        min_value (float): smallest value distinguished from zero
+        max_value (float): largest value estimated within relative_accuracy
+        counts (npt.NDArray[np.int64]): (positions, buckets) observations per bucket, the first
+            bucket being the zero bucket
+    """
+
+    relative_accuracy: float
+    min_value: float
+    max_value: float
+    counts: npt.NDArray[np.int64]
+
+    @classmethod
+    def zeros(
+        cls,
+        size: int,
+        relative_accuracy: float = 0.01,
+        min_value: float = 1.0,
+        max_value: float = 1000.0,
+    ) -> QuantileSketch:
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("Relative accuracy must be between 0 and 1")
+        sketch = cls(relative_accuracy, min_value, max_value, np.zeros((size, 0), dtype=np.int64))
+        sketch.counts = np.zeros((size, sketch.n_buckets), dtype=np.int64)
+        return sketch
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    @property
+    def _log_gamma(self) -> float:
+        return math.log1p(2 * self.relative_accuracy / (1 - self.relative_accuracy))
+
+    @property
+    def _min_key(self) -> int:
+        return math.ceil(math.log(self.min_value) / self._log_gamma)
+
+    @property
+    def n_buckets(self) -> int:
+        return math.ceil(math.log(self.max_value) / self._log_gamma) - self._min_key + 2
+
+    def _bucket_values(self) -> npt.NDArray[np.float64]:
+        keys = self._min_key + np.arange(self.n_buckets - 1)
+        gamma = math.exp(self._log_gamma)
+        return np.concatenate(([0.0], 2 * gamma**keys / (gamma + 1)))
+
+    def update(self, values: npt.ArrayLike, lengths: npt.NDArray[np.int64] | None = None) -> None:
+        """
+        Add a block of observations, as OnlineMoments.update.
+        """
+        entries, positions, width = _valid_entries(values, lengths)
+        if np.any(entries < 0):
+            raise ValueError("Quantile sketches only support non-negative values")
+        self.counts = _pad_rows(self.counts, width)
+
+        above = entries > self.min_value
+        keys = np.ceil(np.log(entries, where=above, out=np.ones_like(entries)) / self._log_gamma)
+        buckets = np.where(
+            above, np.clip(keys - self._min_key + 1, 1, self.n_buckets - 1), 0
+        ).astype(np.int64)
+        self.counts[:width] += np.bincount(
+            positions * self.n_buckets + buckets, minlength=width * self.n_buckets
+        ).reshape(width, self.n_buckets)
+
+    def merge(self, other: QuantileSketch) -> None:
+        if (other.relative_accuracy, other.min_value, other.max_value) != (
+            self.relative_accuracy,
+            self.min_value,
+            self.max_value,
+        ):
+            raise ValueError("Cannot merge sketches with different parameters")
+        self.counts = _pad_rows(self.counts, len(other))
+        self.counts[: len(other)] += other.counts
+
+    def quantiles(self, q: npt.ArrayLike) -> npt.NDArray[np.float64]:
+        """
+        Estimate the q quantiles of each position, as a (quantiles, positions) matrix.
+        """
+        return _quantiles_from_counts(self.counts, self._bucket_values(), q)
+
+
+@dataclass(slots=True)
+class OnlineStats:
+    """
+    Array-backed online statistics of many positions, e.g. the quality scores of each read position.
+
+    Always tracks count, mean and m2 (OnlineMoments), and optionally an exact histogram of integer
+    observations and/or a streaming quantile sketch. Every statistic is updated from blocks of
+    observations with array operations, accepts padded blocks of variable length observations and
+    merges pairwise, so partial statistics can be learned in parallel and combined.
+
+    Attributes:
+        moments (OnlineMoments): counts, means and m2 of each position
+        histogram (PositionHistogram | None): histogram of each position, if collected
+        sketch (QuantileSketch | None): quantile sketch of each position, if collected
+    """
+
+    moments: OnlineMoments
+    histogram: PositionHistogram | None = None
+    sketch: QuantileSketch | None = None
+
+    @classmethod
+    def create(
+        cls,
+        size: int = 0,
+        histogram_values: int | None = None,
+        sketch_accuracy: float | None = None,
+    ) -> OnlineStats:
+        """
+        Create statistics of size positions without observations.
+
+        Args:
+            size (int): initial number of positions, more are added as longer observations are seen
+            histogram_values (int | None): number of integer values to histogram, None for no histogram
+            sketch_accuracy (float | None): relative accuracy of a quantile sketch, None for no sketch
+        """
+        return cls(
+            moments=OnlineMoments.zeros(size),
+            histogram=(
+                PositionHistogram.zeros(size, histogram_values)
+                if histogram_values is not None
+                else None
+            ),
+            sketch=(
+                QuantileSketch.zeros(size, sketch_accuracy) if sketch_accuracy is not None else None
+            ),
+        )
+
+    def __len__(self) -> int:
+        return len(self.moments)
+
+    def update(self, values: npt.ArrayLike, lengths: npt.NDArray[np.int64] | None = None) -> None:
+        """
+        Add a block of observations, one row per observation.
+
+        Args:
+            values (npt.ArrayLike): (n, positions) matrix of observations
+            lengths (npt.NDArray[np.int64] | None): number of valid leading positions of each row,
+                for blocks of variable length observations padded to a matrix; None if all are valid
+        """
+        self.moments.update(values, lengths)
+        if self.histogram is not None:
+            self.histogram.update(values, lengths)
+        if self.sketch is not None:
+            self.sketch.update(values, lengths)
+
+    def merge(self, other: OnlineStats) -> None:
+        """
+        Combine the observations of other statistics, collected in the same way, into these.
+        """
+        self.moments.merge(other.moments)
+        if self.histogram is not None and other.histogram is not None:
+            self.histogram.merge(other.histogram)
+        elif self.histogram is not None or other.histogram is not None:
+            raise ValueError("Cannot merge statistics with and without histograms")
+        if self.sketch is not None and other.sketch is not None:
+            self.sketch.merge(other.sketch)
+        elif self.sketch is not None or other.sketch is not None:
+            raise ValueError("Cannot merge statistics with and without quantile sketches")
+
+    def quantiles(self, q: npt.ArrayLike) -> npt.NDArray[np.float64]:
+        """
+        Get the q quantiles of each position.
+
+        Quantiles are exact from the histogram if collected, else estimated from the quantile sketch.
+
+        Returns:
+            npt.NDArray[np.float64]: (quantiles, positions) matrix
+        """
+        if self.histogram is not None:
+            return self.histogram.quantiles(q)
+        if self.sketch is not None:
+            return self.sketch.quantiles(q)
+        raise RuntimeError("Quantiles require a histogram or quantile sketch")
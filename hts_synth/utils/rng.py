@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from enum import IntEnum
+from typing import ClassVar
+
+import numpy as np
+
+
+class RngStream(IntEnum):
+    """
+    Independent random streams used by the stages of read generation.
+    """
+
+    VARIANTS = 0
+    QUALITIES = 1
+    PLACEMENT = 2
+    NAMES = 3
+
+
+class RngContext:
+    """
+    Single seedable source of randomness for a generation run.
+
+    Every stream is derived from one np.random.SeedSequence by its spawn key, so a stream
+    depends only on the root seed and the path of shard indices and stream ids leading to it.
+    It never depends on how many other streams or shards were created, or in which process,
+    so sharded runs reproduce the same output regardless of the number of workers.
+
+    Attributes:
+        seed_sequence (np.random.SeedSequence): Seed sequence of this context.
+    """
+
+    # spawn key prefixes keeping shard contexts and streams in disjoint key spaces
+    _STREAM_KEY: ClassVar[int] = 0
+    _SHARD_KEY: ClassVar[int] = 1
+
+    seed_sequence: np.random.SeedSequence
+
+    def __init__(self, seed: int | np.random.SeedSequence | None = None):
+        """
+        Initialise object.
+
+        Args:
+            seed (int | np.random.SeedSequence | None): Root seed, None will draw fresh entropy
+                (recoverable from the entropy property to reproduce the run).
+        """
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_sequence = seed
+        else:
+            self.seed_sequence = np.random.SeedSequence(seed)
+
+    @property
+    def entropy(self) -> int:
+        """
+        Root entropy, which reproduces this run when passed back as the seed.
+        """
+        return int(self.seed_sequence.entropy)  # pyright: ignore[reportArgumentType]
+
+    def _child(self, *key: int) -> np.random.SeedSequence:
+        return np.random.SeedSequence(
+            self.seed_sequence.entropy,
+            spawn_key=(*self.seed_sequence.spawn_key, *key),
+            pool_size=self.seed_sequence.pool_size,
+        )
+
+    def shard(self, index: int) -> RngContext:
+        """
+        Get the context of one shard of work.
+
+        Args:
+            index (int): Index of the shard, the same index always gives the same streams
+        """
+        return RngContext(self._child(self._SHARD_KEY, index))
+
+    def spawn(self, n: int) -> list[RngContext]:
+        """
+        Get the contexts of the first n shards.
+        """
+        return [self.shard(i) for i in range(n)]
+
+    def generator(self, stream: RngStream | int) -> np.random.Generator:
+        """
+        Get a fresh random number generator for one stream of this context.
+
+        Args:
+            stream (RngStream | int): Stream to draw from
+        """
+        return np.random.default_rng(self._child(self._STREAM_KEY, int(stream)))
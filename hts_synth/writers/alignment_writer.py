@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from enum import StrEnum
+from types import TracebackType
+
+import pysam
+
+from ..reads.read_batch import ReadBatch
+
+
+class AlignmentFormat(StrEnum):
+    """
+    Alignment file formats writable by pysam.
+    """
+
+    SAM = "sam"
+    BAM = "bam"
+    CRAM = "cram"
+
+    def mode(self, level: int | None = None) -> str:
+        """
+        Get the pysam write mode.
+
+        pysam only distinguishes uncompressed (level 0) from default compression BAM output,
+        any other level gives the htslib default.
+        """
+        match self:
+            case AlignmentFormat.SAM:
+                return "w"
+            case AlignmentFormat.BAM:
+                return "wb0" if level == 0 else "wb"
+            case AlignmentFormat.CRAM:
+                return "wc"
+
+
+class AlignmentWriter:
+    """
+    Write batches of reads to a SAM, BAM or CRAM file through pysam.AlignmentFile.
+
+    BGZF/CRAM compression runs on htslib's own thread pool. When sorting is requested, reads
+    are first written to a fast, uncompressed temporary BAM next to the output, which is
+    coordinate sorted into the output by samtools sort on close.
+    """
+
+    path: str
+    format: AlignmentFormat
+    threads: int
+    sort: bool
+    reference_filename: str | None
+    closed: bool
+
+    def __init__(
+        self,
+        path: str,
+        header: pysam.AlignmentHeader,
+        format: AlignmentFormat | None = None,
+        threads: int = 1,
+        sort: bool = False,
+        reference_filename: str | None = None,
+        level: int | None = None,
+    ):
+        """
+        Initialise object.
+
+        Args:
+            path (str): Path of the output file, - writes to stdout
+            header (pysam.AlignmentHeader): Header of the output, e.g. Reference.alignment_header
+            format (AlignmentFormat | None): Output format, None infers it from the path (SAM for
+                stdout or unknown extensions)
+            threads (int): Number of compression threads
+            sort (bool): Whether to coordinate sort the output
+            reference_filename (str | None): FASTA the reads were generated from, required for CRAM
+            level (int | None): Compression level of BAM output, see AlignmentFormat.mode
+        """
+        self.path = path
+        self.format = format or self.format_from_path(path)
+        self.threads = threads
+        self.sort = sort
+        self.reference_filename = reference_filename
+        self.closed = False
+
+        if self.format is AlignmentFormat.CRAM and reference_filename is None:
+            raise ValueError("CRAM output requires the reference FASTA")
+
+        self._unsorted_path: str | None = None
+        if sort:
+            fd, self._unsorted_path = tempfile.mkstemp(
+                suffix=".unsorted.bam",
+                dir=os.path.dirname(os.path.abspath(path)) if path != "-" else None,
+            )
+            os.close(fd)
+            target, mode = self._unsorted_path, AlignmentFormat.BAM.mode(0)
+        else:
+            target, mode = path, self.format.mode(level)
+
+        self.file: pysam.AlignmentFile = pysam.AlignmentFile(
+            target,
+            mode,
+            header=header,
+            threads=threads,
+            reference_filename=reference_filename,
+        )
+
+    @staticmethod
+    def format_from_path(path: str) -> AlignmentFormat:
+        """
+        Infer the alignment format from a file extension.
+        """
+        extension = os.path.splitext(path)[1].lstrip(".").lower()
+        if extension in AlignmentFormat:
+            return AlignmentFormat(extension)
+        return AlignmentFormat.SAM
+
+    def write_batch(self, batch: ReadBatch) -> None:
+        """
+        Write all reads of a batch.
+        """
+        write = self.file.write
+        for read in batch.to_aligned_segments():
+            _ = write(read)
+
+    def close(self) -> None:
+        """
+        Close the output, sorting it if requested.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.file.close()
+        if self._unsorted_path is None:
+            return
+
+        try:
+            args = ["-@", str(self.threads), "-O", self.format.value, "-o", self.path]
+            if self.reference_filename is not None:
+                args += ["--reference", self.reference_filename]
+            # pysam captures samtools' stdout unless told otherwise, which would swallow "-"
+            _ = pysam.sort(*args, self._unsorted_path, catch_stdout=self.path != "-")
+        finally:
+            os.remove(self._unsorted_path)
+
+    def __enter__(self) -> AlignmentWriter:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
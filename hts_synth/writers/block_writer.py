@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import gzip
+import struct
+import zlib
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from enum import StrEnum
+from types import TracebackType
+from typing import BinaryIO, ClassVar
+
+# Uncompressed payload of a BGZF block, chosen (as in htslib) so that even incompressible data
+# fits the 64 KiB block limit once deflate and gzip framing are added
+BGZF_BLOCK_SIZE = 0xFF00
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+_BGZF_HEADER = struct.Struct("<4BI2BH2BHH")
+_GZIP_TRAILER = struct.Struct("<II")
+
+
+class Compression(StrEnum):
+    """
+    Compression applied to written output.
+    """
+
+    NONE = "none"
+    GZIP = "gzip"
+    BGZF = "bgzf"
+
+    @classmethod
+    def from_path(cls, path: str) -> Compression:
+        """
+        Infer the compression from a file extension (.gz for gzip, .bgz/.bgzf for BGZF).
+        """
+        if path.endswith((".bgz", ".bgzf")):
+            return cls.BGZF
+        if path.endswith(".gz"):
+            return cls.GZIP
+        return cls.NONE
+
+
+def bgzf_block(data: bytes, level: int) -> bytes:
+    """
+    Compress up to BGZF_BLOCK_SIZE bytes into a single BGZF block.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    cdata = compressor.compress(data) + compressor.flush()
+    block_size = _BGZF_HEADER.size + len(cdata) + _GZIP_TRAILER.size
+    header = _BGZF_HEADER.pack(
+        0x1F, 0x8B, 8, 4, 0, 0, 0xFF, 6, ord("B"), ord("C"), 2, block_size - 1
+    )
+    return header + cdata + _GZIP_TRAILER.pack(zlib.crc32(data), len(data))
+
+
+def compress_bgzf(data: bytes, level: int) -> bytes:
+    """
+    Compress data into a run of BGZF blocks (without the EOF marker).
+    """
+    view = memoryview(data)
+    return b"".join(
+        bgzf_block(view[i : i + BGZF_BLOCK_SIZE].tobytes(), level)
+        for i in range(0, len(data), BGZF_BLOCK_SIZE)
+    )
+
+
+def compress_gzip(data: bytes, level: int) -> bytes:
+    """
+    Compress data into a single gzip member.
+
+    Members are concatenated in the output, which gzip readers decompress as one stream.
+    """
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+class BlockWriter:
+    """
+    Buffered, optionally compressed binary output.
+
+    Writes are gathered into large chunks before they reach the sink. Compressed chunks are
+    encoded independently (one gzip member, or a run of BGZF blocks, per chunk) so they can be
+    compressed in a thread pool; zlib releases the GIL, so this scales with threads. Chunks are
+    always written in order, and at most twice the number of threads are in flight at a time.
+    """
+
+    default_chunk_size: ClassVar[int] = 4 * 1024 * 1024
+
+    sink: BinaryIO
+    compression: Compression
+    level: int
+    chunk_size: int
+    close_sink: bool
+    closed: bool
+
+    def __init__(
+        self,
+        sink: BinaryIO,
+        compression: Compression = Compression.NONE,
+        level: int = 6,
+        threads: int = 1,
+        chunk_size: int | None = None,
+        close_sink: bool = False,
+    ):
+        """
+        Initialise object.
+
+        Args:
+            sink (BinaryIO): Binary stream to write to
+            compression (Compression): Compression to apply
+            level (int): Compression level, 0-9
+            threads (int): Number of compression threads, 1 compresses in the calling thread
+            chunk_size (int | None): Number of uncompressed bytes gathered per chunk
+            close_sink (bool): Whether closing this writer also closes the sink
+        """
+        if not 0 <= level <= 9:
+            raise ValueError(f"Compression level must be between 0 and 9, got {level}")
+
+        self.sink = sink
+        self.compression = compression
+        self.level = level
+        self.chunk_size = chunk_size or self.default_chunk_size
+        self.close_sink = close_sink
+        self.closed = False
+
+        self._buffer: list[bytes] = []
+        self._buffered: int = 0
+        self._pending: deque[Future[bytes]] = deque()
+        self._max_pending: int = 2 * threads
+        self._pool: ThreadPoolExecutor | None = (
+            ThreadPoolExecutor(threads)
+            if threads > 1 and compression is not Compression.NONE
+            else None
+        )
+        self._compress: Callable[[bytes, int], bytes] | None = {
+            Compression.NONE: None,
+            Compression.GZIP: compress_gzip,
+            Compression.BGZF: compress_bgzf,
+        }[compression]
+
+    @classmethod
+    def open(
+        cls,
+        path: str,
+        compression: Compression | None = None,
+        level: int = 6,
+        threads: int = 1,
+    ) -> BlockWriter:
+        """
+        Open a file for writing.
+
+        Args:
+            path (str): Path of the file
+            compression (Compression | None): Compression to apply, None infers it from the path
+            level (int): Compression level, 0-9
+            threads (int): Number of compression threads
+        """
+        if compression is None:
+            compression = Compression.from_path(path)
+        return cls(open(path, "wb"), compression, level, threads, close_sink=True)
+
+    def write(self, data: bytes) -> None:
+        """
+        Buffer data, writing out full chunks.
+        """
+        if self.closed:
+            raise ValueError("Write to closed writer")
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.chunk_size:
+            self._flush_buffer()
+
+    def _flush_buffer(self) -> None:
+        if not self._buffered:
+            return
+        data = b"".join(self._buffer)
+        self._buffer.clear()
+        self._buffered = 0
+
+        if self._compress is None:
+            _ = self.sink.write(data)
+        elif self._pool is None:
+            _ = self.sink.write(self._compress(data, self.level))
+        else:
+            self._pending.append(self._pool.submit(self._compress, data, self.level))
+            while len(self._pending) >= self._max_pending:
+                _ = self.sink.write(self._pending.popleft().result())
+
+    def flush(self) -> None:
+        """
+        Write out all buffered data.
+
+        Compressed output is flushed on a chunk boundary, so this should be called sparingly.
+        """
+        self._flush_buffer()
+        while self._pending:
+            _ = self.sink.write(self._pending.popleft().result())
+        self.sink.flush()
+
+    def close(self) -> None:
+        """
+        Flush all data, terminate the compressed stream and release resources.
+        """
+        if self.closed:
+            return
+        try:
+            self.flush()
+            if self.compression is Compression.BGZF:
+                _ = self.sink.write(BGZF_EOF)
+                self.sink.flush()
+        finally:
+            self.closed = True
+            if self._pool is not None:
+                self._pool.shutdown()
+            if self.close_sink:
+                self.sink.close()
+
+    def __enter__(self) -> BlockWriter:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
@@ -1,8 +1,16 @@
+import random
+from collections.abc import Callable
+from typing import Any
+
+import pysam
 import pytest
 from faker import Faker
 
 from hts_synth.providers.mutated_sequence_provider import MutatedSequenceProvider
 from hts_synth.providers.read_provider import ReadProvider
+from hts_synth.reads.read_generator import QualityModel, ReadGenerator
+from hts_synth.ref.reference import ReferenceSegment
+from hts_synth.utils.rng import RngContext
 
 
 @pytest.fixture(scope="session")
@@ -11,3 +19,39 @@ def faker():
     faker.add_provider(ReadProvider)
     faker.add_provider(MutatedSequenceProvider)
     yield faker
+
+
+@pytest.fixture(scope="session")
+def reference_fasta(tmp_path_factory: pytest.TempPathFactory):
+    rand = random.Random(7)
+    contigs = {
+        "chr1": "".join(rand.choice("ACGT") for _ in range(5000)),
+        "chr2": "".join(rand.choice("ACGT") for _ in range(2000)),
+    }
+    path = tmp_path_factory.mktemp("reference") / "reference.fa"
+    with open(path, "w") as fa:
+        for name, seq in contigs.items():
+            _ = fa.write(f">{name}\n")
+            fa.writelines(seq[i : i + 60] + "\n" for i in range(0, len(seq), 60))
+    _ = pysam.faidx(str(path))
+    yield str(path)
+
+
+@pytest.fixture(scope="session")
+def reference_sequence() -> str:
+    return "ACTTGGAAGTTCGATCGGATCCATGCAAGTCAGTACCGTAGGCTAACGTTAGC"
+
+
+@pytest.fixture(scope="session")
+def read_generator(reference_sequence: str) -> Callable[..., ReadGenerator]:
+    """
+    Make ReadGenerators of reference_sequence (or a given segment) with placeholder qualities.
+    """
+
+    def make(
+        seed: int, segment: ReferenceSegment | str | None = None, **kwargs: Any
+    ) -> ReadGenerator:
+        segment = segment if segment is not None else reference_sequence
+        return ReadGenerator(segment, QualityModel(), rng=RngContext(seed), **kwargs)
+
+    return make
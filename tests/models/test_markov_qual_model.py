@@ -0,0 +1,105 @@
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pysam
+import pytest
+
+from hts_synth.models.markov_qual_model import MarkovQualLearner, MarkovQualModel
+
+
+def _correlated_quals(rng: np.random.Generator, n: int, length: int) -> np.ndarray:
+    quals = np.zeros((n, length))
+    quals[:, 0] = rng.normal(35, 3, n)
+    for i in range(1, length):
+        quals[:, i] = 0.9 * quals[:, i - 1] + 0.1 * (35 - 0.1 * i) + rng.normal(0, 1.5, n)
+    return np.clip(np.rint(quals), 2, 41).astype(np.uint8)
+
+
+class TestMarkovQualModel:
+    def test_reproduces_means_and_autocorrelation(self):
+        quals = _correlated_quals(np.random.default_rng(1), 5000, 60)
+        learner = MarkovQualLearner()
+        learner.update_block(quals)
+        sim = learner.yield_model(np.random.default_rng(2)).sample_batch(20000)
+
+        def lag_one(q: np.ndarray) -> float:
+            return np.corrcoef(q[:, 20].astype(float), q[:, 21].astype(float))[0, 1]
+
+        assert sim.shape == (20000, 60)
+        assert np.allclose(sim.mean(axis=0), quals.mean(axis=0), atol=0.5)
+        assert abs(lag_one(sim) - lag_one(quals)) < 0.05
+
+    def test_bins_emit_observed_scores(self):
+        quals = np.array([[10, 12, 30, 32], [11, 31, 31, 12]], dtype=np.uint8)
+        learner = MarkovQualLearner(bin_edges=[0, 20, 94])
+        learner.update_block(quals)
+        model = learner.yield_model()
+
+        assert model.bin_values.tolist() == [11, 31]
+        assert np.isin(model.sample_batch(100, read_length=10), [11, 31]).all()
+
+    def test_variable_lengths_and_merge(self):
+        quals = _correlated_quals(np.random.default_rng(5), 40, 30)
+        lengths = np.random.default_rng(6).integers(1, 31, 40)
+        whole = MarkovQualLearner()
+        whole.update_block(quals, lengths)
+        first, second = MarkovQualLearner(), MarkovQualLearner()
+        first.update_block(quals[:20, :15], np.minimum(lengths[:20], 15))
+        second.update_block(quals[20:], lengths[20:])
+        second.update_block(quals[:20], np.where(lengths[:20] > 15, lengths[:20], 0))
+        first.merge(second)
+
+        assert whole.transition_counts.sum() == (lengths - 1).sum()
+        assert first.observations == 60
+        # reads longer than 15 were learned twice, in full by second
+        long_reads = MarkovQualLearner()
+        long_reads.update_block(quals[:20, :15], np.where(lengths[:20] > 15, 15, 0))
+        assert np.array_equal(
+            first.transition_counts[:14] - long_reads.transition_counts,
+            whole.transition_counts[:14],
+        )
+
+    def test_save_load(self, tmp_path: Path):
+        learner = MarkovQualLearner()
+        learner.update_block(_correlated_quals(np.random.default_rng(1), 200, 20))
+        model = learner.yield_model(np.random.default_rng(9))
+        model.save(tmp_path / "model.npz")
+        loaded = MarkovQualModel.load(tmp_path / "model.npz", np.random.default_rng(9))
+
+        assert np.array_equal(loaded.sample_batch(50), model.sample_batch(50))
+
+    def test_mmap_load_is_shared(self, tmp_path: Path):
+        learner = MarkovQualLearner()
+        learner.update_block(_correlated_quals(np.random.default_rng(1), 200, 20))
+        model = learner.yield_model(np.random.default_rng(9))
+        model.save(tmp_path / "model.npz")
+        mapped = MarkovQualModel.load(tmp_path / "model.npz", np.random.default_rng(9), mmap=True)
+
+        assert isinstance(mapped.transitions, np.memmap)
+        # pickles (e.g. to worker processes) as a reference to the file
+        copy = pickle.loads(pickle.dumps(mapped))
+        assert isinstance(copy.transitions, np.memmap)
+        assert len(pickle.dumps(mapped)) < mapped.transitions.nbytes
+        assert np.array_equal(copy.sample_batch(50), model.sample_batch(50))
+
+    def test_learn_fastq(self, tmp_path: Path):
+        quals = _correlated_quals(np.random.default_rng(1), 30, 25)
+        path = tmp_path / "reads.fq"
+        _ = path.write_text(
+            "".join(
+                f"@r{i}\n{'A' * len(q)}\n+\n{pysam.qualities_to_qualitystring(q.tolist())}\n"
+                for i, q in enumerate(quals)
+            )
+        )
+        with pysam.FastxFile(str(path)) as fq:
+            learner = MarkovQualLearner.learn_fastq(fq, block_size=7)
+        expected = MarkovQualLearner()
+        expected.update_block(quals)
+
+        assert np.array_equal(learner.transition_counts, expected.transition_counts)
+        assert np.array_equal(learner.initial_counts, expected.initial_counts)
+
+    def test_no_observations(self):
+        with pytest.raises(RuntimeError):
+            _ = MarkovQualLearner().yield_model()
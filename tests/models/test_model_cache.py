@@ -0,0 +1,91 @@
+from pathlib import Path
+
+import numpy as np
+import pysam
+import pytest
+from click.testing import CliRunner
+
+from hts_synth.hts_synth import cli, model_cli
+from hts_synth.models.markov_qual_model import MarkovQualModel
+from hts_synth.models.model_cache import (
+    ModelCache,
+    QualModelKind,
+    fastq_digest,
+    load_quality_model,
+)
+from hts_synth.models.qual_model import NaiveQualSim
+
+
+def _write_fastq(path: Path, n: int, seed: int = 1) -> str:
+    quals = np.random.default_rng(seed).integers(10, 40, size=(n, 30))
+    _ = path.write_text(
+        "".join(
+            f"@r{i}\n{'A' * len(q)}\n+\n{pysam.qualities_to_qualitystring(q.tolist())}\n"
+            for i, q in enumerate(quals)
+        )
+    )
+    return str(path)
+
+
+class TestModelSerialization:
+    def test_naive_round_trip(self, tmp_path: Path):
+        model = NaiveQualSim([(30.0, 2.0), (20.0, 5.0)], np.random.default_rng(1))
+        model.save(tmp_path / "naive.npz")
+        loaded = load_quality_model(tmp_path / "naive.npz", np.random.default_rng(1))
+
+        assert isinstance(loaded, NaiveQualSim)
+        assert loaded.means == model.means and loaded.sds == model.sds
+        assert np.array_equal(loaded.sample_batch(5), model.sample_batch(5))
+
+    def test_wrong_model(self, tmp_path: Path):
+        NaiveQualSim([(30.0, 2.0)]).save(tmp_path / "naive.npz")
+
+        with pytest.raises(ValueError):
+            _ = MarkovQualModel.load(tmp_path / "naive.npz")
+
+
+class TestModelCache:
+    def test_learns_once(self, tmp_path: Path):
+        fastq = _write_fastq(tmp_path / "reads.fq", 50)
+        cache = ModelCache(tmp_path / "cache")
+        model, path = cache.get_or_learn(QualModelKind.MARKOV, [fastq])
+
+        # a cached model is loaded, not learned again
+        assert list((tmp_path / "cache").iterdir()) == [path]
+        path.touch()
+        mtime = path.stat().st_mtime_ns
+        cached, cached_path = cache.get_or_learn(QualModelKind.MARKOV, [fastq])
+        assert cached_path == path and path.stat().st_mtime_ns == mtime
+        assert isinstance(cached, MarkovQualModel) and isinstance(model, MarkovQualModel)
+        assert np.allclose(cached.transitions, model.transitions)
+
+    def test_key_depends_on_content_and_parameters(self, tmp_path: Path):
+        fastq = _write_fastq(tmp_path / "reads.fq", 20)
+        copy = _write_fastq(tmp_path / "copy.fq", 20)
+        other = _write_fastq(tmp_path / "other.fq", 20, seed=2)
+        cache = ModelCache(tmp_path)
+
+        assert fastq_digest([fastq]) == fastq_digest([copy]) != fastq_digest([other])
+        keys = {
+            cache.key(QualModelKind.MARKOV, [fastq]),
+            cache.key(QualModelKind.MARKOV, [other]),
+            cache.key(QualModelKind.MARKOV, [fastq], [0, 20, 94]),
+            cache.key(QualModelKind.NAIVE, [fastq]),
+        }
+        assert len(keys) == 4
+        assert cache.key(QualModelKind.MARKOV, [copy]) in keys
+
+    def test_build_cli(self, tmp_path: Path):
+        fastq = _write_fastq(tmp_path / "reads.fq", 20)
+        runner = CliRunner()
+        result = runner.invoke(
+            model_cli, ["build", "-k", "naive", "--cache-dir", str(tmp_path / "cache"), fastq]
+        )
+
+        assert result.exit_code == 0, result.output
+        model_path = result.output.strip()
+        assert Path(model_path).parent == tmp_path / "cache"
+
+        reads = runner.invoke(cli, ["-q", model_path, "-f", "qual", "ACGTACGTACGT", "3"])
+        assert reads.exit_code == 0, reads.output
+        assert len(reads.output.splitlines()) == 3
@@ -0,0 +1,124 @@
+from pathlib import Path
+
+import numpy as np
+import pysam
+
+from hts_synth.models.qual_model import (
+    MAX_PHRED,
+    BlockQualLearner,
+    NaiveQualLearner,
+    NaiveQualSim,
+)
+from hts_synth.utils.fastq_reader import read_fastq_blocks
+
+MODEL = [(30.0, 2.0)] * 50 + [(20.0, 8.0)] * 50
+
+
+class TestNaiveQualSim:
+    def test_sample_batch(self):
+        sim = NaiveQualSim(MODEL, np.random.default_rng(1))
+        quals = sim.sample_batch(2000)
+
+        assert quals.shape == (2000, 100)
+        assert quals.dtype == np.uint8
+        assert abs(quals[:, :50].mean() - 30) < 0.1
+        assert abs(quals[:, 50:].std() - 8) < 0.1
+
+    def test_clipped_to_phred_range(self):
+        sim = NaiveQualSim([(0.0, 50.0), (MAX_PHRED, 50.0)], np.random.default_rng(1))
+        quals = sim.sample_batch(1000)
+
+        assert quals.min() == 0
+        assert quals.max() == MAX_PHRED
+
+    def test_yield_n_streams_chunks(self):
+        sim = NaiveQualSim(MODEL, np.random.default_rng(2))
+        chunked = list(sim.yield_n(25, chunk_size=10))
+        sim.reseed(np.random.default_rng(2))
+        batches = list(sim.yield_batches(25, chunk_size=10))
+
+        assert [len(b) for b in batches] == [10, 10, 5]
+        assert chunked == np.concatenate(batches).tolist()
+
+    def test_quality_arrays_for_lengths(self):
+        sim = NaiveQualSim(MODEL, np.random.default_rng(3))
+        quals = sim.get_quality_arrays(np.array([0, 100, 120, 7]))
+
+        assert quals.shape == (227,)
+        assert quals.dtype == np.uint8
+
+
+def _write_fastq(path: Path, quals: list[list[int]]) -> str:
+    with open(path, "w") as fq:
+        for i, q in enumerate(quals):
+            _ = fq.write(f"@r{i}\n{'A' * len(q)}\n+\n{''.join(chr(x + 33) for x in q)}\n")
+    return str(path)
+
+
+class TestBlockQualLearner:
+    def test_matches_naive_learner(self):
+        quals = np.random.default_rng(4).integers(2, 41, size=(200, 40)).tolist()
+        naive = NaiveQualLearner(quals[0])
+        for q in quals[1:]:
+            naive.update(q)
+        learner = BlockQualLearner()
+        learner.update_block(np.array(quals))
+
+        assert learner.observations == naive.observations
+        assert np.allclose(learner.yield_model(), naive.yield_model())
+
+    def test_model_from_fastq(self, tmp_path: Path):
+        quals = np.random.default_rng(5).integers(2, 41, size=(50, 12))
+        path = _write_fastq(tmp_path / "reads.fq", quals.tolist())
+
+        with pysam.FastxFile(path) as fq:
+            model = NaiveQualLearner.model_from_fastq(fq)
+        expected = list(zip(quals.mean(axis=0), quals.std(axis=0, ddof=1)))
+        assert np.allclose(model, expected)
+
+    def test_variable_read_lengths(self, tmp_path: Path):
+        rng = np.random.default_rng(8)
+        quals = rng.integers(2, 41, size=(1000, 150)).tolist() + [[30] * 151]
+        path = _write_fastq(tmp_path / "ragged.fq", quals)
+
+        with pysam.FastxFile(path) as fq:
+            model = NaiveQualLearner.model_from_fastq(fq)
+        # the position seen in a single read is left out rather than failing the model
+        assert len(model) == 150
+        assert NaiveQualSim(model).sample_batch(3, 151).shape == (3, 151)
+
+    def test_variable_lengths_end_to_end(self, tmp_path: Path):
+        rng = np.random.default_rng(9)
+        quals = [rng.integers(2, 41, size=rng.integers(80, 151)).tolist() for _ in range(400)]
+        path = _write_fastq(tmp_path / "ragged.fq", quals)
+
+        blocks = list(read_fastq_blocks(path, block_reads=64))
+        assert sum(len(block) for block in blocks) == 400
+        model = BlockQualLearner.learn_fastq(path).yield_model()
+        with pysam.FastxFile(path) as fq:
+            assert np.allclose(NaiveQualLearner.model_from_fastq(fq), model)
+        assert 80 <= len(model) <= 150
+        # a single file is split into byte ranges across the workers
+        assert np.allclose(BlockQualLearner.model_from_fastqs([path], workers=3), model)
+
+    def test_merged_files_match_single_file(self, tmp_path: Path):
+        rng = np.random.default_rng(6)
+        quals = [rng.integers(2, 41, size=rng.integers(5, 15)).tolist() for _ in range(90)]
+        whole = _write_fastq(tmp_path / "whole.fq", quals)
+        parts = [
+            _write_fastq(tmp_path / f"part{i}.fq", quals[i * 30 : (i + 1) * 30]) for i in range(3)
+        ]
+
+        with pysam.FastxFile(whole) as fq:
+            expected = BlockQualLearner.learn_fastq(fq, block_size=16).yield_model()
+        assert np.allclose(BlockQualLearner.model_from_fastqs(parts), expected)
+        assert np.allclose(BlockQualLearner.model_from_fastqs(parts, workers=2), expected)
+
+    def test_histogram_quantiles(self):
+        quals = np.random.default_rng(7).integers(2, 41, size=(100, 8))
+        learner = BlockQualLearner(histogram=True)
+        learner.update_block(quals)
+
+        assert np.array_equal(
+            learner.stats.quantiles(0.5)[0], np.quantile(quals, 0.5, axis=0, method="lower")
+        )
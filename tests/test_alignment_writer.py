@@ -0,0 +1,83 @@
+from collections.abc import Callable
+from pathlib import Path
+
+import pysam
+import pytest
+from click.testing import CliRunner
+
+from hts_synth.hts_synth import cli
+from hts_synth.reads.read_generator import ReadGenerator
+from hts_synth.ref.reference import Reference
+from hts_synth.writers.alignment_writer import AlignmentFormat, AlignmentWriter
+
+
+class TestAlignmentWriter:
+    def test_header_from_fasta_index(self, reference_fasta: str):
+        header = Reference(reference_fasta).alignment_header()
+
+        assert header.references == ("chr1", "chr2")
+        assert header.lengths == (5000, 2000)
+
+    @pytest.mark.parametrize("extension", ["sam", "bam", "cram"])
+    def test_round_trip(
+        self,
+        reference_fasta: str,
+        tmp_path: Path,
+        extension: str,
+        read_generator: Callable[..., ReadGenerator],
+    ):
+        reference = Reference(reference_fasta)
+        generator = read_generator(5, reference.get_sequence("chr1", 100, 250))
+        batch = generator.generate_batch(20)
+        path = str(tmp_path / f"reads.{extension}")
+
+        with AlignmentWriter(
+            path, reference.alignment_header(), threads=2, reference_filename=reference_fasta
+        ) as writer:
+            assert writer.format is AlignmentFormat(extension)
+            writer.write_batch(batch)
+
+        with pysam.AlignmentFile(path, reference_filename=reference_fasta) as af:
+            reads = list(af.fetch(until_eof=True))
+        assert [read.query_sequence for read in reads] == [
+            batch.sequence(i) for i in range(len(batch))
+        ]
+        assert all(read.reference_name == "chr1" for read in reads)
+
+    def test_cram_requires_reference(self, tmp_path: Path):
+        header = pysam.AlignmentHeader.from_dict({"HD": {"VN": "1.6"}})
+        with pytest.raises(ValueError):
+            _ = AlignmentWriter(str(tmp_path / "reads.cram"), header)
+
+    def test_cli_sorted_bam(self, reference_fasta: str, tmp_path: Path):
+        path = tmp_path / "reads.bam"
+        result = CliRunner().invoke(
+            cli,
+            ["-f", "bam", "--sort", "-o", str(path), "-c", "chr2", "-s", "10", "-e", "160"]
+            + ["--seed", "2", reference_fasta, "30"],
+        )
+
+        assert result.exit_code == 0, result.output
+        with pysam.AlignmentFile(str(path)) as af:
+            assert af.header.to_dict()["HD"]["SO"] == "coordinate"
+            reads = list(af.fetch(until_eof=True))
+        assert len(reads) == 30
+        assert {read.reference_name for read in reads} == {"chr2"}
+        assert len({read.query_name for read in reads}) == 30
+        assert not list(tmp_path.glob("*.unsorted.bam"))
+
+    def test_cli_unplaced_sam(self, tmp_path: Path, reference_sequence: str):
+        path = tmp_path / "reads.sam"
+        result = CliRunner().invoke(cli, ["-f", "sam", "-o", str(path), reference_sequence, "5"])
+
+        assert result.exit_code == 0, result.output
+        with pysam.AlignmentFile(str(path), check_sq=False) as af:
+            assert [read.reference_id for read in af.fetch(until_eof=True)] == [-1] * 5
+
+    def test_cli_cram_requires_fasta(self, tmp_path: Path, reference_sequence: str):
+        result = CliRunner().invoke(
+            cli, ["-f", "cram", "-o", str(tmp_path / "reads.cram"), reference_sequence, "5"]
+        )
+
+        assert result.exit_code != 0
+        assert "FASTA" in result.output
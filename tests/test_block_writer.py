@@ -0,0 +1,66 @@
+import gzip
+import io
+from pathlib import Path
+
+import pysam
+import pytest
+from click.testing import CliRunner
+
+from hts_synth.hts_synth import cli
+from hts_synth.writers.block_writer import BGZF_EOF, BlockWriter, Compression
+
+DATA = [f"line {i} {'ACGT' * (i % 50)}\n".encode() for i in range(20000)]
+
+
+def _write(compression: Compression, threads: int = 1, chunk_size: int = 100_000) -> bytes:
+    sink = io.BytesIO()
+    with BlockWriter(sink, compression, threads=threads, chunk_size=chunk_size) as writer:
+        for line in DATA:
+            writer.write(line)
+        # the sink is not owned, so it outlives the writer
+        assert not sink.closed
+    return sink.getvalue()
+
+
+class TestBlockWriter:
+    def test_uncompressed(self):
+        assert _write(Compression.NONE) == b"".join(DATA)
+
+    @pytest.mark.parametrize("compression", [Compression.GZIP, Compression.BGZF])
+    @pytest.mark.parametrize("threads", [1, 4])
+    def test_round_trip(self, compression: Compression, threads: int):
+        assert gzip.decompress(_write(compression, threads)) == b"".join(DATA)
+
+    def test_output_independent_of_threads(self):
+        assert _write(Compression.BGZF, 1) == _write(Compression.BGZF, 4)
+
+    def test_bgzf_readable_by_htslib(self, tmp_path: Path):
+        path = tmp_path / "out.txt.bgz"
+        with BlockWriter.open(str(path)) as writer:
+            assert writer.compression is Compression.BGZF
+            for line in DATA:
+                writer.write(line)
+
+        assert path.read_bytes().endswith(BGZF_EOF)
+        with pysam.BGZFile(str(path), "rb", index=None) as bgzf:
+            assert bgzf.read() == b"".join(DATA)
+
+    def test_compression_from_path(self):
+        assert Compression.from_path("reads.fq") is Compression.NONE
+        assert Compression.from_path("reads.fq.gz") is Compression.GZIP
+        assert Compression.from_path("reads.fq.bgz") is Compression.BGZF
+
+    def test_invalid_level(self):
+        with pytest.raises(ValueError):
+            _ = BlockWriter(io.BytesIO(), Compression.GZIP, level=10)
+
+    def test_cli_compressed_output(self, tmp_path: Path, reference_sequence: str):
+        runner = CliRunner()
+        args = ["--seed", "3", reference_sequence, "50"]
+        plain = runner.invoke(cli, args)
+        path = tmp_path / "reads.fq.gz"
+        compressed = runner.invoke(cli, ["-o", str(path), "--compress-level", "1", *args])
+
+        assert compressed.exit_code == 0
+        assert compressed.output == ""
+        assert gzip.decompress(path.read_bytes()).decode() == plain.output
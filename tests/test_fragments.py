@@ -0,0 +1,182 @@
+from pathlib import Path
+
+import numpy as np
+import pysam
+import pytest
+from click.testing import CliRunner
+
+from hts_synth.hts_synth import cli
+from hts_synth.models.qual_model import NaiveQualSim
+from hts_synth.reads.fragments import FragmentSampler, InsertSizeDistribution
+from hts_synth.reads.read_generator import ErrorMode, QualityModel, ReadGenerator
+from hts_synth.ref.enums import VariantType
+from hts_synth.ref.generate_variant import VariantGenerator
+from hts_synth.ref.reference import Reference, ReferenceSegment
+from hts_synth.ref.seq_converter import apply_variant_sets_ragged
+from hts_synth.ref.utils import reverse_complement
+from hts_synth.utils.rng import RngContext
+from hts_synth.wrappers.sam_wrapper import SamFlag
+
+NO_ERRORS = dict.fromkeys(VariantType, 0.0)
+
+
+class TestFragmentSampler:
+    def test_starts_and_depth(self):
+        sampler = FragmentSampler(segment_length=1000, read_length=100)
+        n = sampler.reads_for_depth(50)
+        starts = sampler.sample_starts(np.random.default_rng(1), n)
+
+        assert n == 500
+        assert starts.min() >= 0 and starts.max() <= 900
+        depth = sampler.depth(starts)
+        assert depth.sum() == n * 100
+        # uniform starts: away from the ends, depth is n * read length / positions
+        assert abs(depth[100:900].mean() - n * 100 / sampler.n_positions) < 2
+
+    def test_windows_are_reference_slices(self):
+        segment = np.frombuffer(b"ACGTTGCAAGGCTTAGCATC", dtype=np.uint8)
+        sampler = FragmentSampler(len(segment), 5)
+        starts = np.array([0, 15, 7])
+
+        windows = sampler.windows(segment, starts)
+
+        assert [w.tobytes() for w in windows] == [b"ACGTT", b"GCATC", b"AAGGC"]
+
+    def test_invalid_read_length(self):
+        with pytest.raises(ValueError):
+            _ = FragmentSampler(10, 11)
+
+
+class TestWindowedReads:
+    def test_reads_match_reference_at_their_starts(self, reference_fasta: str):
+        segment = Reference(reference_fasta).get_sequence("chr1", 1000, 4000)
+        generator = ReadGenerator(
+            segment, QualityModel(), NO_ERRORS, rng=RngContext(3), read_length=150
+        )
+        batch = generator.generate_batch(200)
+
+        assert np.all(batch.lengths == 150)
+        assert np.all((batch.reference_starts >= 1000) & (batch.reference_starts <= 3850))
+        for i in range(len(batch)):
+            start = int(batch.reference_starts[i]) - 1000
+            assert batch.sequence(i) == segment.sequence[start : start + 150]
+
+    def test_windowed_variants_match_sliced_reference(self):
+        reference = "ACGTTGCAAGGCTTAGCATCAGGACTTAGCATTAGC"
+        starts = np.array([0, 11, 20, 4])
+        generator = VariantGenerator(reference, [1, 2, 3], np.random.default_rng(5))
+        variant_sets = generator.generate_variant_array_batch(
+            len(starts), window_starts=starts, window_length=12
+        )
+        sequences, lengths = apply_variant_sets_ragged(
+            reference, variant_sets, window_starts=starts
+        )
+
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        span = int(variant_sets.ref_spans[0])
+        for i, start in enumerate(starts):
+            expected, _ = apply_variant_sets_ragged(
+                reference[start : start + span], [variant_sets[i]]
+            )
+            assert np.array_equal(sequences[offsets[i] : offsets[i + 1]], expected)
+
+    def test_quality_errors_in_windows(self):
+        reference = "ACGT" * 100
+        generator = ReadGenerator(
+            reference,
+            NaiveQualSim([(10.0, 0.0)] * 50),
+            dict(zip(VariantType, [1.0, 1.0, 1.0])),
+            rng=RngContext(2),
+            error_mode=ErrorMode.QUALITY,
+            read_length=50,
+        )
+        batch = generator.generate_batch(100)
+
+        assert len(batch.qualities) == batch.lengths.sum()
+        assert abs(batch.lengths.mean() - 50) < 1
+
+
+class TestReadPairs:
+    @pytest.fixture
+    def segment(self, reference_fasta: str) -> ReferenceSegment:
+        return Reference(reference_fasta).get_sequence("chr1", 1000, 4000)
+
+    def test_mates_match_fragment_ends(self, segment: ReferenceSegment):
+        generator = ReadGenerator(
+            segment,
+            NaiveQualSim([(float(q), 0.0) for q in range(100)]),
+            NO_ERRORS,
+            rng=RngContext(4),
+            read_length=100,
+            insert_sizes=InsertSizeDistribution(350, 40),
+        )
+        batch = generator.generate_batch(50)
+
+        assert len(batch) == 100
+        assert batch.names[0::2] == batch.names[1::2]
+        first, second = SamFlag.FIRST_IN_PAIR, SamFlag.SECOND_IN_PAIR
+        assert np.all(batch.flags[0::2] & first) and np.all(batch.flags[1::2] & second)
+        assert np.all(batch.flags[1::2] & SamFlag.READ_REVERSE_STRAND)
+        assert np.array_equal(batch.next_reference_starts[0::2], batch.reference_starts[1::2])
+        assert np.array_equal(batch.next_reference_starts[1::2], batch.reference_starts[0::2])
+        assert np.array_equal(batch.template_lengths[0::2], -batch.template_lengths[1::2])
+        for i in range(0, len(batch), 2):
+            start = int(batch.reference_starts[i]) - 1000
+            end = start + int(batch.template_lengths[i])
+            assert 100 <= end - start <= 3000
+            assert batch.sequence(i) == segment.sequence[start : start + 100]
+            # R2 is stored on the forward strand, as in SAM
+            assert batch.sequence(i + 1) == segment.sequence[end - 100 : end]
+            # qualities of both mates run 5' to 3'
+            assert batch.quality_string(i) == batch.quality_string(i + 1)[::-1]
+
+        sequences, _ = batch.as_sequenced()
+        r2 = sequences[batch.offsets[1] : batch.offsets[2]].tobytes().decode()
+        assert r2 == reverse_complement(batch.sequence(1))
+
+    def test_insert_sizes_are_clipped(self):
+        sizes = InsertSizeDistribution(100, 500).sample(np.random.default_rng(1), 1000, 50, 300)
+
+        assert sizes.min() == 50 and sizes.max() == 300
+
+    def test_pairs_require_read_length(self):
+        with pytest.raises(ValueError):
+            _ = ReadGenerator("ACGT" * 100, QualityModel(), insert_sizes=InsertSizeDistribution(50))
+
+    def test_split_fastq_and_bam(self, reference_fasta: str, tmp_path: Path):
+        args = ["-c", "chr1", "-e", "5000", "-l", "100", "--insert-size", "300", "--seed", "1"]
+        runner = CliRunner()
+        r1, r2, bam = tmp_path / "r1.fq", tmp_path / "r2.fq", tmp_path / "pairs.bam"
+
+        result = runner.invoke(cli, [*args, "-o", str(r1), "-2", str(r2), reference_fasta, "20"])
+        assert result.exit_code == 0, result.output
+        result = runner.invoke(cli, [*args, "-f", "bam", "-o", str(bam), reference_fasta, "20"])
+        assert result.exit_code == 0, result.output
+
+        with pysam.FastxFile(str(r1)) as fq1, pysam.FastxFile(str(r2)) as fq2:
+            pairs = list(zip(fq1, fq2, strict=True))
+        with pysam.AlignmentFile(str(bam), check_sq=False) as reads:
+            records = list(reads)
+        assert len(pairs) == 20 and len(records) == 40
+        assert [(a.name, a.sequence, b.sequence) for a, b in pairs] == [
+            (r1.query_name, r1.get_forward_sequence(), r2.get_forward_sequence())
+            for r1, r2 in zip(records[0::2], records[1::2])
+        ]
+        assert all(r.is_read1 and r.template_length > 0 for r in records[0::2])
+        assert all(r.next_reference_id == 0 for r in records)
+
+    def test_single_reads_are_not_paired(self, reference_fasta: str, tmp_path: Path):
+        args = ["-c", "chr1", "-e", "5000", "-l", "100", "--seed", "1", "-f", "bam"]
+        for genome in ([], ["-g"]):
+            bam = tmp_path / "reads.bam"
+            result = CliRunner().invoke(
+                cli, [*args, *genome, "-o", str(bam), reference_fasta, "20"]
+            )
+            assert result.exit_code == 0, result.output
+
+            with pysam.AlignmentFile(str(bam)) as reads:
+                records = list(reads)
+            assert len(records) == 20
+            assert all(r.flag == 0 and not r.is_unmapped for r in records)
+            assert all(r.next_reference_id == -1 and r.next_reference_start == -1 for r in records)
+            assert all(r.template_length == 0 for r in records)
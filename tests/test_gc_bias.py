@@ -0,0 +1,124 @@
+from pathlib import Path
+
+import numpy as np
+import pysam
+import pytest
+from click.testing import CliRunner
+
+from hts_synth.hts_synth import cli
+from hts_synth.reads.fragments import InsertSizeDistribution
+from hts_synth.reads.gc_bias import GCBias
+from hts_synth.reads.genome_sampler import GenomeReadGenerator, GenomeWindows
+from hts_synth.reads.read_generator import QualityModel, ReadGenerator
+from hts_synth.ref.enums import VariantType
+from hts_synth.ref.gc_content import GCProfile
+from hts_synth.ref.reference import Reference
+from hts_synth.utils.rng import RngContext
+
+NO_ERRORS = dict.fromkeys(VariantType, 0.0)
+
+
+def _bases(rng: np.random.Generator, n: int, gc: float) -> str:
+    return "".join(rng.choice(list("ACGT"), n, p=[(1 - gc) / 2, gc / 2, gc / 2, (1 - gc) / 2]))
+
+
+@pytest.fixture
+def gc_fasta(tmp_path: Path) -> str:
+    rng = np.random.default_rng(4)
+    path = tmp_path / "gc.fa"
+    # chrA is balanced, chrB GC rich
+    _ = path.write_text(f">chrA\n{_bases(rng, 4000, 0.45)}\n>chrB\n{_bases(rng, 4000, 0.9)}\n")
+    _ = pysam.faidx(str(path))
+    return str(path)
+
+
+class TestGCProfile:
+    def test_fractions_match_counting(self):
+        rng = np.random.default_rng(1)
+        sequence = "".join(rng.choice(list("ACGTacgtN"), 500))
+        profile = GCProfile.from_bases(np.frombuffer(sequence.encode(), dtype=np.uint8), 1000)
+        starts = rng.integers(1000, 1500, 200)
+        ends = np.minimum(starts + rng.integers(0, 100, 200), 1500)
+
+        expected = [
+            sum(base in "GCgc" for base in sequence[s - 1000 : e - 1000])
+            for s, e in zip(starts, ends)
+        ]
+        assert profile.counts(starts, ends).tolist() == expected
+        assert np.allclose(
+            profile.fractions(starts, ends), np.array(expected) / np.maximum(ends - starts, 1)
+        )
+
+
+class TestGCBias:
+    def test_reads_follow_weights(self):
+        rng = np.random.default_rng(2)
+        # balanced first half, GC rich second half
+        segment = _bases(rng, 3000, 0.45) + _bases(rng, 3000, 0.9)
+        bias = GCBias(strength=5)
+        generator = ReadGenerator(
+            segment, QualityModel(), NO_ERRORS, rng=RngContext(3), read_length=100, gc_bias=bias
+        )
+        batch = generator.generate_batch(5000)
+        sequences = batch.sequences.reshape(5000, 100)
+
+        fractions = np.isin(sequences, np.frombuffer(b"GC", dtype=np.uint8)).mean(axis=1)
+        rich = np.count_nonzero(fractions > 0.7)
+        # GC rich reads are weighted about exp(-5 * 0.9 ** 2) = 0.017 of balanced ones
+        assert 0 < rich < 250
+        assert len(batch) == 5000
+
+    def test_pairs_are_placed(self):
+        generator = ReadGenerator(
+            _bases(np.random.default_rng(5), 2000, 0.5),
+            QualityModel(),
+            NO_ERRORS,
+            rng=RngContext(6),
+            read_length=50,
+            insert_sizes=InsertSizeDistribution(300, 30),
+            gc_bias=GCBias(strength=1),
+        )
+
+        assert len(generator.generate_batch(100)) == 200
+
+    def test_requires_read_length(self):
+        with pytest.raises(ValueError):
+            _ = ReadGenerator("ACGT", QualityModel(), gc_bias=GCBias(1))
+
+
+class TestGenomeGCBias:
+    def test_windows_are_weighted(self, gc_fasta: str):
+        reference = Reference(gc_fasta)
+        windows = GenomeWindows.from_lengths(
+            reference.fasta.references, reference.fasta.lengths, 100, window_size=1000
+        )
+        generator = GenomeReadGenerator(
+            reference,
+            windows,
+            QualityModel(),
+            NO_ERRORS,
+            rng=RngContext(7),
+            read_length=100,
+            gc_bias=GCBias(strength=3),
+        )
+
+        weights = generator.window_weights()
+        assert np.all(weights[windows.contig_ids == 0] > 0.9)
+        assert np.all(weights[windows.contig_ids == 1] < 0.2)
+        batches = generator.emit_batches(4000, shard_size=1000)
+        contig_ids = np.concatenate([batch.reference_ids for batch in batches])
+        # contigs get reads in proportion to their start positions times their weights
+        per_window = np.diff(windows.positions) * weights
+        expected = per_window[windows.contig_ids == 1].sum() / per_window.sum()
+        assert np.count_nonzero(contig_ids == 1) / 4000 == pytest.approx(expected, abs=0.02)
+
+    def test_cli(self, gc_fasta: str):
+        runner = CliRunner()
+        result = runner.invoke(
+            cli, ["-g", "-l", "50", "-f", "sam", "--gc-bias", "5", "--seed", "1", gc_fasta, "500"]
+        )
+
+        assert result.exit_code == 0
+        contigs = [line.split("\t")[2] for line in result.output.splitlines() if line[0] != "@"]
+        assert contigs.count("chrB") < 50
+        assert runner.invoke(cli, ["--gc-bias", "1", "ACGT"]).exit_code != 0
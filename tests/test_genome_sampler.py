@@ -0,0 +1,216 @@
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pysam
+import pytest
+from click.testing import CliRunner
+
+from hts_synth.hts_synth import cli
+from hts_synth.reads.fragments import InsertSizeDistribution
+from hts_synth.reads.genome_sampler import GenomeReadGenerator, GenomeWindows, read_bed
+from hts_synth.reads.read_batch import ReadBatch
+from hts_synth.reads.read_generator import QualityModel
+from hts_synth.ref.enums import VariantType
+from hts_synth.ref.reference import Reference
+from hts_synth.ref.region_index import ContigIntervals
+from hts_synth.utils.rng import RngContext
+
+NO_ERRORS = dict.fromkeys(VariantType, 0.0)
+
+
+class TestGenomeWindows:
+    def test_windows_tile_contigs(self):
+        windows = GenomeWindows.from_lengths(["a", "b", "c"], [1000, 250, 40], 50, window_size=300)
+
+        # 951 and 201 start positions, the 40 base contig is too short for any read
+        assert windows.contig_ids.tolist() == [0, 0, 0, 0, 1]
+        assert windows.starts.tolist() == [0, 300, 600, 900, 0]
+        assert windows.ends.tolist() == [349, 649, 949, 1000, 250]
+        assert windows.positions.tolist() == [0, 300, 600, 900, 951, 1152]
+        assert windows.total_length == 1250
+
+    def test_bed_regions_are_merged_and_clipped(self, tmp_path: Path):
+        bed = tmp_path / "targets.bed"
+        _ = bed.write_text(
+            "track name=targets\nb\t100\t200\tx\na\t500\t700\na\t0\t100\nb\t150\t400\na\t650\t800\n"
+        )
+        regions = read_bed(bed, ["a", "b"])
+        windows = GenomeWindows.from_lengths(["a", "b"], [1000, 300], 10, regions=regions)
+
+        assert windows.contig_ids.tolist() == [0, 0, 1]
+        assert windows.starts.tolist() == [0, 500, 100]
+        assert windows.ends.tolist() == [100, 800, 300]
+
+        _ = bed.write_text("c\t0\t10\n")
+        with pytest.raises(ValueError):
+            _ = read_bed(bed, ["a", "b"])
+
+    def test_reads_overlap_short_targets(self):
+        targets = ContigIntervals.from_intervals([0, 0, 1], [100, 2000, 50], [400, 2250, 120])
+        windows = GenomeWindows.from_lengths(
+            ["a", "b"], [3000, 5000], 500, window_size=200, targets=targets
+        )
+
+        # a read of 500 bases may start up to 499 bases before a target, within its contig
+        assert windows.contig_ids.tolist() == [0, 0, 0, 0, 0, 0, 1]
+        assert windows.starts.tolist() == [0, 200, 1501, 1701, 1901, 2101, 0]
+        assert windows.positions.tolist() == [0, 200, 400, 600, 800, 1000, 1149, 1269]
+        # depth is over the targets
+        assert windows.total_length == 300 + 250 + 70
+
+    def test_counts_follow_start_positions(self):
+        windows = GenomeWindows.from_lengths(["a", "b"], [30_099, 10_099], 100, window_size=4096)
+        counts = windows.sample_counts(np.random.default_rng(2), 400_000)
+
+        assert counts.sum() == 400_000
+        per_contig = np.bincount(windows.contig_ids, weights=counts)
+        assert per_contig[0] / 400_000 == pytest.approx(0.75, abs=0.005)
+        # windows get reads in proportion to their start positions
+        expected = np.diff(windows.positions) / windows.positions[-1] * 400_000
+        assert np.all(np.abs(counts - expected) < 5 * np.sqrt(expected))
+
+
+class TestGenomeReadGenerator:
+    def _generator(self, reference_fasta: str, insert_sizes: InsertSizeDistribution | None = None):
+        reference = Reference(reference_fasta)
+        windows = GenomeWindows.from_lengths(
+            reference.fasta.references, reference.fasta.lengths, 300, window_size=700
+        )
+        return GenomeReadGenerator(
+            reference,
+            windows,
+            QualityModel(),
+            NO_ERRORS,
+            RngContext(8),
+            read_length=100,
+            insert_sizes=insert_sizes,
+        )
+
+    def test_reads_match_their_contig(self, reference_fasta: str):
+        generator = self._generator(reference_fasta)
+        batches = list(generator.emit_batches(500, shard_size=120))
+        fasta = pysam.FastaFile(reference_fasta)
+
+        assert [len(batch) for batch in batches] == [120, 120, 120, 120, 20]
+        reads = [read for batch in batches for read in batch.to_aligned_segments()]
+        contigs = [read.reference_id for read in reads]
+        # generated window by window, in genome order
+        assert contigs == sorted(contigs)
+        assert 0.6 < contigs.count(0) / 500 < 0.8
+        for read in reads:
+            name = fasta.references[read.reference_id]
+            start = read.reference_start
+            assert read.query_sequence == fasta.fetch(name, start, start + 100)
+
+    def test_pairs_stay_within_contigs(self, reference_fasta: str):
+        generator = self._generator(reference_fasta, insert_sizes=InsertSizeDistribution(250, 20))
+        batch = next(generator.emit_batches(200, shard_size=1000))
+
+        assert len(batch) == 400
+        assert np.array_equal(batch.reference_ids, batch.next_reference_ids)
+        assert np.all(batch.template_lengths[::2] >= 100)
+        lengths = np.array(pysam.FastaFile(reference_fasta).lengths)
+        assert np.all(batch.reference_starts + 100 <= lengths[batch.reference_ids])
+
+    def test_successive_calls_continue_the_run(self, reference_fasta: str):
+        generator = self._generator(reference_fasta)
+        first = next(generator.emit_batches(100, shard_size=1000))
+        second = next(generator.emit_batches(100, shard_size=1000))
+
+        assert not np.array_equal(first.reference_starts, second.reference_starts)
+        assert len(set(first.names + second.names)) == 200
+
+    def test_pairs_overlap_short_targets(self, reference_fasta: str, tmp_path: Path):
+        reference = Reference(reference_fasta)
+        bed = tmp_path / "targets.bed"
+        _ = bed.write_text("chr1\t1000\t1300\nchr1\t3000\t3250\nchr2\t500\t800\n")
+        targets = read_bed(bed, reference.fasta.references)
+        insert_sizes = InsertSizeDistribution(300, 50)
+        span = GenomeReadGenerator.span_for(100, insert_sizes)
+        windows = GenomeWindows.from_lengths(
+            reference.fasta.references, reference.fasta.lengths, span, targets=targets
+        )
+        generator = GenomeReadGenerator(
+            reference,
+            windows,
+            QualityModel(),
+            NO_ERRORS,
+            RngContext(3),
+            read_length=100,
+            insert_sizes=insert_sizes,
+        )
+        batch = ReadBatch.concatenate(list(generator.emit_batches(2000, shard_size=300)))
+
+        starts = batch.reference_starts[0::2]
+        ends = starts + batch.template_lengths[0::2]
+        contigs = batch.reference_ids[0::2]
+        assert np.all(targets.overlaps(contigs, starts, ends))
+        # fragments reach into targets from either side
+        assert np.any(starts < 1000) and np.any(ends > 1300)
+        assert 0.4 < np.count_nonzero(contigs == 0) / 2000 < 0.8
+
+    def test_split_windows_are_fetched_once(
+        self, reference_fasta: str, monkeypatch: pytest.MonkeyPatch
+    ):
+        generator = self._generator(reference_fasta)
+        fetched: list[tuple[str, int, int]] = []
+        get_sequence = generator.reference.get_sequence
+
+        def counting_get_sequence(chrom: str, start: int, end: int):
+            fetched.append((chrom, start, end))
+            return get_sequence(chrom, start, end)
+
+        monkeypatch.setattr(generator.reference, "get_sequence", counting_get_sequence)
+        batches = list(generator.emit_batches(500, shard_size=7))
+
+        assert sum(len(batch) for batch in batches) == 500
+        # windows hold many shards each, but are fetched in genome order once each
+        assert len(fetched) == len(set(fetched)) <= len(generator.windows)
+        assert pickle.loads(pickle.dumps(generator))._window_generator is None
+
+    def test_reference_pickles(self, reference_fasta: str):
+        reference = pickle.loads(pickle.dumps(Reference(reference_fasta, cache_blocks=2)))
+
+        assert reference.cache is not None and reference.cache.max_blocks == 2
+        assert reference.fetch("chr2", 0, 10) == Reference(reference_fasta).fetch("chr2", 0, 10)
+
+    def test_cli_targets_shorter_than_fragments(self, reference_fasta: str, tmp_path: Path):
+        bed = tmp_path / "exome.bed"
+        _ = bed.write_text("chr1\t1000\t1300\nchr1\t3000\t3400\nchr2\t500\t750\n")
+        runner = CliRunner()
+        args = ["--targets", str(bed), "-l", "100", "-f", "sam", "--seed", "2"]
+
+        output = str(tmp_path / "pairs.sam")
+        result = runner.invoke(
+            cli,
+            [*args, "--insert-size", "300", "--insert-sd", "50", "-o", output, reference_fasta],
+        )
+        assert result.exit_code == 0, result.output
+        assert sum(1 for _ in pysam.AlignmentFile(output)) > 0
+
+        # fragments of up to 3000 bases do not fit the 2000 bases of chr2
+        result = runner.invoke(
+            cli,
+            [*args, "--insert-size", "2000", "--insert-sd", "250", "-o", output, reference_fasta],
+        )
+        assert result.exit_code == 0, result.output
+        assert "Skipping 1 of 3 targets" in result.stderr
+
+        result = runner.invoke(cli, [*args, "--insert-size", "6000", "-o", output, reference_fasta])
+        assert result.exit_code == 2
+        assert "No room for a read" in result.output
+
+    def test_cli_genome(self, reference_fasta: str, tmp_path: Path):
+        runner = CliRunner()
+        args = ["--seed", "4", "-l", "100", "-d", "2", "-f", "sam", "-o"]
+        serial = runner.invoke(cli, ["-g", *args, str(tmp_path / "a.sam"), reference_fasta])
+        parallel = runner.invoke(
+            cli, ["-g", "-t", "2", *args, str(tmp_path / "b.sam"), reference_fasta]
+        )
+
+        assert serial.exit_code == 0 and parallel.exit_code == 0
+        assert (tmp_path / "a.sam").read_text() == (tmp_path / "b.sam").read_text()
+        contigs = {read.reference_name for read in pysam.AlignmentFile(str(tmp_path / "a.sam"))}
+        assert contigs == {"chr1", "chr2"}
+        assert runner.invoke(cli, ["-g", reference_fasta]).exit_code != 0
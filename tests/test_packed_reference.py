@@ -0,0 +1,95 @@
+import os
+import pickle
+import random
+from pathlib import Path
+
+import numpy as np
+import pysam
+import pytest
+
+from hts_synth.ref.enums import ReferenceBackend
+from hts_synth.ref.packed_reference import PackedReference
+from hts_synth.ref.reference import Reference
+
+
+@pytest.fixture
+def masked_fasta(tmp_path: Path) -> str:
+    rand = random.Random(3)
+    contigs = {
+        # soft masked bases, N runs across build chunks and IUPAC codes
+        "chrA": "".join(rand.choice("ACGTacgt") for _ in range(1003))
+        + "N" * 45
+        + "".join(rand.choice("ACGTRYn") for _ in range(250)),
+        "chrB": "N" * 7 + "".join(rand.choice("ACGT") for _ in range(66)) + "NN",
+    }
+    path = tmp_path / "masked.fa"
+    with open(path, "w") as fa:
+        for name, seq in contigs.items():
+            _ = fa.write(f">{name}\n")
+            fa.writelines(seq[i : i + 50] + "\n" for i in range(0, len(seq), 50))
+    _ = pysam.faidx(str(path))
+    return str(path)
+
+
+def _expected(sequence: str) -> str:
+    return "".join(base if base in "ACGT" else "N" for base in sequence.upper())
+
+
+class TestPackedReference:
+    def test_fetch_matches_faidx(self, masked_fasta: str):
+        packed = PackedReference.build(masked_fasta, chunk_size=64)
+        fasta = pysam.FastaFile(masked_fasta)
+
+        assert packed.references == tuple(fasta.references)
+        assert packed.lengths == tuple(fasta.lengths)
+        rng = np.random.default_rng(5)
+        for chrom, length in zip(fasta.references, fasta.lengths):
+            assert packed.fetch(chrom) == _expected(fasta.fetch(chrom))
+            for start, end in np.sort(rng.integers(0, length + 1, size=(50, 2))).tolist():
+                assert packed.fetch(chrom, start, end) == _expected(fasta.fetch(chrom, start, end))
+
+    def test_coordinates_are_clipped(self, reference_fasta: str, tmp_path: Path):
+        packed = PackedReference.build(reference_fasta, tmp_path / "reference.packed")
+
+        assert packed.fetch("chr2", 1990, 2100) == pysam.FastaFile(reference_fasta).fetch(
+            "chr2", 1990, 2000
+        )
+        assert packed.fetch("chr2", 2500, 2600) == ""
+        assert len(packed.packed("chr1", 5, 13)) == 3
+        with pytest.raises(KeyError):
+            _ = packed.fetch("chr3", 0, 10)
+
+    def test_pickle_reopens_file(self, masked_fasta: str):
+        packed = PackedReference.build(masked_fasta)
+        copy = pickle.loads(pickle.dumps(packed))
+
+        assert copy.path == packed.path
+        assert copy.fetch("chrA", 1000, 1100) == packed.fetch("chrA", 1000, 1100)
+
+    def test_open_or_build(self, masked_fasta: str):
+        path = PackedReference.default_path(masked_fasta)
+        assert PackedReference.open_or_build(masked_fasta).path == path
+
+        # an invalid or stale file is rebuilt
+        _ = path.write_bytes(b"not packed")
+        with pytest.raises(ValueError):
+            _ = PackedReference(path)
+        assert PackedReference.open_or_build(masked_fasta).fetch("chrB", 0, 9) == "NNNNNNN" + (
+            pysam.FastaFile(masked_fasta).fetch("chrB", 7, 9)
+        )
+        stale = os.stat(masked_fasta).st_mtime - 10
+        os.utime(path, (stale, stale))
+        _ = PackedReference.open_or_build(masked_fasta)
+        assert path.stat().st_mtime >= os.stat(masked_fasta).st_mtime
+
+    def test_reference_backend(self, reference_fasta: str):
+        faidx = Reference(reference_fasta)
+        packed = Reference(reference_fasta, ReferenceBackend.PACKED)
+
+        assert packed.packed is not None
+        assert packed.get_sequence("chr1", 100, 400).sequence == (
+            faidx.get_sequence("chr1", 100, 400).sequence
+        )
+        assert np.array_equal(
+            packed.fetch_array("chr2", 0, 2000), faidx.fetch_array("chr2", 0, 2000)
+        )
@@ -0,0 +1,46 @@
+from collections.abc import Callable
+
+from click.testing import CliRunner
+
+from hts_synth.hts_synth import cli
+from hts_synth.reads.read_generator import ReadGenerator
+
+
+def _sequences(generator: ReadGenerator, workers: int, shard_size: int = 7):
+    return [
+        read.query_sequence
+        for read in generator.emit_reads(40, workers=workers, shard_size=shard_size)
+    ]
+
+
+class TestParallelGeneration:
+    def test_output_independent_of_workers(self, read_generator: Callable[..., ReadGenerator]):
+        serial = _sequences(read_generator(99), 1)
+
+        assert len(serial) == 40
+        assert _sequences(read_generator(99), 2) == serial
+        assert _sequences(read_generator(99), 3) == serial
+
+    def test_output_depends_on_shard_seed(self, read_generator: Callable[..., ReadGenerator]):
+        assert len(set(_sequences(read_generator(99), 1))) > 1
+
+    def test_successive_calls_continue_the_run(self, read_generator: Callable[..., ReadGenerator]):
+        generator = read_generator(99)
+        first = list(generator.emit_reads(21, shard_size=7))
+        second = list(generator.emit_reads(19, workers=2, shard_size=7))
+
+        # whole shards continue the same run as a single call
+        serial = _sequences(read_generator(99), 1)
+        assert [read.query_sequence for read in first] == serial[:21]
+        assert [read.query_sequence for read in first] != [read.query_sequence for read in second]
+        assert [read.query_sequence for read in second][:14] == serial[21:35]
+        assert len({read.query_name for read in first + second}) == 40
+
+    def test_cli_workers(self, reference_sequence: str):
+        runner = CliRunner()
+        args = ["--seed", "1", "-f", "seq", reference_sequence, "25"]
+        serial = runner.invoke(cli, args)
+        parallel = runner.invoke(cli, ["--workers", "3", *args])
+
+        assert parallel.exit_code == 0
+        assert parallel.output == serial.output
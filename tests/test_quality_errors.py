@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from hts_synth.models.qual_model import PHRED_ERROR_PROBABILITIES, NaiveQualSim
+from hts_synth.reads.read_generator import ErrorMode, QualityModel, ReadGenerator
+from hts_synth.ref.enums import VariantType
+from hts_synth.ref.generate_variant import VariantGenerator
+from hts_synth.utils.rng import RngContext
+
+REFERENCE = "ACGT" * 25
+
+
+def _generator(model: NaiveQualSim, weights: list[float]) -> ReadGenerator:
+    return ReadGenerator(
+        REFERENCE,
+        model,
+        dict(zip(VariantType, weights)),
+        rng=RngContext(7),
+        error_mode=ErrorMode.QUALITY,
+    )
+
+
+class TestQualityErrors:
+    def test_lookup_table(self):
+        assert PHRED_ERROR_PROBABILITIES[0] == 1
+        assert np.isclose(PHRED_ERROR_PROBABILITIES[20], 0.01)
+        assert np.isclose(PHRED_ERROR_PROBABILITIES[30], 0.001)
+
+    def test_error_rate_follows_quality(self):
+        generator = _generator(NaiveQualSim([(10.0, 0.0)] * 100), [0.0, 0.0, 1.0])
+        batch = generator.generate_batch(2000)
+
+        # substitutions only: reads keep their length and differ where errors fell
+        assert np.all(batch.lengths == len(REFERENCE))
+        reference = np.frombuffer(REFERENCE.encode(), dtype=np.uint8)
+        mismatches = (batch.sequences.reshape(2000, -1) != reference).mean()
+        assert abs(mismatches - 0.1) < 0.005
+
+    def test_errors_fall_on_low_quality_bases(self):
+        model = NaiveQualSim([(40.0, 0.0)] * 50 + [(3.0, 0.0)] * 50)
+        batch = _generator(model, [0.0, 0.0, 1.0]).generate_batch(500)
+
+        reference = np.frombuffer(REFERENCE.encode(), dtype=np.uint8)
+        mismatches = batch.sequences.reshape(500, -1) != reference
+        assert mismatches[:, :50].mean() < 0.001
+        assert mismatches[:, 50:].mean() > 0.4
+
+    def test_indel_qualities_stay_aligned(self):
+        model = NaiveQualSim([(40.0, 0.0)] * 50 + [(3.0, 0.0)] * 50)
+        batch = _generator(model, [1.0, 1.0, 0.0]).generate_batch(300)
+
+        assert len(batch.qualities) == len(batch.sequences) == batch.lengths.sum()
+        assert not np.all(batch.lengths == len(REFERENCE))
+        # the first 50 bases are error free, so every read starts with 50 bases of quality 40
+        for read in range(len(batch)):
+            quals = batch.qualities[batch.offsets[read] : batch.offsets[read + 1]]
+            assert np.all(quals[:50] == 40) and np.all(quals[50:] == 3)
+
+    def test_error_batch_events(self):
+        probabilities = np.full((4, len(REFERENCE)), 0.5)
+        variants = VariantGenerator(REFERENCE, []).generate_error_batch(
+            probabilities, [1.0, 1.0, 1.0], np.random.default_rng(1)
+        )
+
+        assert np.all(variants.ref_spans == len(REFERENCE))
+        for read in variants:
+            assert np.all(np.diff(read.pos) > 0)
+
+    def test_requires_simulating_model(self):
+        with pytest.raises(ValueError):
+            _ = ReadGenerator(REFERENCE, QualityModel(), error_mode=ErrorMode.QUALITY)
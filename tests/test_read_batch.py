@@ -0,0 +1,117 @@
+import dataclasses
+from collections.abc import Callable
+
+import numpy as np
+import pysam
+import pytest
+
+from hts_synth.reads.fragments import InsertSizeDistribution
+from hts_synth.reads.read_batch import ReadBatch
+from hts_synth.reads.read_generator import ReadGenerator
+from hts_synth.ref.enums import VariantType
+from hts_synth.ref.reference import ReferenceSegment
+from hts_synth.wrappers.sam_wrapper import SamFlag
+
+
+@pytest.fixture
+def make_batch(
+    reference_sequence: str, read_generator: Callable[..., ReadGenerator]
+) -> Callable[..., ReadBatch]:
+    segment = ReferenceSegment("chr1", 100, 100 + len(reference_sequence), reference_sequence)
+
+    def make(amount: int = 12) -> ReadBatch:
+        batch = read_generator(4, segment).generate_batch(amount)
+        batch.names = [f"read{i}" for i in range(amount)]
+        return batch
+
+    return make
+
+
+class TestReadBatch:
+    def test_fastq_matches_aligned_segments(self, make_batch: Callable[..., ReadBatch]):
+        batch = make_batch()
+        expected = "".join(
+            f"@{read.query_name}\n{read.query_sequence}\n+\n{read.query_qualities_str}\n"
+            for read in batch.to_aligned_segments()
+        )
+
+        assert batch.to_fastq().decode("ascii") == expected
+
+    def test_sequence_and_quality_lines(self, make_batch: Callable[..., ReadBatch]):
+        batch = make_batch()
+
+        assert batch.to_sequence_lines().decode("ascii").splitlines() == [
+            batch.sequence(i) for i in range(len(batch))
+        ]
+        assert batch.to_quality_lines().decode("ascii").splitlines() == [
+            batch.quality_string(i) for i in range(len(batch))
+        ]
+
+    def test_sam_records(self, make_batch: Callable[..., ReadBatch]):
+        batch = make_batch()
+        header = pysam.AlignmentHeader.from_references(["chr1"], [1000])
+        lines = batch.to_sam(["chr1"]).decode("ascii").splitlines()
+
+        assert len(lines) == len(batch)
+        for line, expected in zip(lines, batch.to_aligned_segments()):
+            read = pysam.AlignedSegment.fromstring(line, header)
+            assert read.query_name == expected.query_name
+            assert read.query_sequence == expected.query_sequence
+            assert read.reference_start == 100
+            assert line.split("\t")[1] == str(expected.flag)
+
+    def test_concatenate(self, make_batch: Callable[..., ReadBatch]):
+        first, second = make_batch(3), make_batch(5)
+        joined = ReadBatch.concatenate([first, second])
+
+        assert len(joined) == 8
+        assert joined.sequence(4) == second.sequence(1)
+        assert joined.to_fastq() == first.to_fastq() + second.to_fastq()
+
+    def test_reads_without_bases_are_unmapped(
+        self, reference_sequence: str, read_generator: Callable[..., ReadGenerator]
+    ):
+        segment = ReferenceSegment("chr1", 100, 100 + len(reference_sequence), reference_sequence)
+        deletions = dict(zip(VariantType, [0.0, 1.0, 0.0]))
+        batch = read_generator(2, segment, error_probabilities=deletions).generate_batch(3)
+        header = pysam.AlignmentHeader.from_references(["chr1"], [1000])
+
+        assert np.all(batch.lengths == 0)
+        assert np.all(batch.flags == SamFlag.READ_UNMAPPED)
+        for line in batch.to_sam(["chr1"]).decode("ascii").splitlines():
+            fields = line.split("\t")
+            # no CIGAR, sequence, qualities or alignment tags
+            assert (fields[5], fields[9], fields[10]) == ("*", "*", "*")
+            assert len(fields) == 11
+            assert pysam.AlignedSegment.fromstring(line, header).is_unmapped
+
+    def test_mate_of_read_without_bases(
+        self, reference_sequence: str, read_generator: Callable[..., ReadGenerator]
+    ):
+        segment = ReferenceSegment("chr1", 100, 100 + len(reference_sequence), reference_sequence)
+        pairs = read_generator(
+            3, segment, read_length=10, insert_sizes=InsertSizeDistribution(30)
+        ).generate_batch(1)
+        # R1 left without bases
+        lengths = pairs.lengths
+        lengths[0] = 0
+        batch = dataclasses.replace(
+            pairs,
+            sequences=pairs.sequences[pairs.offsets[1] :],
+            qualities=pairs.qualities[pairs.offsets[1] :],
+            offsets=np.concatenate(([0], np.cumsum(lengths))),
+        )
+        batch.unmap_empty_reads(pairs=True)
+
+        first, second = batch.flags.tolist()
+        assert first & SamFlag.READ_UNMAPPED and second & SamFlag.MATE_UNMAPPED
+        assert not (first | second) & SamFlag.READ_MAPPED_IN_PROPER_PAIR
+        assert not second & SamFlag.READ_UNMAPPED
+        # the unmapped read is placed at its mate
+        assert batch.reference_starts[0] == batch.reference_starts[1]
+        assert batch.next_reference_starts.tolist() == batch.reference_starts.tolist()
+        assert batch.template_lengths.tolist() == [0, 0]
+        header = pysam.AlignmentHeader.from_references(["chr1"], [1000])
+        lines = batch.to_sam(["chr1"]).decode("ascii").splitlines()
+        assert lines[0].split("\t")[9] == "*"
+        assert pysam.AlignedSegment.fromstring(lines[1], header).cigarstring == "10M"
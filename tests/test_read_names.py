@@ -0,0 +1,48 @@
+from collections.abc import Callable
+
+import numpy as np
+
+from hts_synth.reads.read_generator import ReadGenerator
+from hts_synth.reads.read_names import ReadNamer
+from hts_synth.ref.reference import Reference
+
+
+class TestReadNamer:
+    def test_counter_names(self):
+        assert ReadNamer().names(3, 3) == ["read.3", "read.4", "read.5"]
+        assert ReadNamer("sim").names(0, 1) == ["sim.0"]
+
+    def test_truth_names(self):
+        names = ReadNamer(truth=True).names(
+            7, 2, "chr2", np.array([0, 41]), np.array([False, True]), np.array([2, 0])
+        )
+
+        assert names == ["read.7:chr2:0:+:2", "read.8:chr2:41:-:0"]
+
+    def test_truth_names_unplaced(self):
+        assert ReadNamer(truth=True).names(0, 1) == ["read.0:*:-1:+:0"]
+
+    def test_generated_names_unique_across_shards(
+        self, read_generator: Callable[..., ReadGenerator]
+    ):
+        generator = read_generator(4)
+        names = [read.query_name for read in generator.emit_reads(25, shard_size=10)]
+
+        assert names == [f"read.{i}" for i in range(25)]
+
+    def test_generated_truth(
+        self, reference_fasta: str, read_generator: Callable[..., ReadGenerator]
+    ):
+        generator = read_generator(
+            4,
+            Reference(reference_fasta).get_sequence("chr1", 200, 300),
+            error_probabilities=dict.fromkeys(ReadGenerator.error_probabilities, 0.05),
+            read_namer=ReadNamer("t", truth=True),
+        )
+        batch = generator.generate_batch(3, first_read=100)
+
+        # 5 insertions, 5 deletions and 5 substitutions, some substitutions may be no-ops
+        for i, name in enumerate(batch.names):
+            prefix, contig, start, strand, events = name.split(":")
+            assert (prefix, contig, start, strand) == (f"t.{100 + i}", "chr1", "200", "+")
+            assert 10 <= int(events) <= 15
@@ -0,0 +1,28 @@
+import numpy as np
+from faker import Faker
+
+from hts_synth.ref.reference import Reference
+from hts_synth.utils.rng import RngContext
+
+
+class TestMutatedSequences:
+    def test_reference_batch(self, reference_fasta: str):
+        reference = Reference(reference_fasta)
+        batch = reference.get_mutated_sequences(
+            "chr1", 100, 400, [2, 2, 5], 20, np.random.default_rng(1)
+        )
+
+        assert len(batch) == 20
+        assert batch.sequences.shape == (20, 300)
+        assert np.all(batch.lengths == 300)
+        assert len(batch.variants) == 20
+        assert batch.sequence(0) != reference.get_sequence("chr1", 100, 400).sequence
+
+    def test_provider_batch(self, faker: Faker):
+        batch = faker.mutated_sequences(
+            sequence="ACTTGGAAGTTCGATCGG", events=[2, 1, 0], n=30, rng=RngContext(2)
+        )
+
+        assert batch.sequences.shape == (30, 19)
+        assert np.all(batch.lengths == 19)
+        assert all(len(batch.sequence(i)) == 19 for i in range(30))
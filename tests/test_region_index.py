@@ -0,0 +1,192 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+import pysam
+import pytest
+from click.testing import CliRunner
+
+from hts_synth.hts_synth import cli
+from hts_synth.reads.fragments import InsertSizeDistribution
+from hts_synth.reads.genome_sampler import GenomeReadGenerator, GenomeWindows
+from hts_synth.reads.read_batch import ReadBatch
+from hts_synth.reads.read_generator import QualityModel
+from hts_synth.ref.enums import VariantType
+from hts_synth.ref.reference import Reference
+from hts_synth.ref.region_index import ContigIntervals, RegionIndex
+from hts_synth.utils.rng import RngContext
+
+LENGTHS = [200, 150]
+
+
+def _masks(intervals: ContigIntervals) -> list[npt.NDArray[np.bool_]]:
+    masks = [np.zeros(length, dtype=np.bool_) for length in LENGTHS]
+    for contig_id, start, end in zip(intervals.contig_ids, intervals.starts, intervals.ends):
+        masks[contig_id][start:end] = True
+    return masks
+
+
+def _random_intervals(rng: np.random.Generator) -> ContigIntervals:
+    n = int(rng.integers(0, 10))
+    contig_ids = rng.integers(0, 2, n)
+    starts = rng.integers(0, 140, n)
+    return ContigIntervals.from_intervals(contig_ids, starts, starts + rng.integers(0, 30, n))
+
+
+@pytest.fixture
+def gapped_fasta(tmp_path: Path) -> str:
+    rng = np.random.default_rng(6)
+    pieces = {
+        "chrA": ["N" * 40, "AAAAAAAAAAAA", "ACACACACACAC", "NNNNnnRYN", "CCCCCcccc"],
+        "chrB": ["GGGGGGGGG", "NN", "TATATATATA"],
+    }
+    path = tmp_path / "gapped.fa"
+    with open(path, "w") as fa:
+        for name, runs in pieces.items():
+            # random bases around each run
+            random = ["".join(rng.choice(list("ACGT"), 60)) for _ in range(len(runs) + 1)]
+            sequence = random[0] + "".join(run + bases for run, bases in zip(runs, random[1:]))
+            _ = fa.write(f">{name}\n{sequence}\n")
+    _ = pysam.faidx(str(path))
+    return str(path)
+
+
+def _brute_force(sequence: str, min_length: int, max_period: int):
+    sequence = sequence.upper()
+    gaps = np.array([base not in "ACGT" for base in sequence])
+    low_complexity = np.zeros(len(sequence), dtype=np.bool_)
+    for period in range(1, max_period + 1):
+        for start in range(len(sequence)):
+            end = start + period
+            while end < len(sequence) and sequence[end] == sequence[end - period] != "N":
+                end += 1
+            if end - start >= min_length and not gaps[start:end].any():
+                low_complexity[start:end] = True
+    return gaps, low_complexity
+
+
+class TestContigIntervals:
+    def test_set_operations_match_masks(self):
+        rng = np.random.default_rng(3)
+        for _ in range(100):
+            a, b = _random_intervals(rng), _random_intervals(rng)
+            mask_a, mask_b = _masks(a), _masks(b)
+            for result, expected in (
+                (a.union(b), [x | y for x, y in zip(mask_a, mask_b)]),
+                (a.intersect(b), [x & y for x, y in zip(mask_a, mask_b)]),
+                (a.subtract(b), [x & ~y for x, y in zip(mask_a, mask_b)]),
+                (a.complement(LENGTHS), [~x for x in mask_a]),
+            ):
+                assert all(np.array_equal(r, e) for r, e in zip(_masks(result), expected))
+                # sorted and disjoint, touching intervals merged
+                same_contig = result.contig_ids[1:] == result.contig_ids[:-1]
+                assert np.all((result.starts[1:] > result.ends[:-1])[same_contig])
+
+    def test_overlaps(self):
+        intervals = ContigIntervals.from_intervals([1, 0, 0], [50, 10, 15], [60, 20, 30])
+
+        assert intervals.starts.tolist() == [10, 50]
+        assert intervals.overlaps(
+            [0, 0, 0, 1, 1, 1], [0, 29, 30, 0, 55, 60], [10, 31, 40, 50, 56, 70]
+        ).tolist() == [False, True, False, False, True, False]
+        assert ContigIntervals.empty().overlaps([0], [0], [10]).tolist() == [False]
+
+    def test_pad_is_clipped(self):
+        padded = ContigIntervals.from_intervals([0, 1], [5, 140], [10, 145]).pad(10, 10, LENGTHS)
+
+        assert list(zip(padded.starts.tolist(), padded.ends.tolist())) == [(0, 20), (130, 150)]
+
+
+class TestRegionIndex:
+    @pytest.mark.parametrize("chunk_size", [8, 33, 1 << 20])
+    def test_build_matches_brute_force(self, gapped_fasta: str, chunk_size: int):
+        index = RegionIndex.build(gapped_fasta, min_length=8, chunk_size=chunk_size)
+        fasta = pysam.FastaFile(gapped_fasta)
+
+        for contig_id, name in enumerate(fasta.references):
+            gaps, low_complexity = _brute_force(fasta.fetch(name), 8, 2)
+            found_gaps = index.gaps.contig_ids == contig_id
+            found_repeats = index.low_complexity.contig_ids == contig_id
+            assert np.flatnonzero(gaps).tolist() == [
+                i
+                for s, e in zip(index.gaps.starts[found_gaps], index.gaps.ends[found_gaps])
+                for i in range(s, e)
+            ]
+            assert np.flatnonzero(low_complexity).tolist() == [
+                i
+                for s, e in zip(
+                    index.low_complexity.starts[found_repeats],
+                    index.low_complexity.ends[found_repeats],
+                )
+                for i in range(s, e)
+            ]
+
+    def test_cached_next_to_fasta(self, gapped_fasta: str):
+        index = RegionIndex.open_or_build(gapped_fasta)
+        path = RegionIndex.default_path(gapped_fasta)
+
+        assert path.exists()
+        loaded = RegionIndex.load(path)
+        assert loaded.contigs == index.contigs
+        assert np.array_equal(loaded.gaps.ends, index.gaps.ends)
+        # other parameters, or a newer FASTA, rebuild the index
+        assert RegionIndex.open_or_build(gapped_fasta, min_length=12).min_length == 12
+        stale = os.stat(gapped_fasta).st_mtime - 10
+        os.utime(path, (stale, stale))
+        assert RegionIndex.open_or_build(gapped_fasta).min_length == 10
+
+    def test_windows_avoid_gaps_or_target_low_complexity(self, gapped_fasta: str):
+        index = RegionIndex.build(gapped_fasta)
+        lengths = list(index.lengths)
+
+        windows = GenomeWindows.from_lengths(index.contigs, lengths, 20, index.usable())
+        counts = windows.sample_counts(np.random.default_rng(0), 1000)
+        assert counts.sum() == 1000
+        # every start of every window keeps its read clear of gaps
+        starts = np.concatenate(
+            [np.arange(s, e - 19) for s, e in zip(windows.starts, windows.ends)]
+        )
+        contigs = np.repeat(windows.contig_ids, np.diff(windows.positions))
+        assert not index.gaps.overlaps(contigs, starts, starts + 20).any()
+
+        windows = GenomeWindows.from_lengths(
+            index.contigs, lengths, 20, index.usable(), targets=index.low_complexity
+        )
+        starts = np.concatenate(
+            [np.arange(s, e - 19) for s, e in zip(windows.starts, windows.ends)]
+        )
+        contigs = np.repeat(windows.contig_ids, np.diff(windows.positions))
+        assert index.low_complexity.overlaps(contigs, starts, starts + 20).all()
+        assert not index.gaps.overlaps(contigs, starts, starts + 20).any()
+
+        # each fragment of a pair overlaps a run at its drawn length, not just at the span
+        insert_sizes = InsertSizeDistribution(60, 10)
+        span = GenomeReadGenerator.span_for(20, insert_sizes)
+        windows = GenomeWindows.from_lengths(
+            index.contigs, lengths, span, index.usable(), targets=index.low_complexity
+        )
+        generator = GenomeReadGenerator(
+            Reference(gapped_fasta),
+            windows,
+            QualityModel(),
+            dict.fromkeys(VariantType, 0.0),
+            RngContext(5),
+            read_length=20,
+            insert_sizes=insert_sizes,
+        )
+        batch = ReadBatch.concatenate(list(generator.emit_batches(1000, shard_size=300)))
+        starts = np.minimum(batch.reference_starts[0::2], batch.reference_starts[1::2])
+        ends = starts + np.abs(batch.template_lengths[0::2])
+        contigs = batch.reference_ids[0::2]
+        assert index.low_complexity.overlaps(contigs, starts, ends).all()
+        assert not index.gaps.overlaps(contigs, starts, ends).any()
+
+    def test_cli_skips_gaps(self, gapped_fasta: str):
+        result = CliRunner().invoke(
+            cli, ["-g", "-l", "30", "-f", "seq", "--seed", "1", gapped_fasta, "300"]
+        )
+
+        assert result.exit_code == 0
+        assert len(result.output.split()) == 300
+        assert "N" not in result.output
@@ -0,0 +1,75 @@
+import numpy as np
+from click.testing import CliRunner
+from faker import Faker
+
+from hts_synth.hts_synth import cli
+from hts_synth.providers.mutated_sequence_provider import MutatedSequenceProvider
+from hts_synth.ref.generate_variant import VariantGenerator
+from hts_synth.ref.seq_converter import apply_variants
+from hts_synth.utils.rng import RngContext, RngStream
+
+
+class TestRngContext:
+    def test_streams_reproducible(self):
+        first = RngContext(42).generator(RngStream.VARIANTS).random(5)
+        second = RngContext(42).generator(RngStream.VARIANTS).random(5)
+
+        assert np.array_equal(first, second)
+        assert not np.array_equal(first, RngContext(42).generator(RngStream.QUALITIES).random(5))
+
+    def test_shards_independent_of_spawn_count(self):
+        few = RngContext(7).spawn(2)
+        many = RngContext(7).spawn(16)
+
+        assert np.array_equal(
+            few[1].generator(RngStream.VARIANTS).random(5),
+            many[1].generator(RngStream.VARIANTS).random(5),
+        )
+        assert not np.array_equal(
+            many[0].generator(RngStream.VARIANTS).random(5),
+            many[1].generator(RngStream.VARIANTS).random(5),
+        )
+
+    def test_entropy_reproduces_run(self):
+        context = RngContext()
+        replay = RngContext(context.entropy)
+
+        assert np.array_equal(
+            context.generator(RngStream.NAMES).random(3),
+            replay.generator(RngStream.NAMES).random(3),
+        )
+
+
+class TestSeededGeneration:
+    def test_variant_generator_modes_agree(self, reference_sequence: str):
+        for seed in range(10):
+            per_base = VariantGenerator(
+                reference_sequence, [3, 2, 4], np.random.default_rng(seed)
+            ).generate_random_variant_sequence()
+            variants = VariantGenerator(
+                reference_sequence, [3, 2, 4], np.random.default_rng(seed)
+            ).generate_variant_arrays()
+
+            observed = apply_variants(0, reference_sequence[: variants.ref_span], None, variants)
+            assert observed == "".join(v.alt for v in per_base)
+
+    def test_faker_seed(self, reference_sequence: str):
+        def mutate(seed: int):
+            fake = Faker()
+            fake.add_provider(MutatedSequenceProvider)
+            fake.seed_instance(seed)
+            return [
+                fake.mutated_sequence(sequence=reference_sequence, events=[2, 2, 2])
+                for _ in range(5)
+            ]
+
+        assert mutate(3) == mutate(3)
+
+    def test_cli_seed(self, reference_sequence: str):
+        runner = CliRunner()
+        args = ["--seed", "5", "--substitution-probability", "0.1", reference_sequence, "20"]
+        first = runner.invoke(cli, args)
+        second = runner.invoke(cli, args)
+
+        assert first.exit_code == 0
+        assert first.output == second.output
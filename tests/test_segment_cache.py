@@ -0,0 +1,85 @@
+import numpy as np
+import pysam
+
+from hts_synth.ref.reference import Reference
+from hts_synth.ref.segment_cache import SegmentCache
+
+
+class _CountingSource:
+    def __init__(self, fasta: pysam.FastaFile):
+        self.fasta: pysam.FastaFile = fasta
+        self.calls: list[tuple[str, int, int]] = []
+
+    def __call__(self, chrom: str, start: int, end: int) -> str:
+        self.calls.append((chrom, start, end))
+        return self.fasta.fetch(chrom, start, end)
+
+
+def _cache(reference_fasta: str, **kwargs: int) -> tuple[SegmentCache, _CountingSource]:
+    fasta = pysam.FastaFile(reference_fasta)
+    source = _CountingSource(fasta)
+    return SegmentCache(source, dict(zip(fasta.references, fasta.lengths)), **kwargs), source
+
+
+class TestSegmentCache:
+    def test_fetch_matches_source(self, reference_fasta: str):
+        cache, source = _cache(reference_fasta, block_size=100, max_blocks=8)
+        rng = np.random.default_rng(4)
+        for chrom, length in (("chr1", 5000), ("chr2", 2000)):
+            starts = rng.integers(0, length, size=200)
+            ends = starts + rng.integers(0, 700, size=200)
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                assert cache.fetch(chrom, start, end) == source.fasta.fetch(chrom, start, end)
+
+        assert len(cache) <= 8
+        assert cache.hits > 0 and cache.misses > 0
+
+    def test_hits_and_lru_eviction(self, reference_fasta: str):
+        cache, source = _cache(reference_fasta, block_size=100, max_blocks=3)
+
+        _ = cache.fetch("chr1", 50, 250)
+        assert (cache.hits, cache.misses) == (0, 3)
+        assert source.calls == [("chr1", 0, 300)]
+
+        # overlapping and padded segments are served from the cached blocks
+        _ = cache.fetch("chr1", 120, 180)
+        _ = cache.fetch("chr1", 0, 300)
+        assert (cache.hits, cache.misses) == (4, 3)
+        assert len(source.calls) == 1
+
+        # block 0 is the least recently used and is evicted for block 3
+        _ = cache.fetch("chr1", 150, 350)
+        assert source.calls[-1] == ("chr1", 300, 400)
+        _ = cache.fetch("chr1", 10, 20)
+        assert source.calls[-1] == ("chr1", 0, 100)
+        assert cache.hit_rate == 6 / 11
+
+    def test_read_ahead_on_sequential_scan(self, reference_fasta: str):
+        cache, source = _cache(reference_fasta, block_size=100, max_blocks=8, read_ahead=2)
+
+        for start in range(0, 1000, 50):
+            _ = cache.fetch("chr2", start, start + 50)
+
+        # the first block is loaded alone, each later miss loads two blocks ahead
+        assert source.calls == [("chr2", 0, 100)] + [
+            ("chr2", start, start + 300) for start in (100, 400, 700)
+        ]
+        assert (cache.hits, cache.misses) == (16, 4)
+
+    def test_contig_end_is_clipped(self, reference_fasta: str):
+        cache, source = _cache(reference_fasta, block_size=300)
+
+        assert cache.fetch("chr2", 1900, 2100) == source.fasta.fetch("chr2", 1900, 2000)
+        assert cache.fetch("chr2", 2100, 2200) == ""
+
+    def test_reference_cache(self, reference_fasta: str):
+        reference = Reference(reference_fasta, cache_blocks=4, cache_block_size=1000)
+        uncached = Reference(reference_fasta)
+
+        assert reference.cache is not None
+        for _ in range(3):
+            segment = reference.get_sequence("chr1", 1500, 2500)
+            assert segment.sequence == uncached.get_sequence("chr1", 1500, 2500).sequence
+        _ = reference.get_mutated_sequence("chr1", 1500, 2500, [3, 1, 2], np.random.default_rng(0))
+        assert reference.cache.misses == 2
+        assert reference.cache.hits == 6
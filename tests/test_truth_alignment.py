@@ -0,0 +1,96 @@
+from pathlib import Path
+
+import numpy as np
+import pysam
+
+from hts_synth.reads.fragments import InsertSizeDistribution
+from hts_synth.reads.read_generator import QualityModel, ReadGenerator
+from hts_synth.reads.truth_alignment import TruthAlignments
+from hts_synth.ref.enums import VariantType
+from hts_synth.ref.reference import Reference
+from hts_synth.ref.seq_converter import apply_variant_sets_ragged, as_sequence_buffer
+from hts_synth.ref.variant_arrays import VariantArrays, VariantArraysBatch
+from hts_synth.utils.rng import RngContext
+
+
+class TestTruthAlignments:
+    def test_events_to_cigar_and_md(self):
+        reference = as_sequence_buffer("ACGTACGTAC")
+        # leading insertion, substitution, two adjacent deletions and a trailing deletion
+        events = VariantArrays(
+            pos=np.array([0, 3, 5, 6, 9]),
+            ref_len=np.array([0, 1, 1, 1, 1]),
+            alt=np.frombuffer(b"GA", dtype=np.uint8),
+            alt_offsets=np.array([0, 1, 2, 2, 2, 2]),
+            ref_span=10,
+        )
+        batch = VariantArraysBatch.from_sets([events])
+
+        alignments, shifts = TruthAlignments.from_events(batch, reference)
+        sequences, _ = apply_variant_sets_ragged(reference, batch)
+
+        assert sequences.tobytes() == b"GACGAATA"
+        assert alignments.cigar_tuples(0) == [(4, 1), (0, 5), (2, 2), (0, 2)]
+        assert alignments.md_string(0) == "3T1^CG2"
+        assert alignments.edit_distances.tolist() == [3]
+        assert alignments.reference_lengths.tolist() == [9]
+        assert shifts.tolist() == [0]
+
+    def test_leading_deletion_moves_start(self):
+        reference = as_sequence_buffer("ACGTACGTAC")
+        events = VariantArrays(
+            pos=np.array([0, 1]),
+            ref_len=np.array([1, 1]),
+            alt=np.zeros(0, dtype=np.uint8),
+            alt_offsets=np.zeros(3, dtype=np.int64),
+            ref_span=10,
+        )
+
+        alignments, shifts = TruthAlignments.from_events(
+            VariantArraysBatch.from_sets([events]), reference
+        )
+
+        assert shifts.tolist() == [2]
+        assert alignments.cigar_tuples(0) == [(0, 8)]
+        assert alignments.md_string(0) == "8"
+        assert alignments.edit_distances.tolist() == [0]
+
+    def test_generated_pairs_match_calmd(self, reference_fasta: str, tmp_path: Path):
+        reference = Reference(reference_fasta)
+        generator = ReadGenerator(
+            reference.get_sequence("chr1", 0, 5000),
+            QualityModel(),
+            dict(zip(VariantType, [0.05, 0.05, 0.1])),
+            rng=RngContext(11),
+            read_length=100,
+            insert_sizes=InsertSizeDistribution(300, 50),
+        )
+        batch = generator.generate_batch(200)
+        assert batch.alignments is not None
+
+        sam = tmp_path / "reads.sam"
+        _ = sam.write_bytes(b"@SQ\tSN:chr1\tLN:5000\n" + batch.to_sam(["chr1"]))
+        expected = {
+            (r.query_name, r.flag): (r.cigarstring, r.get_tag("MD"), r.get_tag("NM"))
+            for r in pysam.AlignmentFile(str(sam))
+        }
+        stripped = tmp_path / "stripped.sam"
+        with (
+            pysam.AlignmentFile(str(sam)) as reads,
+            pysam.AlignmentFile(str(stripped), "w", template=reads) as out,
+        ):
+            for read in reads:
+                read.set_tag("MD", None)
+                read.set_tag("NM", None)
+                _ = out.write(read)
+
+        assert len(expected) == len(batch)
+        calmd = str(pysam.calmd(str(stripped), reference_fasta))
+        for line in calmd.splitlines():
+            if line.startswith("@"):
+                continue
+            fields = line.split("\t")
+            tags = dict(field.split(":", 1) for field in fields[11:])
+            md = tags["MD"].split(":", 1)[1]
+            nm = int(tags["NM"].split(":", 1)[1])
+            assert expected[(fields[0], int(fields[1]))] == (fields[5], md, nm)
@@ -0,0 +1,127 @@
+import random
+
+import numpy as np
+import pytest
+
+from hts_synth.ref.generate_variant import VariantGenerator
+from hts_synth.ref.seq_converter import apply_variant_sets, apply_variants
+from hts_synth.ref.variant import Variant
+
+
+def _seed(seed: int):
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+class TestVariantArrays:
+    @pytest.mark.parametrize(
+        "events", [[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1], [3, 2, 4], [2, 5, 1], [8, 8, 8]]
+    )
+    def test_matches_per_base_generation(self, events: list[int], reference_sequence: str):
+        for seed in range(25):
+            _seed(seed)
+            per_base = VariantGenerator(
+                reference_sequence, events
+            ).generate_random_variant_sequence()
+            expected = "".join(v.alt for v in per_base)
+
+            _seed(seed)
+            variants = VariantGenerator(reference_sequence, events).generate_variant_arrays()
+            observed = apply_variants(
+                ref_start=0,
+                ref_seq=reference_sequence[: variants.ref_span],
+                alt_length=None,
+                variants=variants,
+            )
+
+            assert observed == expected
+
+    def test_events_only(self, reference_sequence: str):
+        _seed(0)
+        variants = VariantGenerator(reference_sequence, [2, 2, 2]).generate_variant_arrays()
+
+        assert len(variants) <= 6
+        assert np.all(np.diff(variants.pos) >= 0)
+        assert len(variants.alt_offsets) == len(variants) + 1
+
+
+class TestSparseVariants:
+    def test_only_true_events(self, reference_sequence: str):
+        _seed(1)
+        variants = VariantGenerator(reference_sequence, [3, 3, 3]).generate_sparse_variants()
+
+        assert len(variants) <= 9
+        assert all(v.ref != v.alt for v in variants)
+        assert [v.pos for v in variants] == sorted(v.pos for v in variants)
+
+    def test_apply_rebuilds_from_reference_slices(self, reference_sequence: str):
+        for seed in range(25):
+            _seed(seed)
+            variants = VariantGenerator(reference_sequence, [2, 3, 4]).generate_variant_arrays()
+            expected = apply_variants(0, reference_sequence, None, variants)
+
+            sparse = variants.to_variants(reference_sequence)
+            alt_length = len(reference_sequence) + sum(v.alt_ref_delta for v in sparse)
+            assert apply_variants(0, reference_sequence, alt_length, sparse) == expected
+            assert len(expected) == len(reference_sequence) - 1
+            with pytest.raises(ValueError):
+                _ = apply_variants(0, reference_sequence, alt_length + 1, sparse)
+
+
+class TestApplyVariantSets:
+    def test_matches_per_base_generation(self, reference_sequence: str):
+        variant_sets = []
+        expected = []
+        for seed in range(20):
+            events = [seed % 3, seed % 4, seed % 5]
+            _seed(seed)
+            per_base = VariantGenerator(
+                reference_sequence, events
+            ).generate_random_variant_sequence()
+            _seed(seed)
+            variants = VariantGenerator(reference_sequence, events).generate_variant_arrays()
+            variant_sets.append(variants)
+            # bases beyond the span of the events are copied from the reference
+            expected.append(
+                "".join(v.alt for v in per_base) + reference_sequence[variants.ref_span :]
+            )
+
+        alt_seqs, lengths = apply_variant_sets(reference_sequence, variant_sets)
+
+        assert alt_seqs.shape == (20, lengths.max())
+        for row in range(20):
+            assert alt_seqs[row, : lengths[row]].tobytes().decode("ascii") == expected[row]
+            assert not alt_seqs[row, lengths[row] :].any()
+
+    def test_exact_length_keeps_reference_bases(self):
+        variants = [Variant.get_ins(2, "TT"), Variant(4, "N", "G"), Variant.get_del(6, "CA")]
+
+        assert apply_variants(0, "ACNGNNCAT", None, variants) == "ACTTNGGNT"
+
+
+class TestVariantArrayBatch:
+    def test_rows_are_independent_event_tables(self, reference_sequence: str):
+        rng = np.random.default_rng(3)
+        variant_sets = VariantGenerator(reference_sequence, [2, 3, 4]).generate_variant_array_batch(
+            50, rng
+        )
+
+        assert len(variant_sets) == 50
+        for variants in variant_sets:
+            assert len(variants) <= 9
+            assert int(variants.ref_len.sum()) <= 7
+            assert np.all(np.diff(variants.pos) >= 0)
+            assert variants.ref_span == len(reference_sequence) - 2
+        assert len({tuple(v.pos.tolist()) for v in variant_sets}) > 1
+
+    def test_reproducible_for_seed(self, reference_sequence: str):
+        def generate(seed: int):
+            rng = np.random.default_rng(seed)
+            variant_sets = VariantGenerator(
+                reference_sequence, [4, 4, 4]
+            ).generate_variant_array_batch(10, rng)
+            return apply_variant_sets(reference_sequence, variant_sets)
+
+        (first, first_lengths), (second, second_lengths) = generate(11), generate(11)
+        assert np.array_equal(first, second)
+        assert np.array_equal(first_lengths, second_lengths)
@@ -0,0 +1,25 @@
+import numpy as np
+
+from hts_synth.utils.alias import AliasTable
+
+
+class TestAliasTable:
+    def test_tables_reproduce_weights(self):
+        weights = np.array([[1.0, 2.0, 3.0, 4.0], [0.0, 0.0, 5.0, 0.0], [0.0, 0.0, 0.0, 0.0]])
+        table = AliasTable.from_weights(weights)
+
+        # probability of each outcome: kept when drawn, plus aliased from other outcomes
+        n = table.n_outcomes
+        exact = table.prob / n
+        for row in range(len(table)):
+            np.add.at(exact[row], table.alias[row], (1 - table.prob[row]) / n)
+        expected = np.array([[0.1, 0.2, 0.3, 0.4], [0.0, 0.0, 1.0, 0.0], [0.25] * 4])
+        assert np.allclose(exact, expected)
+
+    def test_sample(self):
+        table = AliasTable.from_weights([[1.0, 0.0, 3.0], [0.0, 1.0, 0.0]])
+        rng = np.random.default_rng(3)
+        draws = table.sample(rng, np.repeat([0, 1], 20000))
+
+        assert np.all(draws[20000:] == 1)
+        assert abs((draws[:20000] == 2).mean() - 0.75) < 0.02
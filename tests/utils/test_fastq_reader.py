@@ -0,0 +1,100 @@
+import gzip
+from pathlib import Path
+
+import numpy as np
+import pysam
+import pytest
+
+from hts_synth.models.qual_model import BlockQualLearner
+from hts_synth.utils.fastq_reader import read_fastq, read_fastq_blocks, split_fastq
+
+RECORDS = [
+    ("r0", "ACGT", [30, 31, 32, 33]),
+    ("r1 comment", "AC", [2, 40]),
+    ("r2", "ACGTACGTA", [20] * 9),
+    ("r3", "G", [93]),
+]
+
+
+def _fastq_text(newline: str = "\n") -> str:
+    return "".join(
+        f"@{name}{newline}{seq}{newline}+{newline}" + "".join(chr(q + 33) for q in quals) + newline
+        for name, seq, quals in RECORDS
+    )
+
+
+class TestReadFastqBlocks:
+    def test_variable_lengths_and_bases(self, tmp_path: Path):
+        path = tmp_path / "reads.fq"
+        _ = path.write_text(_fastq_text())
+        block = read_fastq(path, with_bases=True)
+
+        assert block.lengths.tolist() == [4, 2, 9, 1]
+        assert block.qualities.tolist() == [q for _, _, quals in RECORDS for q in quals]
+        assert block.bases is not None
+        assert block.bases.tobytes().decode() == "".join(seq for _, seq, _ in RECORDS)
+
+    @pytest.mark.parametrize("chunk_bytes", [1, 7, 64, 1 << 20])
+    def test_records_across_chunks(self, tmp_path: Path, chunk_bytes: int):
+        path = tmp_path / "reads.fq.gz"
+        with gzip.open(path, "wt") as handle:
+            _ = handle.write(_fastq_text()[:-1])  # no final newline
+
+        blocks = list(read_fastq_blocks(path, block_reads=3, chunk_bytes=chunk_bytes))
+
+        assert all(len(block) <= 3 for block in blocks)
+        assert np.concatenate([block.lengths for block in blocks]).tolist() == [4, 2, 9, 1]
+
+    def test_windows_line_endings(self, tmp_path: Path):
+        path = tmp_path / "reads.fq"
+        _ = path.write_bytes(_fastq_text("\r\n").encode())
+
+        quals, lengths = read_fastq(path).padded_qualities()
+
+        assert lengths.tolist() == [4, 2, 9, 1]
+        assert quals[1].tolist() == [2, 40] + [0] * 7
+
+    def test_malformed(self, tmp_path: Path):
+        path = tmp_path / "reads.fq"
+        _ = path.write_text("@r0\nACGT\n+\nIII\n")
+
+        with pytest.raises(ValueError):
+            _ = read_fastq(path)
+
+    @pytest.mark.parametrize("parts", [1, 2, 5, 13, 200])
+    def test_byte_ranges(self, tmp_path: Path, parts: int):
+        path = tmp_path / "reads.fq"
+        # "@" and "+" open quality lines of r1 (Phred 31) and r4 (Phred 10)
+        records = [*RECORDS, ("r4", "AC", [10, 31]), ("r5", "ACG", [31, 31, 10])] * 4
+        _ = path.write_text(
+            "".join(
+                f"@{name}\n{seq}\n+\n" + "".join(chr(q + 33) for q in quals) + "\n"
+                for name, seq, quals in records
+            )
+        )
+
+        lengths = [
+            block.lengths.tolist()
+            for start, end in split_fastq(path, parts)
+            for block in read_fastq_blocks(path, chunk_bytes=8, start=start, end=end)
+        ]
+
+        # the ranges tile the file, and each record is read from the range its header starts in
+        assert sum(lengths, []) == [len(seq) for _, seq, _ in records]
+
+    def test_byte_ranges_need_plain_file(self, tmp_path: Path):
+        path = tmp_path / "reads.fq.gz"
+        with gzip.open(path, "wt") as handle:
+            _ = handle.write(_fastq_text())
+
+        assert split_fastq(path, 4) == [(0, None)]
+        with pytest.raises(ValueError):
+            _ = list(read_fastq_blocks(path, start=10))
+
+    def test_learners_match_pysam(self, tmp_path: Path):
+        path = tmp_path / "reads.fq"
+        _ = path.write_text(_fastq_text() * 5)
+        with pysam.FastxFile(str(path)) as fq:
+            expected = BlockQualLearner.learn_fastq(fq, block_size=3).yield_model()
+
+        assert np.allclose(BlockQualLearner.learn_fastq(path, block_size=3).yield_model(), expected)
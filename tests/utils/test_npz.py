@@ -0,0 +1,33 @@
+from pathlib import Path
+
+import numpy as np
+
+from hts_synth.utils.npz import load_npz
+
+
+class TestLoadNpz:
+    def test_maps_stored_arrays(self, tmp_path: Path):
+        arrays = {
+            "matrix": np.arange(60, dtype=np.float64).reshape(3, 4, 5),
+            "fortran": np.asfortranarray(np.arange(12, dtype=np.int32).reshape(3, 4)),
+            "name": np.array("markov"),
+            "empty": np.zeros(0, dtype=np.int64),
+        }
+        for save, name in ((np.savez, "stored.npz"), (np.savez_compressed, "compressed.npz")):
+            save(
+                tmp_path / name,
+                matrix=arrays["matrix"],
+                fortran=arrays["fortran"],
+                name=arrays["name"],
+                empty=arrays["empty"],
+            )
+
+        mapped = load_npz(tmp_path / "stored.npz", mmap=True)
+        assert isinstance(mapped["matrix"], np.memmap)
+        assert isinstance(mapped["fortran"], np.memmap)
+        assert not mapped["matrix"].flags.writeable
+        for loaded in (mapped, load_npz(tmp_path / "compressed.npz", mmap=True)):
+            assert loaded.keys() == arrays.keys()
+            for name, array in arrays.items():
+                assert np.array_equal(loaded[name], array)
+        assert not isinstance(load_npz(tmp_path / "stored.npz")["matrix"], np.memmap)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from hts_synth.utils.online_mean import OnlineMoments, WelfordsRunningMean
+
+
+class TestOnlineMoments:
+    def test_matches_numpy(self):
+        values = np.random.default_rng(1).normal(20, 4, size=(500, 30))
+        moments = OnlineMoments.zeros()
+        for block in np.array_split(values, 7):
+            moments.update(block)
+
+        assert np.all(moments.counts == 500)
+        assert np.allclose(moments.means, values.mean(axis=0))
+        assert np.allclose(moments.variances(), values.var(axis=0, ddof=1))
+        assert np.allclose(moments.variances(population=True), values.var(axis=0))
+
+    def test_matches_welford(self):
+        values = [3, 8, 1, 9, 4]
+        welford = WelfordsRunningMean(values[0])
+        for v in values[1:]:
+            welford.update(v)
+        moments = OnlineMoments.zeros()
+        moments.update(np.array(values)[:, None])
+
+        assert moments.yield_moments()[0] == pytest.approx(welford.yield_moments())
+
+    def test_variable_lengths_and_merge(self):
+        rng = np.random.default_rng(2)
+        lengths = rng.integers(1, 20, size=300)
+        values = rng.normal(30, 5, size=(300, 19))
+        split = OnlineMoments.zeros()
+        split.update(values[:100, :10], np.minimum(lengths[:100], 10))
+        other = OnlineMoments.zeros()
+        other.update(values[100:], lengths[100:])
+        split.merge(other)
+
+        # values beyond the first 10 columns of the first 100 rows were never observed
+        lengths[:100] = np.minimum(lengths[:100], 10)
+        for j in range(19):
+            column = values[lengths > j, j]
+            assert split.counts[j] == len(column)
+            assert split.means[j] == pytest.approx(column.mean())
+            assert split.m2[j] == pytest.approx(((column - column.mean()) ** 2).sum())
+
+    def test_insufficient_observations(self):
+        moments = OnlineMoments.zeros()
+        moments.update(np.ones((2, 3)))
+
+        with pytest.raises(RuntimeError):
+            _ = moments.variances()
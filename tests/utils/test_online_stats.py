@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from hts_synth.utils.online_stats import OnlineStats
+
+Q = [0.0, 0.1, 0.5, 0.9, 1.0]
+
+
+def _values():
+    rng = np.random.default_rng(3)
+    return rng.gamma(4, 8, size=(3000, 6)).round(), rng.integers(1, 7, size=3000)
+
+
+class TestOnlineStats:
+    def test_histogram_quantiles_exact(self):
+        values, _ = _values()
+        stats = OnlineStats.create(histogram_values=200)
+        stats.update(values)
+
+        assert np.array_equal(stats.quantiles(Q), np.quantile(values, Q, axis=0, method="lower"))
+
+    def test_sketch_quantiles_within_accuracy(self):
+        values, _ = _values()
+        stats = OnlineStats.create(sketch_accuracy=0.01)
+        stats.update(values)
+
+        expected = np.quantile(values, Q, axis=0, method="lower")
+        # values up to the sketch's min_value of 1 are estimated as 0
+        assert np.allclose(stats.quantiles(Q), expected, rtol=0.01, atol=1)
+
+    def test_merge_matches_single_update(self):
+        values, lengths = _values()
+        whole = OnlineStats.create(histogram_values=200, sketch_accuracy=0.02)
+        whole.update(values, lengths)
+        merged = OnlineStats.create(histogram_values=200, sketch_accuracy=0.02)
+        for block, block_lengths in zip(np.array_split(values, 4), np.array_split(lengths, 4)):
+            partial = OnlineStats.create(histogram_values=200, sketch_accuracy=0.02)
+            partial.update(block[:, : block_lengths.max()], block_lengths)
+            merged.merge(partial)
+
+        assert np.array_equal(merged.moments.counts, whole.moments.counts)
+        assert np.allclose(merged.moments.means, whole.moments.means)
+        assert np.allclose(merged.moments.m2, whole.moments.m2)
+        assert merged.histogram is not None and whole.histogram is not None
+        assert np.array_equal(merged.histogram.counts, whole.histogram.counts)
+        assert merged.sketch is not None and whole.sketch is not None
+        assert np.array_equal(merged.sketch.counts, whole.sketch.counts)
+
+    def test_variable_lengths(self):
+        stats = OnlineStats.create(histogram_values=10)
+        stats.update(np.array([[1, 2, 9], [3, 0, 0]]), np.array([3, 1]))
+
+        assert stats.moments.counts.tolist() == [2, 1, 1]
+        assert stats.quantiles(1.0)[0].tolist() == [3, 2, 9]
+
+    def test_merge_requires_same_statistics(self):
+        with pytest.raises(ValueError):
+            OnlineStats.create(histogram_values=10).merge(OnlineStats.create())
+        with pytest.raises(RuntimeError):
+            _ = OnlineStats.create().quantiles(0.5)